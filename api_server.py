@@ -0,0 +1,133 @@
+# api_server.py
+"""
+Chế độ dịch vụ HTTP cục bộ cho các hệ thống khác (bổ sung hàng, CRM) gọi trực tiếp các mô hình DSS.
+
+    python api_server.py --data data.csv --port 8765
+
+Endpoint (JSON vào; JSON ra, hoặc Arrow IPC stream nếu gửi Accept: application/vnd.apache.arrow.stream):
+    GET  /health
+    POST /datasets        thân là file CSV (Content-Type: text/csv) -> {"dataset": <fingerprint>, ...}
+    POST /segmentation    {"dataset", "k" | "ks": [...], "include_customers"}
+    POST /optimization    {"dataset", "keyword", "budget", "months"} | {"dataset", "requests": [...]}
+    POST /forecast        {"dataset", "keyword" | "keywords": [...], "history_months", "forecast_months", ...}
+Khi server chỉ có một dataset thì có thể bỏ "dataset".
+"""
+import argparse
+import json
+import logging
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from controllers.api_controller import ROUTES, ApiError, register_dataset, register_dataset_file, to_jsonable
+from services.lazy_imports import lazy_import
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+MAX_BODY_BYTES = 512 * 2**20
+
+logger = logging.getLogger("dss.api")
+
+
+def _arrow_bytes(table) -> bytes:
+    pa = lazy_import("pyarrow")
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return sink.getvalue().to_pybytes()
+
+
+class DSSRequestHandler(BaseHTTPRequestHandler):
+    server_version = "DSS-API/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(to_jsonable(payload), ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8")
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "Thân yêu cầu quá lớn.")
+        return self.rfile.read(length) if length else b""
+
+    def _handle(self, method: str):
+        start = time.perf_counter()
+        path = self.path.split("?", 1)[0].rstrip("/") or "/"
+        status = 200
+        try:
+            raw = self._read_body() if method == "POST" else b""
+            if (method, path) == ("POST", "/datasets"):
+                self._send_json(200, register_dataset(raw))
+                return
+            handler = ROUTES.get((method, path))
+            if handler is None:
+                raise ApiError(404, f"Không có endpoint {method} {path}")
+            try:
+                body = json.loads(raw) if raw else {}
+            except json.JSONDecodeError as e:
+                raise ApiError(400, f"JSON không hợp lệ: {e}")
+            if not isinstance(body, dict):
+                raise ApiError(400, "Thân yêu cầu phải là một JSON object.")
+
+            payload, table = handler(body)
+            if ARROW_MIME in (self.headers.get("Accept") or "") and table is not None:
+                try:
+                    data = _arrow_bytes(table)
+                except ImportError:
+                    raise ApiError(406, "Máy chủ chưa cài pyarrow; hãy dùng JSON.")
+                self._send(200, data, ARROW_MIME)
+            else:
+                self._send_json(200, payload)
+        except ApiError as e:
+            status = e.status
+            self._send_json(status, {"error": str(e)})
+        except Exception as e:
+            status = 500
+            logger.exception("Lỗi khi xử lý %s %s", method, path)
+            self._send_json(status, {"error": f"Lỗi máy chủ: {e}"})
+        finally:
+            logger.info("%s %s %d %.3fs", method, path, status, time.perf_counter() - start)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, format, *args):
+        # Đã ghi log theo từng yêu cầu trong _handle
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API cục bộ cho các mô hình DSS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", nargs="*", default=[], help="File CSV nạp sẵn khi khởi động")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    for path in args.data:
+        info = register_dataset_file(path)
+        logger.info("Đã nạp %s: dataset=%s, %d dòng", path, info["dataset"], info["rows"])
+
+    server = ThreadingHTTPServer((args.host, args.port), DSSRequestHandler)
+    server.daemon_threads = True
+    logger.info("DSS API đang chạy tại http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
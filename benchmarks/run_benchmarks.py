@@ -0,0 +1,197 @@
+# benchmarks/run_benchmarks.py
+"""
+Đo thời gian và bộ nhớ đỉnh của các entry point trong services trên dữ liệu tổng hợp.
+
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 1000000 --out bench.json
+    python -m benchmarks.run_benchmarks --compare before.json after.json
+
+Mỗi bước được chạy `--warmup` lần không tính giờ (để import thư viện, nạp cache…),
+sau đó `--repeat` lần không bật tracemalloc để lấy thời gian (trung vị),
+rồi chạy thêm một lần có tracemalloc để lấy bộ nhớ đỉnh (MB), tránh để chi phí
+tracemalloc làm sai lệch thời gian.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_transactions, write_csv
+from dao.dataset_store import get_dataset_store
+
+
+def _unwrap(fn):
+    # Bỏ qua st.cache_data (và decorator profiled) để đo chi phí tính toán thật
+    while hasattr(fn, "__wrapped__"):
+        fn = fn.__wrapped__
+    return fn
+
+
+def _rows(obj) -> int | None:
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, (list, tuple)) and obj and isinstance(obj[0], (pd.DataFrame, pd.Series)):
+        return len(obj[0])
+    if hasattr(obj, "monthly"):  # ForecastResult
+        return len(obj.monthly)
+    return None
+
+
+def _record(n_rows: int, stage: str, res: dict) -> dict:
+    print(f"{n_rows:>10,} {stage:<40} {res['seconds']:>9.3f}s {res.get('peak_mb', float('nan')):>9.1f} MB", flush=True)
+    return {"rows": n_rows, "stage": stage, **res}
+
+
+def measure(fn, repeat: int, memory: bool, warmup: int = 0) -> tuple[dict, object]:
+    for _ in range(warmup):
+        fn()
+    times, out = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    result = {"seconds": round(statistics.median(times), 4), "rows_out": _rows(out)}
+    if memory:
+        tracemalloc.start()
+        fn()
+        result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return result, out
+
+
+def run_size(n_rows: int, args) -> list[dict]:
+    from services.segmentation_service import (
+        load_and_preprocess_rfm_segmentation, compute_sse_segmentation, cluster_rfm
+    )
+    from services.optimization_service import preprocess_optimization_data, run_optimization
+    from services.forecasting_service import ForecastModel
+    from services.aggregate_cube import build_cube
+    from services.progressive_service import segmentation_preview, forecast_preview
+
+    df_gen = generate_transactions(
+        n_rows, args.customers, args.products, args.months,
+        seasonality=args.seasonality, seed=args.seed
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "transactions.csv")
+        write_csv(df_gen, path)
+        del df_gen
+        res, df = measure(lambda: pd.read_csv(path, encoding="ISO-8859-1"), args.repeat, args.memory)
+    records = [_record(n_rows, "read_csv", res)]
+
+    preprocess_opt = _unwrap(preprocess_optimization_data)
+    forecaster = ForecastModel(args.keyword, args.history_months, args.forecast_months, 1.0, 15.0)
+    store = get_dataset_store()
+
+    def cold(fn):
+        # Xoá kho dataset dùng chung trước mỗi lần chạy để đo cả chi phí tính artefact
+        return lambda: (store.clear(), fn())[1]
+
+    rfm = load_and_preprocess_rfm_segmentation(df)
+    processed = preprocess_opt(df, args.keyword, 1, "")
+    fc_input = forecaster.preprocess(df)
+    stages = [
+        ("build_cube", lambda: build_cube(df)),
+        ("load_and_preprocess_rfm_segmentation", cold(lambda: load_and_preprocess_rfm_segmentation(df))),
+        ("load_and_preprocess_rfm_segmentation[warm]", lambda: load_and_preprocess_rfm_segmentation(df)),
+        ("compute_sse_segmentation", lambda: compute_sse_segmentation(rfm)),
+        ("cluster_rfm", lambda: cluster_rfm(rfm, args.k)),
+        ("preprocess_optimization_data", cold(lambda: preprocess_opt(df, args.keyword, 1, ""))),
+        ("run_optimization", lambda: run_optimization(processed, args.budget)),
+        ("ForecastModel.preprocess", cold(lambda: forecaster.preprocess(df))),
+        ("ForecastModel.preprocess[warm]", lambda: forecaster.preprocess(df)),
+        ("segmentation_preview", cold(lambda: segmentation_preview(df, args.k))),
+        ("forecast_preview", cold(lambda: forecast_preview(
+            df, args.keyword, args.history_months, args.forecast_months, 1.0
+        ))),
+    ]
+    if fc_input is not None:
+        stages += [
+            (f"ForecastModel.forecast[{m}]", lambda m=m: forecaster.forecast(fc_input, m))
+            for m in args.models
+        ]
+    for name, fn in stages:
+        res, _ = measure(fn, args.repeat, args.memory, args.warmup)
+        records.append(_record(n_rows, name, res))
+    return records
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path: str, after_path: str):
+    """In bảng so sánh thời gian/bộ nhớ giữa hai báo cáo (after / before)."""
+    def load(path):
+        with open(path, encoding="utf-8") as f:
+            return pd.DataFrame(json.load(f)["results"]).set_index(["rows", "stage"])
+    before, after = load(before_path), load(after_path)
+    table = before.join(after, lsuffix="_before", rsuffix="_after", how="inner")
+    table["time_ratio"] = (table["seconds_after"] / table["seconds_before"]).round(3)
+    if "peak_mb_before" in table and "peak_mb_after" in table:
+        table["memory_ratio"] = (table["peak_mb_after"] / table["peak_mb_before"]).round(3)
+    print(table.to_string())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark các entry point của DSS")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--customers", type=int, default=4000)
+    parser.add_argument("--products", type=int, default=4000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--seasonality", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keyword", default="CANDLE")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--budget", type=float, default=1000.0)
+    parser.add_argument("--history-months", type=int, default=24)
+    parser.add_argument("--forecast-months", type=int, default=6)
+    parser.add_argument("--models", nargs="*", default=["BASELINE", "ARIMA"],
+                        help="Loại mô hình cho ForecastModel.forecast (BASELINE ARIMA SARIMA PROPHET)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--no-memory", dest="memory", action="store_false")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for n in args.sizes:
+        results.extend(run_size(n, args))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "params": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Đã ghi báo cáo vào {args.out}")
+
+
+if __name__ == "__main__":
+    main()
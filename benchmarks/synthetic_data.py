@@ -0,0 +1,122 @@
+# benchmarks/synthetic_data.py
+"""
+Sinh dữ liệu giao dịch tổng hợp giống bộ Online Retail, đúng schema mà load_raw_data đọc:
+  InvoiceNo, StockCode, Description, Quantity, InvoiceDate, UnitPrice, CustomerID, Country
+
+    python -m benchmarks.synthetic_data --rows 1000000 --out data/retail_1m.csv
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+COLORS = ["WHITE", "RED", "PINK", "BLUE", "GREEN", "VINTAGE", "JUMBO", "HEART", "STAR", "RETRO"]
+ITEMS = [
+    "CANDLE", "T-LIGHT HOLDER", "MUG", "BAG", "LUNCH BOX", "CAKE CASES", "GIFT WRAP",
+    "NAPKINS", "DOORMAT", "CLOCK", "NOTEBOOK", "HOT WATER BOTTLE", "BUNTING", "CUSHION COVER"
+]
+COUNTRIES = ["United Kingdom", "Germany", "France", "EIRE", "Spain", "Netherlands", "Belgium", "Switzerland"]
+COUNTRY_WEIGHTS = np.array([0.82, 0.05, 0.04, 0.03, 0.02, 0.02, 0.01, 0.01])
+DATE_FORMAT = "%m/%d/%Y %H:%M"
+
+
+def generate_transactions(
+    n_rows: int,
+    n_customers: int = 4000,
+    n_products: int = 4000,
+    months: int = 24,
+    start: str = "2010-12-01",
+    seasonality: float = 0.5,
+    lines_per_invoice: int = 20,
+    cancel_rate: float = 0.02,
+    missing_customer_rate: float = 0.2,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    Sinh n_rows dòng giao dịch:
+      - sản phẩm và khách hàng có độ phổ biến lệch (Zipf), mỗi hoá đơn thuộc một khách/ngày/quốc gia
+      - số hoá đơn theo tháng dao động theo mùa với biên độ `seasonality`, đỉnh vào tháng 11
+      - một phần hoá đơn bị huỷ (InvoiceNo bắt đầu bằng 'C', Quantity âm), một phần thiếu CustomerID
+    InvoiceDate là chuỗi cùng định dạng với file CSV gốc.
+    """
+    rng = np.random.default_rng(seed)
+    n_invoices = max(1, n_rows // lines_per_invoice)
+
+    # Danh mục sản phẩm: tên ghép từ màu + món hàng, giá gốc lognormal
+    names = np.array([f"{c} {i}" for i in ITEMS for c in COLORS])
+    descriptions = np.array([
+        names[j % len(names)] if j < len(names) else f"{names[j % len(names)]} {j // len(names)}"
+        for j in range(n_products)
+    ])
+    stock_codes = np.array([str(20000 + j) for j in range(n_products)])
+    base_price = np.round(rng.lognormal(mean=1.0, sigma=0.8, size=n_products), 2) + 0.05
+    product_weights = 1.0 / np.arange(1, n_products + 1) ** 0.9
+    product_weights /= product_weights.sum()
+
+    # Hoá đơn: khách, quốc gia, thời điểm (theo mùa), huỷ hay không
+    customer_weights = 1.0 / np.arange(1, n_customers + 1) ** 0.7
+    customer_weights /= customer_weights.sum()
+    inv_customer = rng.choice(n_customers, size=n_invoices, p=customer_weights)
+    customer_country = rng.choice(len(COUNTRIES), size=n_customers, p=COUNTRY_WEIGHTS)
+
+    month_starts = pd.date_range(start, periods=months, freq="MS")
+    month_weights = 1 + seasonality * np.cos(2 * np.pi * (month_starts.month.values - 11) / 12)
+    month_weights /= month_weights.sum()
+    inv_month = rng.choice(months, size=n_invoices, p=month_weights)
+    days_in_month = month_starts.days_in_month.values[inv_month]
+    offsets = (rng.random(n_invoices) * days_in_month * 86400).astype("int64") // 60 * 60
+    inv_date = month_starts.values[inv_month] + offsets.astype("timedelta64[s]")
+    order = np.argsort(inv_date, kind="stable")
+    inv_customer, inv_date = inv_customer[order], inv_date[order]
+    inv_cancel = rng.random(n_invoices) < cancel_rate
+    inv_no = np.char.add(np.where(inv_cancel, "C", ""), (536365 + np.arange(n_invoices)).astype(str))
+    inv_date_str = np.asarray(pd.DatetimeIndex(inv_date).strftime(DATE_FORMAT))
+
+    # Dòng hoá đơn
+    row_inv = np.sort(rng.integers(0, n_invoices, size=n_rows))
+    row_prod = rng.choice(n_products, size=n_rows, p=product_weights)
+    qty = rng.geometric(0.15, size=n_rows)
+    qty = np.where(inv_cancel[row_inv], -qty, qty)
+    price = np.round(base_price[row_prod] * rng.choice([1.0, 1.0, 1.0, 0.85, 1.25], size=n_rows), 2)
+    customer = (12346 + inv_customer[row_inv]).astype(float)
+    customer[rng.random(n_rows) < missing_customer_rate] = np.nan
+
+    return pd.DataFrame({
+        "InvoiceNo": inv_no[row_inv],
+        "StockCode": stock_codes[row_prod],
+        "Description": descriptions[row_prod],
+        "Quantity": qty,
+        "InvoiceDate": inv_date_str[row_inv],
+        "UnitPrice": price,
+        "CustomerID": customer,
+        "Country": np.array(COUNTRIES)[customer_country[inv_customer[row_inv]]],
+    })
+
+
+def write_csv(df: pd.DataFrame, path: str, chunk_rows: int = 500_000):
+    """Ghi CSV theo từng khối để không nhân đôi bộ nhớ khi dữ liệu lớn."""
+    for i, start in enumerate(range(0, len(df), chunk_rows)):
+        df.iloc[start:start + chunk_rows].to_csv(
+            path, mode="w" if i == 0 else "a", header=i == 0, index=False, encoding="ISO-8859-1"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sinh file giao dịch tổng hợp kiểu Online Retail")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--customers", type=int, default=4000)
+    parser.add_argument("--products", type=int, default=4000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--seasonality", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    df = generate_transactions(
+        args.rows, args.customers, args.products, args.months,
+        seasonality=args.seasonality, seed=args.seed
+    )
+    write_csv(df, args.out)
+    print(f"Đã ghi {len(df):,} dòng vào {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Xử lý các yêu cầu của HTTP API (api_server.py) bằng cùng các service với giao diện Streamlit.
+
+Dataset được nạp một lần và giữ trong kho dataset dùng chung; kết quả dự báo/tối ưu theo
+tham số cũng được lưu ở đó như một artefact, nên lời gọi lặp lại trả về ngay. Mỗi yêu cầu
+có thể chứa nhiều mục (ví dụ 500 từ khóa); các mục chạy song song trên một pool luồng riêng
+của API với số mục chờ tối đa, vượt quá thì trả về 429 thay vì để độ trễ tăng không giới hạn.
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dao.data_loader import dataset_artefact
+from dao.dataset_store import get_dataset_store
+from services.forecasting_service import ForecastModel
+from services.optimization_service import preprocess_optimization_data, run_optimization
+from services.segmentation_service import segment_customers, segment_assignments
+
+API_WORKERS = int(os.environ.get("DSS_API_WORKERS", str(min(8, os.cpu_count() or 1))))
+API_MAX_QUEUE = int(os.environ.get("DSS_API_MAX_QUEUE", "2000"))
+MAX_BATCH_ITEMS = 1000
+
+logger = logging.getLogger("dss.api")
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+_pool = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="dss-api")
+_queue_lock = threading.Lock()
+_queued = 0
+# Dataset đã đăng ký qua API: chỉ giữ fingerprint -> số dòng; bản thân DataFrame nằm trong kho dataset
+# dùng chung (chịu giới hạn DSS_DATASET_MEMORY_MB, được đẩy ra đĩa và nạp lại khi cần)
+_DATASETS: dict[str, int] = {}
+
+
+def register_dataset(data: bytes) -> dict:
+    """Đọc CSV (bytes) vào kho dataset; trả về fingerprint dùng cho các lời gọi sau."""
+    fingerprint = hashlib.sha1(data).hexdigest()
+
+    def parse():
+        df = pd.read_csv(io.BytesIO(data), encoding='ISO-8859-1')
+        df.attrs["fingerprint"] = fingerprint
+        return df
+
+    try:
+        df = get_dataset_store().get_or_compute(fingerprint, "raw", parse)
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        raise ApiError(400, f"Không đọc được CSV: {e}")
+    df.attrs["fingerprint"] = fingerprint
+    _DATASETS[fingerprint] = len(df)
+    return {"dataset": fingerprint, "rows": len(df), "columns": list(df.columns)}
+
+
+def register_dataset_file(path: str) -> dict:
+    with open(path, "rb") as f:
+        return register_dataset(f.read())
+
+
+def _dataset(body: dict) -> pd.DataFrame:
+    fingerprint = body.get("dataset")
+    if fingerprint is None and len(_DATASETS) == 1:
+        fingerprint = next(iter(_DATASETS))
+    df = get_dataset_store().get(fingerprint, "raw") if fingerprint in _DATASETS else None
+    if df is None:
+        # Chưa đăng ký, hoặc đã bị xoá khỏi kho (VD: không ghi được ra đĩa khi bị đẩy khỏi bộ nhớ)
+        _DATASETS.pop(fingerprint, None)
+        raise ApiError(404, f"Không có dataset '{fingerprint}'. Gửi CSV tới POST /datasets trước.")
+    df.attrs["fingerprint"] = fingerprint
+    return df
+
+
+def _batch_items(body: dict, single_key: str, batch_key: str) -> list:
+    items = body.get(batch_key)
+    if items is None:
+        if single_key not in body:
+            raise ApiError(400, f"Thiếu '{single_key}' hoặc '{batch_key}'.")
+        items = [body[single_key]]
+    if not isinstance(items, list) or not items:
+        raise ApiError(400, f"'{batch_key}' phải là danh sách không rỗng.")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ApiError(413, f"Tối đa {MAX_BATCH_ITEMS} mục mỗi yêu cầu.")
+    return items
+
+
+def run_batch(fn, items: list) -> list[dict]:
+    """
+    Chạy fn(item) cho từng mục trên pool của API. Lỗi của một mục được trả về trong mục đó
+    ({"input": item, "error": ...}) thay vì làm hỏng cả lô; lỗi ngoài dự kiến được ghi log kèm mục.
+    """
+    global _queued
+    with _queue_lock:
+        if _queued + len(items) > API_MAX_QUEUE:
+            raise ApiError(429, "Máy chủ đang quá tải, vui lòng thử lại sau.")
+        _queued += len(items)
+
+    def guarded(item):
+        global _queued
+        try:
+            return fn(item)
+        except (ValueError, KeyError, TypeError) as e:
+            return {"input": item, "error": str(e)}
+        except Exception as e:
+            logger.exception("Lỗi khi xử lý mục %r", item)
+            return {"input": item, "error": f"Lỗi máy chủ: {e}"}
+        finally:
+            with _queue_lock:
+                _queued -= 1
+
+    return list(_pool.map(guarded, items))
+
+
+def _number(value, name: str, cast=float, minimum=None):
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' không hợp lệ")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"'{name}' phải ≥ {minimum}")
+    return value
+
+
+def to_jsonable(obj):
+    """NaN/inf -> None và kiểu NumPy -> kiểu Python để json.dumps cho ra JSON hợp lệ."""
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, (np.integer,)):
+        return int(obj)
+    if isinstance(obj, (float, np.floating)):
+        return None if not math.isfinite(obj) else float(obj)
+    if isinstance(obj, (pd.Timestamp,)):
+        return obj.isoformat()
+    return obj
+
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    return to_jsonable(df.to_dict(orient="records"))
+
+
+# --- Endpoint ---
+
+def handle_health(body: dict) -> tuple[dict, pd.DataFrame | None]:
+    store = get_dataset_store().stats()
+    return {
+        "status": "ok",
+        "datasets": dict(_DATASETS),
+        "workers": API_WORKERS,
+        "queued": _queued,
+        "store": {k: v for k, v in store.items() if k != "entries"},
+    }, None
+
+
+def handle_segmentation(body: dict) -> tuple[dict, pd.DataFrame | None]:
+    """{"dataset", "k"} hoặc {"dataset", "ks": [...]}; "include_customers": true để kèm nhãn từng khách."""
+    df = _dataset(body)
+    include_customers = bool(body.get("include_customers", False))
+
+    def one(k):
+        k = _number(k, "k", int, 2)
+        out = dataset_artefact(df, "segmentation", segment_customers, k)
+        if out is None:
+            raise ValueError("Không đủ dữ liệu hợp lệ để phân khúc khách hàng.")
+        item = {"k": out["k"], "summary": _records(out["summary"])}
+        if include_customers:
+            customers = segment_assignments(out)
+            item["customers"] = _records(customers[["CustomerID", "Recency", "Frequency", "Monetary", "Cluster", "Segment"]])
+        return item
+
+    results = run_batch(one, _batch_items(body, "k", "ks"))
+    tables = [pd.DataFrame(r["summary"]).assign(k=r["k"]) for r in results if "summary" in r]
+    return {"results": results}, (pd.concat(tables, ignore_index=True) if tables else pd.DataFrame())
+
+
+def handle_optimization(body: dict) -> tuple[dict, pd.DataFrame | None]:
+    """{"dataset", "keyword", "budget", "months"} hoặc {"dataset", "requests": [{...}, ...]}."""
+    df = _dataset(body)
+    fingerprint = df.attrs["fingerprint"]
+    defaults = {k: body[k] for k in ("keyword", "budget", "months") if k in body}
+    items = body.get("requests") or [defaults]
+    if not isinstance(items, list) or len(items) > MAX_BATCH_ITEMS:
+        raise ApiError(400 if not isinstance(items, list) else 413, "'requests' không hợp lệ.")
+
+    def one(req):
+        req = {**defaults, **req}
+        keyword = str(req.get("keyword", "")).strip()
+        if not keyword:
+            raise ValueError("Thiếu 'keyword'")
+        budget = _number(req.get("budget", 1000.0), "budget", float, 0.0)
+        months = _number(req.get("months", 1), "months", int, 1)
+        processed = preprocess_optimization_data(df, keyword, months, fingerprint)
+        if processed is None or processed.empty:
+            raise ValueError(f"Không có sản phẩm hợp lệ chứa từ khóa '{keyword}'")
+        plan, _, total_cost, total_profit = run_optimization(processed, budget)
+        columns = [c for c in ['Description', 'OrderQty', 'UnitPrice', 'TotalCost', 'ExpectedProfit'] if c in plan]
+        return {
+            "keyword": keyword, "budget": budget, "months": months,
+            "total_cost": float(total_cost), "total_profit": float(total_profit),
+            "plan": _records(plan[columns]),
+        }
+
+    results = run_batch(one, items)
+    tables = [
+        pd.DataFrame(r["plan"]).assign(keyword=r["keyword"], budget=r["budget"], months=r["months"])
+        for r in results if r.get("plan")
+    ]
+    return {"results": results}, (pd.concat(tables, ignore_index=True) if tables else pd.DataFrame())
+
+
+def _fit_forecast(df_raw, keyword, history_months, forecast_months, capital_cost, mape_threshold, auto_order):
+    model = ForecastModel(keyword, history_months, forecast_months, capital_cost, mape_threshold, auto_order)
+    return model.run(df_raw)[0]
+
+
+def handle_forecast(body: dict) -> tuple[dict, pd.DataFrame | None]:
+    """
+    {"dataset", "keyword" | "keywords": [...], "history_months", "forecast_months",
+     "capital_cost", "mape_threshold", "auto_order"}: chạy cùng chuỗi mô hình như nút "Chạy dự báo".
+    """
+    df = _dataset(body)
+    keywords = _batch_items(body, "keyword", "keywords")
+    history_months = _number(body.get("history_months", 12), "history_months", int, 3)
+    forecast_months = _number(body.get("forecast_months", 6), "forecast_months", int, 1)
+    capital_cost = _number(body.get("capital_cost", 1.0), "capital_cost", float, 0.0)
+    mape_threshold = _number(body.get("mape_threshold", 15.0), "mape_threshold", float, 0.0)
+    auto_order = bool(body.get("auto_order", False))
+
+    def one(keyword):
+        keyword = str(keyword).strip()
+        if not keyword:
+            raise ValueError("Từ khóa rỗng")
+        # Kết quả đã fit được giữ trong kho dataset: gọi lại cùng tham số không phải fit lại
+        result = dataset_artefact(
+            df, "api_forecast", _fit_forecast,
+            keyword, history_months, forecast_months, capital_cost, mape_threshold, auto_order
+        )
+        if result is None:
+            raise ValueError(f"Không có dữ liệu hợp lệ cho từ khóa '{keyword}'")
+        return to_jsonable(result.to_dict())
+
+    results = run_batch(one, keywords)
+    rows = []
+    for r in results:
+        if "error" in r:
+            continue
+        for kind in ("history", "forecast"):
+            rows.extend(
+                {"keyword": r["keyword"], "month": m, "kind": kind, "value": v, "model": r["model"], "mape": r["mape"]}
+                for m, v in r[kind].items()
+            )
+    return {"results": results}, pd.DataFrame(rows)
+
+
+ROUTES = {
+    ("GET", "/health"): handle_health,
+    ("POST", "/segmentation"): handle_segmentation,
+    ("POST", "/optimization"): handle_optimization,
+    ("POST", "/forecast"): handle_forecast,
+}
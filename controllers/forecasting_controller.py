@@ -1,11 +1,12 @@
 import streamlit as st
-from views.forecasting_view import render_setup_tab, render_results_tab, render_actions_tab
+from views.forecasting_view import render_setup_tab, render_results_tab, render_actions_tab, render_hierarchy_tab
 
 def forecasting_flow(df_raw):
     st.header("Mô hình: Dự báo Doanh thu nhóm sản phẩm (Time Series Forecasting)")
-    tabs = st.tabs(["Thiết lập", "Kết quả", "Hành động"])
+    tabs = st.tabs(["Thiết lập", "Kết quả", "Hành động", "Phân cấp"])
 
-    # Tab 0: Thiết lập
+    # Tab 0: Thiết lập (thông số mô hình, danh sách sản phẩm và tab Phân cấp là các fragment:
+    # đổi widget ở đó chỉ chạy lại phần tương ứng)
     render_setup_tab(df_raw, tabs[0])
 
     # Tab 1: Kết quả
@@ -13,3 +14,6 @@ def forecasting_flow(df_raw):
 
     # Tab 2: Hành động
     render_actions_tab(tabs[2])
+
+    # Tab 3: Dự báo phân cấp sản phẩm → nhóm → tổng
+    render_hierarchy_tab(df_raw, tabs[3])
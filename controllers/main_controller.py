@@ -1,25 +1,80 @@
 # controllers/main_controller.py
 import streamlit as st
+import pandas as pd
 from dao.data_loader import load_raw_data
-from controllers.segmentation_controller import segmentation_flow
-from controllers.optimization_controller import optimization_flow
-from controllers.forecasting_controller import forecasting_flow
+from dao.dataset_store import get_dataset_store
+from services.lazy_imports import lazy_import, IMPORT_TIMINGS
+from services import profiling
+from views.profiling_view import profiling_requested, render_profiling_panel
+from views.job_view import render_job_panel
+
+# Mỗi flow (và thư viện nặng của nó) chỉ được import khi người dùng chọn flow đó
+FLOWS = {
+    "Phân khúc khách hàng": ("controllers.segmentation_controller", "segmentation_flow"),
+    "Tối ưu lợi nhuận nhập hàng": ("controllers.optimization_controller", "optimization_flow"),
+    "Dự báo Doanh thu nhóm sản phẩm": ("controllers.forecasting_controller", "forecasting_flow"),
+    "Phân tích theo phân vùng": ("controllers.partition_controller", "partition_flow"),
+}
+PENDING_PROFILE_KEY = "profiling_pending_records"
 
 def run_app():
     st.set_page_config(page_title="Dashboard DSS", layout="wide")
     st.title("Dashboard Hệ thống Hỗ trợ Quyết Định (DSS)")
 
-    df_raw = load_raw_data()
-    if df_raw is None:
-        st.stop()
+    profiling.start_run(profiling_requested())
+    completed = False
+    try:
+        df_raw = load_raw_data()
+        if df_raw is None:
+            st.stop()
+        run_flow(df_raw)
+        completed = True
+    finally:
+        records = profiling.finish_run()
+        if not completed and records:
+            # Lượt chạy bị ngắt bởi st.rerun()/st.stop(): giữ lại span để hiển thị ở lượt kế tiếp
+            st.session_state[PENDING_PROFILE_KEY] = records
+    pending = st.session_state.pop(PENDING_PROFILE_KEY, [])
+    render_profiling_panel(
+        [{**r, "pass": 1} for r in pending] + [{**r, "pass": 1 + bool(pending)} for r in records]
+    )
+    render_import_timings()
+    render_dataset_store_stats()
+    render_job_panel()
+
 
+def run_flow(df_raw):
     choice = st.sidebar.radio(
         "Chọn Mô hình Phân tích",
-        ("Phân khúc khách hàng", "Tối ưu lợi nhuận nhập hàng", "Dự báo Doanh thu nhóm sản phẩm")
+        tuple(FLOWS)
     )
-    if choice == "Phân khúc khách hàng":
-        segmentation_flow(df_raw)
-    elif choice == "Tối ưu lợi nhuận nhập hàng":
-        optimization_flow(df_raw)
-    else:
-        forecasting_flow(df_raw)
+    module_name, flow_name = FLOWS[choice]
+    flow = getattr(lazy_import(module_name), flow_name)
+    with profiling.span(f"flow.{flow_name}", rows_in=len(df_raw)):
+        flow(df_raw)
+
+
+def render_import_timings():
+    with st.sidebar.expander("⏱️ Thời gian import module", expanded=False):
+        if IMPORT_TIMINGS:
+            df = pd.DataFrame(
+                sorted(IMPORT_TIMINGS.items(), key=lambda kv: kv[1], reverse=True),
+                columns=["Module", "Giây (lần đầu)"]
+            )
+            st.dataframe(df.round(3), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Chưa có module nặng nào được import.")
+        st.caption("Đo chi phí import lạnh: `python -m services.lazy_imports`")
+
+
+def render_dataset_store_stats():
+    stats = get_dataset_store().stats()
+    with st.sidebar.expander("🗄️ Kho dữ liệu dùng chung", expanded=False):
+        st.caption(
+            f"{stats['used_mb']:,.1f} / {stats['budget_mb']:,.0f} MB · {stats['datasets']} dataset · "
+            f"hit {stats['hits']} · miss {stats['misses']} · đẩy ra đĩa {stats['evictions']} · "
+            f"nạp lại từ đĩa {stats['disk_loads']}"
+        )
+        if stats["entries"]:
+            st.dataframe(pd.DataFrame(stats["entries"]), use_container_width=True, hide_index=True)
+        st.caption("Giới hạn bộ nhớ: biến môi trường `DSS_DATASET_MEMORY_MB`.")
@@ -1,4 +1,5 @@
 import streamlit as st
+from dao.data_loader import dataset_fingerprint
 from services.optimization_service import (
     preprocess_optimization_data,
     run_optimization
@@ -9,12 +10,18 @@ from views.optimization_view import (
     render_optimization_results_tab,
     render_decision_tab
 )
+from views.job_view import start_job, render_job_progress
+from views.export_view import render_export
+from services.export_service import run_metadata
+
+OPTIM_JOB_KEY = "optim_job_id"
 
 def optimization_flow(df_raw):
     # Tiêu đề chính
     st.header("Mô hình: Tối ưu lợi nhuận nhập hàng (Linear Programming)")
 
-    # 1) Sidebar inputs
+    # 1) Sidebar inputs: từ khóa/số tháng quyết định bảng tiền xử lý nên đổi sẽ chạy lại flow;
+    #    ngân sách nằm trong fragment riêng và chỉ được đọc khi bấm chạy LP
     keyword, budget, months = render_sidebar_optimization()
 
     # 2) Các tab
@@ -26,45 +33,42 @@ def optimization_flow(df_raw):
 
     # --- Tab 1: Nhập & tiền xử lý ---
     with tab1:
-        processed = preprocess_optimization_data(df_raw, keyword, months)
+        processed = preprocess_optimization_data(df_raw, keyword, months, dataset_fingerprint(df_raw))
         run_pressed = render_preprocess_tab(processed, months)
         if run_pressed:
-            # Lưu vào session để qua tab 2
-            st.session_state.optim_processed_data = processed
-            st.session_state.optim_current_budget = budget
-            st.session_state.optim_current_months = months
-            st.session_state.optim_run_triggered = True
-            st.rerun()
+            st.session_state.optim_result_data = None
+            # Giải LP trong job nền; ngân sách/số tháng đi kèm job để tab 3 dùng đúng tham số đã chạy
+            start_job(
+                OPTIM_JOB_KEY, "optimization", (dataset_fingerprint(df_raw), keyword, months, budget),
+                run_optimization, processed, budget, meta={"keyword": keyword, "budget": budget, "months": months}
+            )
 
     # --- Tab 2: Kết quả tối ưu ---
     with tab2:
-        if st.session_state.get("optim_run_triggered", False) and \
-           st.session_state.get("optim_processed_data") is not None:
-
-            data = st.session_state.optim_processed_data
-            budget_state = st.session_state.optim_current_budget
-
-            try:
-                sorted_df, top5, total_cost, total_profit = run_optimization(
-                    data, budget_state
-                )
-            except ValueError as e:
-                st.error(f"❌ {e}")
-                st.session_state.optim_run_triggered = False
-                st.stop()
-
-            # Lưu kết quả vào session để tab 3 dùng
-            st.session_state.optim_result_data = sorted_df
-            st.session_state.optim_result_top5 = top5
-            st.session_state.optim_total_cost = total_cost
-            st.session_state.optim_total_profit = total_profit
+        job = render_job_progress(OPTIM_JOB_KEY, "Tối ưu nhập hàng")
+        if job is not None:
+            # Lưu kết quả vào session để tab 2, 3 dùng
+            (st.session_state.optim_result_data, st.session_state.optim_result_top5,
+             st.session_state.optim_total_cost, st.session_state.optim_total_profit) = job.result
+            st.session_state.optim_current_budget = job.meta["budget"]
+            st.session_state.optim_current_months = job.meta["months"]
+            st.session_state.optim_export_metadata = run_metadata(
+                df_raw, job.meta, model="Linear Programming (HiGHS)", elapsed_s=job.elapsed
+            )
 
+        if st.session_state.get("optim_result_data") is not None:
             render_optimization_results_tab(
-                sorted_df, top5, total_cost, total_profit
+                st.session_state.optim_result_data,
+                st.session_state.optim_result_top5,
+                st.session_state.optim_total_cost,
+                st.session_state.optim_total_profit
             )
-            st.session_state.optim_run_triggered = False
-
-        else:
+            if not st.session_state.optim_result_data.empty:
+                render_export(
+                    "order_plan", st.session_state.optim_result_data,
+                    st.session_state.optim_export_metadata, key="order_plan_export"
+                )
+        elif OPTIM_JOB_KEY not in st.session_state:
             st.info("💡 Vui lòng nhập dữ liệu ở tab 'Nhập dữ liệu & Tiền xử lý' và nhấn '🚀 Tối ưu nhập hàng'.")
 
     # --- Tab 3: Quyết định tài chính ---
@@ -0,0 +1,80 @@
+import streamlit as st
+from dao.data_loader import dataset_fingerprint
+from services.forecasting_service import ForecastModel
+from services.partition_service import (
+    partition_columns,
+    partitioned_segmentation,
+    partitioned_optimization,
+    partitioned_forecast
+)
+from views.partition_view import (
+    PARTITION_ANALYSES,
+    render_partition_sidebar,
+    render_partition_status,
+    render_segmentation_partitions,
+    render_optimization_partitions,
+    render_forecast_partitions
+)
+from views.job_view import start_job, render_job_progress
+from services.export_service import run_metadata
+
+PARTITION_JOB_KEY = "partition_job_id"
+
+
+def partition_flow(df_raw):
+    st.header("🌍 Mô hình: Phân tích theo phân vùng (quốc gia / cửa hàng)")
+
+    columns = partition_columns(df_raw)
+    if not columns:
+        st.warning("Dữ liệu không có cột phân loại phù hợp (VD: Country) để phân vùng.")
+        return
+    params = render_partition_sidebar(columns)
+    st.info(
+        f"Dữ liệu được chia theo cột **{params['column']}**; mỗi phân vùng được phân tích riêng "
+        "và song song, kết quả được ghép thành bảng chung có cột Partition."
+    )
+
+    if st.button("🚀 Chạy cho mọi phân vùng", key="run_partition_button"):
+        column, analysis = params["column"], params["analysis"]
+        if analysis == "segmentation":
+            fn, args = partitioned_segmentation, (df_raw, column, params["k"])
+        elif analysis == "optimization":
+            fn, args = partitioned_optimization, (
+                df_raw, column, params["keyword"], params["budget"], params["months"]
+            )
+        else:
+            model = ForecastModel(
+                params["keyword"], params["history_months"], params["forecast_months"],
+                params["capital_cost"], params["mape_threshold"]
+            )
+            fn, args = partitioned_forecast, (df_raw, column, model)
+        start_job(
+            PARTITION_JOB_KEY, "partition",
+            (dataset_fingerprint(df_raw), tuple(sorted(params.items()))),
+            fn, *args, meta={"analysis": analysis, "column": column, "parameters": params}
+        )
+
+    job = render_job_progress(PARTITION_JOB_KEY, "Phân tích phân vùng")
+    if job is not None:
+        metadata = run_metadata(
+            df_raw, job.meta["parameters"], model=f"{PARTITION_ANALYSES[job.meta['analysis']]} theo {job.meta['column']}",
+            elapsed_s=job.elapsed
+        )
+        st.session_state["partition_result"] = (job.meta, job.result, metadata)
+
+    stored = st.session_state.get("partition_result")
+    if stored is None:
+        return
+    meta, out, metadata = stored
+    if out is None:
+        st.warning(f"Không phân vùng được theo cột {meta['column']}.")
+        return
+
+    st.markdown(f"### Kết quả: {PARTITION_ANALYSES[meta['analysis']]} theo **{meta['column']}**")
+    render_partition_status(out["status"])
+    if meta["analysis"] == "segmentation":
+        render_segmentation_partitions(out, metadata)
+    elif meta["analysis"] == "optimization":
+        render_optimization_partitions(out, metadata)
+    else:
+        render_forecast_partitions(out, metadata)
@@ -1,16 +1,21 @@
 import streamlit as st
-from services.segmentation_service import (
-    load_and_preprocess_rfm_segmentation,
-    compute_sse_segmentation,
-    cluster_rfm,
-    summarize_rfm
-)
+from dao.data_loader import dataset_fingerprint
+from services.segmentation_service import segment_customers, segment_assignments
+from services.export_service import run_metadata
+from services.progressive_service import preview_enabled, segmentation_preview, segmentation_preview_error
 from views.segmentation_view import (
     render_elbow_chart,
     render_summary_table,
     render_proposals,
     render_details
 )
+from views.job_view import start_job, render_job_progress, stopped_job, job_running
+from views.export_view import render_export
+from views.progressive_view import render_preview_notice, render_preview_error
+
+SEGMENT_JOB_KEY = "segmentation_job_id"
+SEGMENT_PREVIEW_KEY = "segmentation_preview"
+SHARE_BOUND_LABEL = "điểm % tỷ trọng khách mỗi phân khúc"
 
 def segmentation_flow(df_raw):
     st.header("📈 Mô hình: Phân khúc khách hàng (Customer Segmentation)")
@@ -32,33 +37,60 @@ def segmentation_flow(df_raw):
         help="Biểu đồ này giúp bạn xác định số nhóm tối ưu cho dữ liệu của mình."
     )
 
-    # 1) Load & preprocess dữ liệu RFM
-    rfm = load_and_preprocess_rfm_segmentation(df_raw)
-    if rfm is None or rfm.empty:
+    # 1) RFM → SSE → phân cụm → tóm tắt chạy trong job nền; kết quả đã tính được dùng lại theo tham số
+    key_parts = (dataset_fingerprint(df_raw), int(k), bool(show_elbow))
+    stopped = stopped_job(SEGMENT_JOB_KEY, "segmentation", key_parts)
+    if stopped is not None and SEGMENT_JOB_KEY not in st.session_state:
+        (st.error if stopped["failed"] else st.info)(stopped["message"])
+        if not st.button("🔁 Chạy lại phân cụm", key="rerun_segmentation_button"):
+            return
+    start_job(SEGMENT_JOB_KEY, "segmentation", key_parts, segment_customers, df_raw, int(k), bool(show_elbow))
+    job = render_job_progress(SEGMENT_JOB_KEY, "Phân cụm khách hàng")
+    if job is None:
+        # File lớn: trong lúc job nền chạy trên toàn bộ dữ liệu, hiện kết quả trên mẫu khách hàng
+        if job_running(SEGMENT_JOB_KEY) and preview_enabled(df_raw):
+            preview = segmentation_preview(df_raw, int(k), bool(show_elbow))
+            if preview is not None:
+                st.session_state[SEGMENT_PREVIEW_KEY] = (key_parts, preview)
+                render_preview_notice(preview, SHARE_BOUND_LABEL)
+                _render_results(preview.result, k, show_elbow)
+        return
+
+    out = job.result
+    if out is None:
         st.warning("Không đủ dữ liệu hợp lệ để phân tích phân khúc khách hàng.")
-        st.stop()
+        return
+    # Kết quả đầy đủ đã thay bản xem trước: báo sai số thực tế của bản xem trước (nếu đã hiện)
+    previous = st.session_state.get(SEGMENT_PREVIEW_KEY)
+    if previous is not None and previous[0] == key_parts and out["summary"] is not None:
+        render_preview_error(previous[1], segmentation_preview_error(previous[1], out), SHARE_BOUND_LABEL)
+    details_tab = _render_results(out, k, show_elbow)
+    if details_tab is None:
+        return
+    with details_tab:
+        render_export(
+            "segments", segment_assignments(out),
+            run_metadata(df_raw, {"k": out["k"]}, model="KMeans", elapsed_s=job.elapsed), key="segments_export"
+        )
 
-    # 2) Nếu k > số khách hiện có, cảnh báo & điều chỉnh
-    if k > len(rfm):
+
+def _render_results(out, k, show_elbow):
+    """
+    Các tab kết quả phân khúc (đầy đủ hoặc bản xem trước). Trả về tab "Chi tiết khách" để nơi gọi
+    thêm nội dung, hoặc None nếu không đủ khách để phân cụm.
+    """
+    # Nếu k > số khách hiện có, k đã được giảm trong service
+    if out["k"] != k:
         st.warning(
-            f"Số nhóm (k) đã chọn ({k}) lớn hơn số khách hàng hiện có ({len(rfm)}). "
-            f"Tự điều chỉnh k xuống {len(rfm)}."
+            f"Số nhóm (k) đã chọn ({k}) lớn hơn số khách hàng hiện có ({len(out['rfm'])}). "
+            f"Tự điều chỉnh k xuống {out['k']}."
         )
-        k = len(rfm)
-        if k < 2:
+        if out["k"] < 2:
             st.error("Không đủ khách hàng để phân cụm. Vui lòng tải lên dữ liệu có ít nhất 2 khách hàng.")
-            st.stop()
-
-    # 3) Tính SSE cho Elbow Chart (nếu được tick)
-    sse = compute_sse_segmentation(rfm) if show_elbow else None
-
-    # 4) Phân cụm với k đã chọn
-    rfm_c = cluster_rfm(rfm, k)
-
-    # 5) Tóm tắt & gán nhãn (logic nằm trong summarize_rfm)
-    summary = summarize_rfm(rfm_c)
+            return None
+    k, sse, rfm_c, summary = out["k"], out["sse"], out["rfm"], out["summary"]
 
-    # 6) Hiển thị các tab kết quả
+    # Hiển thị các tab kết quả (chuyển tab không rerun; bộ chọn cụm ở tab 3 là fragment riêng)
     tab1, tab2, tab3 = st.tabs(["Tóm tắt", "Đề xuất", "Chi tiết khách"])
 
     with tab1:
@@ -71,3 +103,4 @@ def segmentation_flow(df_raw):
 
     with tab3:
         render_details(rfm_c, summary)
+    return tab3
@@ -1,6 +1,60 @@
 # dao/data_loader.py
+import hashlib
+import io
 import streamlit as st
 import pandas as pd
+from services import profiling
+from dao.dataset_store import get_dataset_store
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Dấu vân tay nội dung của dataset, dùng làm khoá cache rẻ thay vì để
+    st.cache_data băm cả DataFrame ở mỗi lần rerun. Được tính một lần khi đọc file
+    (từ bytes của file) và lưu trong df.attrs; nếu thiếu thì băm nội dung DataFrame.
+    """
+    fp = df.attrs.get("fingerprint")
+    if fp is None:
+        fp = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+        df.attrs["fingerprint"] = fp
+    return fp
+
+
+def dataset_artefact(df_raw: pd.DataFrame, name: str, build, *args):
+    """
+    Artefact dẫn xuất build(df_raw, *args) lấy từ kho dataset dùng chung, khoá theo
+    dấu vân tay của df_raw và (name, *args). Kết quả dùng chung giữa các phiên: chỉ đọc.
+    """
+    key = (name, *args) if args else name
+    return get_dataset_store().get_or_compute(
+        dataset_fingerprint(df_raw), key, lambda: build(df_raw, *args)
+    )
+
+
+def _parse_csv(data: bytes, fingerprint: str) -> pd.DataFrame:
+    with profiling.span("dao.read_csv") as sp:
+        df = pd.read_csv(io.BytesIO(data), encoding='ISO-8859-1')
+        df.attrs["fingerprint"] = fingerprint
+        sp.set_rows_out(len(df))
+    return df
+
+def read_dataset_file(path: str) -> pd.DataFrame:
+    """Đọc file CSV (cho script/CLI) qua kho dataset, với dấu vân tay tính từ bytes của file như khi tải lên."""
+    with open(path, "rb") as f:
+        data = f.read()
+    fingerprint = hashlib.sha1(data).hexdigest()
+    df = get_dataset_store().get_or_compute(fingerprint, "raw", lambda: _parse_csv(data, fingerprint))
+    df.attrs["fingerprint"] = fingerprint
+    return df
+
+def _upload_fingerprint(file_id: str, data: bytes) -> str:
+    # Băm file một lần cho mỗi lần tải lên; các lượt rerun sau (đổi widget) không băm lại cả file
+    cached = st.session_state.get("upload_fingerprint")
+    if cached is not None and cached[0] == file_id:
+        return cached[1]
+    fingerprint = hashlib.sha1(data).hexdigest()
+    st.session_state["upload_fingerprint"] = (file_id, fingerprint)
+    return fingerprint
 
 def load_raw_data():
     st.sidebar.header("📥 Tải dữ liệu chung cho toàn bộ hệ thống")
@@ -11,7 +65,11 @@ def load_raw_data():
     )
     if uploaded_file:
         try:
-            df = pd.read_csv(uploaded_file, encoding='ISO-8859-1')
+            # Mọi phiên tải cùng một file dùng chung một DataFrame trong kho dataset
+            data = uploaded_file.getvalue()
+            fingerprint = _upload_fingerprint(uploaded_file.file_id, data)
+            df = get_dataset_store().get_or_compute(fingerprint, "raw", lambda: _parse_csv(data, fingerprint))
+            df.attrs["fingerprint"] = fingerprint
             st.sidebar.success("✅ Đã tải dữ liệu thành công.")
             return df
         except Exception as e:
@@ -0,0 +1,266 @@
+# dao/dataset_store.py
+"""
+Kho dataset dùng chung cho cả tiến trình, khoá theo dấu vân tay nội dung.
+
+Nhiều phiên tải lên cùng một file chỉ giữ một bản df_raw, và các artefact dẫn xuất
+(dữ liệu đã làm sạch, bảng RFM, bảng tóm tắt sản phẩm, cây phân cấp…) cũng được tính một lần
+rồi dùng chung. Giá trị trong kho là chỉ đọc: nơi dùng không được sửa tại chỗ.
+
+Tổng bộ nhớ ước lượng bị giới hạn bởi DSS_DATASET_MEMORY_MB. Khi vượt, mục ít dùng gần đây nhất
+được ghi ra đĩa (DSS_DATASET_SPILL_DIR) và bỏ khỏi bộ nhớ; lần truy cập sau nạp lại từ đĩa,
+hoặc lấy lại ngay nếu một phiên vẫn còn giữ tham chiếu tới đối tượng đó.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from services import profiling
+
+DATASET_MEMORY_MB = float(os.environ.get("DSS_DATASET_MEMORY_MB", "2048"))
+SPILL_DIR = os.environ.get(
+    "DSS_DATASET_SPILL_DIR", os.path.join(tempfile.gettempdir(), f"dss_dataset_store_{os.getpid()}")
+)
+
+
+def estimate_nbytes(obj, _depth: int = 0) -> int:
+    """Ước lượng bộ nhớ của DataFrame/ndarray/ma trận thưa và các tuple/dict/dataclass chứa chúng."""
+    if _depth > 4 or obj is None:
+        return 0
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True).sum()) if isinstance(obj, pd.DataFrame) else int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if hasattr(obj, "indptr") and hasattr(obj, "data"):  # scipy.sparse CSR/CSC
+        return int(obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes)
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_nbytes(v, _depth + 1) for v in obj)
+    if isinstance(obj, dict):
+        return sum(estimate_nbytes(v, _depth + 1) for v in obj.values())
+    if hasattr(obj, "__dict__"):
+        return sum(estimate_nbytes(v, _depth + 1) for v in vars(obj).values())
+    return 0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    nbytes: int
+    created_at: float = field(default_factory=time.time)
+    last_access: float = field(default_factory=time.time)
+    hits: int = 0
+    path: str | None = None
+    ref: Any = None
+
+
+class DatasetStore:
+    def __init__(self, budget_mb: float = DATASET_MEMORY_MB, spill_dir: str = SPILL_DIR):
+        self.budget_bytes = int(budget_mb * 2**20)
+        self.spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple, threading.Lock] = {}
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        # Mục đã chọn để đẩy ra đĩa nhưng chưa ghi xong: vẫn lấy lại được từ đây
+        self._spilling: dict[tuple, Any] = {}
+        self._used = 0
+        self.counters = {"hits": 0, "misses": 0, "disk_loads": 0, "revived": 0, "evictions": 0}
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_or_compute(self, fingerprint: str, name, build: Callable[[], Any]) -> Any:
+        """
+        Trả về artefact `name` của dataset `fingerprint`, tính bằng build() nếu chưa có.
+        Các phiên yêu cầu cùng artefact đồng thời chỉ tính một lần.
+        """
+        key = (fingerprint, name)
+        with profiling.span(f"store.{name if isinstance(name, str) else name[0]}") as sp:
+            value = self._lookup(key)
+            if value is not None:
+                sp.mark_cache(True)
+                return value
+            with self._key_lock(key):
+                value = self._lookup(key)
+                if value is not None:
+                    sp.mark_cache(True)
+                    return value
+                sp.mark_cache(False)
+                with self._lock:
+                    self.counters["misses"] += 1
+                value = build()
+                if value is not None:
+                    self._put(key, value)
+                else:
+                    with self._lock:
+                        if key not in self._entries:
+                            self._key_locks.pop(key, None)
+                return value
+
+    def get(self, fingerprint: str, name) -> Any:
+        """Artefact `name` của dataset `fingerprint` nếu còn trong kho (bộ nhớ hoặc đĩa), không tính lại; None nếu không có."""
+        return self._lookup((fingerprint, name))
+
+    def _lookup(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.last_access = time.time()
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            if entry.value is not None:
+                self.counters["hits"] += 1
+                return entry.value
+            # Đã bị đẩy khỏi bộ nhớ: lấy lại nếu đang ghi ra đĩa hoặc còn phiên giữ tham chiếu,
+            # nếu không thì đọc từ đĩa
+            value = self._spilling.get(key)
+            if value is None and entry.ref is not None:
+                value = entry.ref()
+            if value is not None:
+                self.counters["revived"] += 1
+            path = entry.path
+        if value is None:
+            try:
+                if path is None:
+                    raise FileNotFoundError(key)
+                value = pd.read_pickle(path)
+            except (OSError, TypeError, ValueError):
+                with self._lock:
+                    self._drop(key)
+                return None
+            with self._lock:
+                self.counters["disk_loads"] += 1
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.value is None:
+                entry.value, entry.ref = value, None
+                self._used += entry.nbytes
+            victims = self._evict(keep=key)
+        self._spill_victims(victims)
+        return value
+
+    def _put(self, key: tuple, value):
+        nbytes = estimate_nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None and old.value is not None:
+                self._used -= old.nbytes
+            self._entries[key] = _Entry(value=value, nbytes=nbytes)
+            self._used += nbytes
+            victims = self._evict(keep=key)
+        self._spill_victims(victims)
+
+    def _evict(self, keep: tuple) -> list[tuple]:
+        """
+        Gọi khi đang giữ self._lock: chọn các mục ít dùng gần đây nhất để đưa ra khỏi bộ nhớ cho tới khi
+        về dưới ngân sách. Việc ghi ra đĩa (chậm) để cho _spill_victims() làm sau khi nhả khoá.
+        Mục vừa dùng luôn được giữ lại kể cả khi một mình nó vượt ngân sách.
+        """
+        victims = []
+        for key in list(self._entries):
+            if self._used <= self.budget_bytes:
+                break
+            entry = self._entries[key]
+            if key == keep or entry.value is None or key in self._spilling:
+                continue
+            try:
+                entry.ref = weakref.ref(entry.value)
+            except TypeError:
+                entry.ref = None
+            if entry.path is None:
+                self._spilling[key] = entry.value
+                victims.append((key, entry))
+            entry.value = None
+            self._used -= entry.nbytes
+            self.counters["evictions"] += 1
+            # Khoá tính toán chỉ cần khi artefact chưa có trong kho; mục đã đẩy ra đĩa không cần giữ
+            self._key_locks.pop(key, None)
+        return victims
+
+    def _spill_victims(self, victims: list[tuple]):
+        """Ghi các mục _evict() đã chọn ra đĩa, ngoài khoá chung của kho."""
+        for key, entry in victims:
+            path = self._spill(key, self._spilling[key])
+            with self._lock:
+                self._spilling.pop(key, None)
+                if self._entries.get(key) is not entry:
+                    # Mục đã bị xoá (clear) trong lúc ghi: bỏ file vừa ghi
+                    if path is not None and os.path.exists(path):
+                        os.remove(path)
+                    continue
+                entry.path = path
+                if path is None and entry.ref is None and entry.value is None:
+                    # Không ghi được ra đĩa và không giữ được tham chiếu yếu: bỏ hẳn mục
+                    self._drop(key)
+
+    def _drop(self, key: tuple):
+        # Gọi khi đang giữ self._lock: bỏ mục cùng khoá tính toán của nó
+        self._entries.pop(key, None)
+        self._key_locks.pop(key, None)
+
+    def _spill(self, key: tuple, value) -> str | None:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{key[0][:16]}_{abs(hash(key[1])):x}.pkl")
+        try:
+            pd.to_pickle(value, path)
+        except (OSError, TypeError, AttributeError):
+            return None
+        return path
+
+    def clear(self, fingerprint: str | None = None):
+        """Xoá toàn bộ kho (hoặc chỉ các artefact của một dataset), kể cả file đã ghi ra đĩa."""
+        with self._lock:
+            for key in [k for k in self._entries if fingerprint is None or k[0] == fingerprint]:
+                entry = self._entries[key]
+                self._drop(key)
+                if entry.value is not None:
+                    self._used -= entry.nbytes
+                if entry.path is not None and os.path.exists(entry.path):
+                    os.remove(entry.path)
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            rows = [
+                {
+                    "dataset": key[0][:10],
+                    "artefact": key[1] if isinstance(key[1], str) else f"{key[1][0]}{list(key[1][1:])}",
+                    "MB": round(e.nbytes / 2**20, 2),
+                    "location": "memory" if e.value is not None else ("session" if e.ref is not None and e.ref() is not None else "disk"),
+                    "hits": e.hits,
+                    "idle_s": round(now - e.last_access, 1),
+                }
+                for key, e in self._entries.items()
+            ]
+            return {
+                "used_mb": round(self._used / 2**20, 2),
+                "budget_mb": round(self.budget_bytes / 2**20, 2),
+                "datasets": len({k[0] for k in self._entries}),
+                **self.counters,
+                "entries": rows,
+            }
+
+
+_STORE: DatasetStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_dataset_store() -> DatasetStore:
+    """DatasetStore dùng chung cho cả tiến trình (mọi phiên Streamlit)."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = DatasetStore()
+                atexit.register(shutil.rmtree, _STORE.spill_dir, ignore_errors=True)
+    return _STORE
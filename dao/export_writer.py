@@ -0,0 +1,177 @@
+# dao/export_writer.py
+"""
+Ghi kết quả (phân khúc khách hàng, kế hoạch nhập hàng, dự báo) ra CSV hoặc Parquet theo từng khối
+dòng, với schema cố định cho mỗi loại và metadata của lượt chạy (dataset, tham số, mô hình, thời gian).
+
+Mỗi khối được ép về schema rồi ghi ngay, nên bộ nhớ phụ chỉ cỡ một khối (không dựng cả chuỗi CSV
+hay bảng Arrow của toàn bộ kết quả). Ghi ra đường dẫn thì ghi vào file tạm rồi đổi tên, để tiến
+trình đọc (VD: job nhập CRM hằng đêm) không bao giờ thấy file dở dang.
+  - Parquet: metadata nằm trong footer của file (khoá "dss.export")
+  - CSV: metadata nằm ở file đi kèm <đường dẫn>.meta.json
+"""
+import io
+import itertools
+import json
+import os
+from typing import Iterable
+
+import pandas as pd
+
+from services.lazy_imports import lazy_import
+
+EXPORT_SCHEMA_VERSION = 1
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_CHUNK_ROWS = int(os.environ.get("DSS_EXPORT_CHUNK_ROWS", "100000"))
+METADATA_KEY = b"dss.export"
+
+# Cột và kiểu của từng loại kết quả; cột Partition (nếu có) luôn đứng đầu
+EXPORT_SCHEMAS: dict[str, list[tuple[str, str]]] = {
+    "segments": [
+        ("CustomerID", "string"),
+        ("LastPurchase", "timestamp"),
+        ("Recency", "int64"),
+        ("Frequency", "int64"),
+        ("Monetary", "float64"),
+        ("AvgSpend", "float64"),
+        ("Cluster", "int64"),
+        ("Segment", "string"),
+    ],
+    "order_plan": [
+        ("Description", "string"),
+        ("Quantity", "int64"),
+        ("UnitPrice", "float64"),
+        ("ProfitPerUnit", "float64"),
+        ("OrderQty", "int64"),
+        ("TotalCost", "float64"),
+        ("ExpectedProfit", "float64"),
+    ],
+    "forecast": [
+        ("Keyword", "string"),
+        ("Model", "string"),
+        ("Month", "timestamp"),
+        ("Kind", "string"),
+        ("Revenue", "float64"),
+    ],
+}
+PARTITION_COLUMN = ("Partition", "string")
+
+_PANDAS_TYPES = {"string": "string", "int64": "int64", "float64": "float64", "timestamp": "datetime64[ns]"}
+
+
+def export_columns(kind: str, frame_columns) -> list[tuple[str, str]]:
+    if kind not in EXPORT_SCHEMAS:
+        raise ValueError(f"Không có loại kết quả '{kind}'. Chọn một trong: {', '.join(EXPORT_SCHEMAS)}")
+    columns = EXPORT_SCHEMAS[kind]
+    return [PARTITION_COLUMN, *columns] if PARTITION_COLUMN[0] in frame_columns else columns
+
+
+def _conform(chunk: pd.DataFrame, columns: list[tuple[str, str]]) -> pd.DataFrame:
+    """Chọn và sắp các cột theo schema, ép kiểu; thiếu cột bắt buộc thì báo ValueError."""
+    missing = [name for name, _ in columns if name not in chunk.columns]
+    if missing:
+        raise ValueError(f"Thiếu cột khi xuất: {', '.join(missing)}")
+    out = chunk[[name for name, _ in columns]].astype({name: _PANDAS_TYPES[kind] for name, kind in columns})
+    return out.reset_index(drop=True)
+
+
+def _arrow_schema(columns: list[tuple[str, str]], metadata: dict):
+    pa = lazy_import("pyarrow")
+    types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64(), "timestamp": pa.timestamp("ns")}
+    return pa.schema(
+        [pa.field(name, types[kind]) for name, kind in columns],
+        metadata={METADATA_KEY: json.dumps(metadata, ensure_ascii=False, default=str).encode("utf-8")}
+    )
+
+
+def iter_chunks(data: pd.DataFrame | Iterable[pd.DataFrame], chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Chia DataFrame thành các lát cắt chunk_rows dòng (không sao chép); iterator khối được trả nguyên."""
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, max(len(data), 1), chunk_rows):
+            yield data.iloc[start:start + chunk_rows]
+    else:
+        yield from data
+
+
+def write_export(
+    data: pd.DataFrame | Iterable[pd.DataFrame],
+    target,
+    kind: str,
+    metadata: dict,
+    fmt: str = "csv",
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> dict:
+    """
+    Ghi `data` (DataFrame hoặc iterator các khối DataFrame) ra `target` (đường dẫn hoặc file nhị phân
+    đang mở) theo schema của `kind`. Trả về metadata đã ghi (thêm kind, format, schema, rows).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Định dạng '{fmt}' không hỗ trợ. Chọn một trong: {', '.join(EXPORT_FORMATS)}")
+    chunks = iter_chunks(data, chunk_rows)
+    first = next(chunks, None)
+    if first is None:
+        raise ValueError("Không có dữ liệu để xuất.")
+    columns = export_columns(kind, first.columns)
+    metadata = {
+        **metadata,
+        "kind": kind,
+        "format": fmt,
+        "schema_version": EXPORT_SCHEMA_VERSION,
+        "schema": dict(columns),
+    }
+    if isinstance(data, pd.DataFrame):
+        metadata["rows"] = len(data)
+
+    if not isinstance(target, (str, os.PathLike)):
+        _write_chunks([first], chunks, target, columns, metadata, fmt)
+        return metadata
+
+    tmp = f"{target}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            _write_chunks([first], chunks, f, columns, metadata, fmt)
+        if fmt == "csv":
+            # Metadata có trước khi file dữ liệu xuất hiện ở đường dẫn đích
+            with open(f"{target}.meta.json", "w", encoding="utf-8") as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return metadata
+
+
+def _write_chunks(head: list, rest, sink, columns, metadata: dict, fmt: str):
+    chunks = itertools.chain(head, rest)
+    if fmt == "parquet":
+        pa = lazy_import("pyarrow")
+        pq = lazy_import("pyarrow.parquet")
+        schema = _arrow_schema(columns, metadata)
+        with pq.ParquetWriter(sink, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pandas(_conform(chunk, columns), schema=schema, preserve_index=False))
+        return
+
+    text = io.TextIOWrapper(sink, encoding="utf-8", newline="")
+    try:
+        for i, chunk in enumerate(chunks):
+            _conform(chunk, columns).to_csv(text, index=False, header=(i == 0), date_format="%Y-%m-%d %H:%M:%S")
+        text.flush()
+    finally:
+        # Trả lại sink cho nơi gọi (không đóng file/BytesIO cùng với TextIOWrapper)
+        text.detach()
+
+
+def export_bytes(data: pd.DataFrame, kind: str, metadata: dict, fmt: str = "csv") -> bytes:
+    """Nội dung file xuất (cho nút tải xuống trên giao diện)."""
+    sink = io.BytesIO()
+    write_export(data, sink, kind, metadata, fmt)
+    return sink.getvalue()
+
+
+def read_export_metadata(path: str) -> dict:
+    """Metadata của một file đã xuất (footer Parquet hoặc file .meta.json đi kèm CSV)."""
+    if path.endswith(".parquet"):
+        pq = lazy_import("pyarrow.parquet")
+        return json.loads(pq.read_schema(path).metadata[METADATA_KEY])
+    with open(f"{path}.meta.json", encoding="utf-8") as f:
+        return json.load(f)
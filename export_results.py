@@ -0,0 +1,118 @@
+# export_results.py
+"""
+Xuất kết quả DSS ra file cho hệ thống khác (VD: job nhập CRM hằng đêm), dùng cùng bộ ghi với giao diện.
+
+    python export_results.py --data data.csv --kind segments --k 4 --out segments.parquet
+    python export_results.py --data data.csv --kind order_plan --keyword CANDLE --budget 1000 --out plan.csv
+    python export_results.py --data data.csv --kind forecast --keyword CANDLE --keyword MUG --out forecast.parquet
+    python export_results.py ... --partition Country      # chạy riêng từng quốc gia, thêm cột Partition
+
+Định dạng lấy theo đuôi file (.csv / .parquet) hoặc --format. CSV kèm file <out>.meta.json.
+"""
+import argparse
+import logging
+import sys
+import time
+
+import pandas as pd
+
+from dao.data_loader import read_dataset_file, dataset_fingerprint
+from dao.export_writer import EXPORT_FORMATS, EXPORT_SCHEMAS, write_export
+from services.export_service import forecast_frame, run_metadata
+from services.forecasting_service import ForecastModel
+from services.optimization_service import preprocess_optimization_data, run_optimization
+from services.partition_service import (
+    PARTITION_KEY, partitioned_segmentation, partitioned_optimization, partitioned_forecast
+)
+from services.segmentation_service import segment_customers, segment_assignments
+
+logger = logging.getLogger("dss.export")
+
+
+def _segments(df_raw, args):
+    if args.partition:
+        out = partitioned_segmentation(df_raw, args.partition, args.k)
+        return None if out is None else out["customers"], "KMeans"
+    out = segment_customers(df_raw, args.k)
+    if out is None or out["summary"] is None:
+        return None, "KMeans"
+    return segment_assignments(out), "KMeans"
+
+
+def _order_plan(df_raw, args):
+    keyword = args.keyword[0]
+    if args.partition:
+        out = partitioned_optimization(df_raw, args.partition, keyword, args.budget, args.months)
+        return None if out is None else out["plan"], "Linear Programming (HiGHS)"
+    processed = preprocess_optimization_data(df_raw, keyword, args.months, dataset_fingerprint(df_raw))
+    if processed is None or processed.empty:
+        return None, "Linear Programming (HiGHS)"
+    plan, _, _, _ = run_optimization(processed, args.budget)
+    return plan, "Linear Programming (HiGHS)"
+
+
+def _forecasts(df_raw, args):
+    frames = []
+    for keyword in args.keyword:
+        model = ForecastModel(keyword, args.history_months, args.forecast_months, args.capital_cost, args.mape_threshold)
+        if args.partition:
+            out = partitioned_forecast(df_raw, args.partition, model)
+            frames.extend(
+                forecast_frame(result).assign(**{PARTITION_KEY: label})
+                for label, result in ({} if out is None else out["results"]).items()
+            )
+            continue
+        result = model.run(df_raw)[0]
+        if result is None:
+            logger.warning("Bỏ qua từ khóa '%s': không có dữ liệu hợp lệ", keyword)
+            continue
+        frames.append(forecast_frame(result))
+    model = "ForecastModel (baseline → ARIMA → SARIMA → Prophet)"
+    return (pd.concat(frames, ignore_index=True) if frames else None), model
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Xuất kết quả DSS ra CSV/Parquet")
+    parser.add_argument("--data", required=True, help="File CSV giao dịch")
+    parser.add_argument("--kind", required=True, choices=tuple(EXPORT_SCHEMAS))
+    parser.add_argument("--out", required=True, help="Đường dẫn file xuất (.csv hoặc .parquet)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="Mặc định: theo đuôi của --out")
+    parser.add_argument("--partition", help="Cột phân vùng (VD: Country)")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--keyword", action="append", help="Từ khóa sản phẩm (lặp lại để dự báo nhiều từ khóa)")
+    parser.add_argument("--budget", type=float, default=1000.0)
+    parser.add_argument("--months", type=int, default=1)
+    parser.add_argument("--history-months", type=int, default=12)
+    parser.add_argument("--forecast-months", type=int, default=6)
+    parser.add_argument("--capital-cost", type=float, default=1.0)
+    parser.add_argument("--mape-threshold", type=float, default=15.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+    args.keyword = args.keyword or ["CANDLE"]
+    df_raw = read_dataset_file(args.data)
+    parameters = {
+        k: v for k, v in vars(args).items() if k not in ("data", "out", "format", "kind")
+    }
+
+    start = time.perf_counter()
+    build = {"segments": _segments, "order_plan": _order_plan, "forecast": _forecasts}[args.kind]
+    data, model = build(df_raw, args)
+    if data is None or data.empty:
+        logger.error("Không có kết quả để xuất (dữ liệu không hợp lệ hoặc không khớp tham số).")
+        return 1
+    metadata = run_metadata(df_raw, parameters, model=model, elapsed_s=time.perf_counter() - start)
+    try:
+        written = write_export(data, args.out, args.kind, metadata, fmt)
+    except ValueError as e:
+        logger.error("Không xuất được: %s", e)
+        return 1
+    logger.info(
+        "Đã ghi %s (%s, %d dòng) trong %.1fs", args.out, fmt, written["rows"], time.perf_counter() - start
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
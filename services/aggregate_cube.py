@@ -0,0 +1,171 @@
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from services.lazy_imports import lazy_import
+from services.profiling import profiled
+from dao.data_loader import dataset_artefact
+
+
+@dataclass
+class AggregateCube:
+    """
+    Khối tổng hợp dựng một lần cho mỗi dataset, trong một lượt duyệt df_raw. Các service đọc
+    lát cắt của khối (vài nghìn dòng) thay vì lọc/groupby lại hàng triệu dòng giao dịch.
+      - months: nhãn cuối tháng (như resample('M')) từ tháng sớm nhất đến muộn nhất có ngày hợp lệ
+      - products: Description (đã sắp xếp); customers: CustomerID dạng chuỗi (đã sắp xếp)
+      - product_*: ma trận thưa n_products × n_months trên dòng bán hợp lệ
+        (Quantity > 0, UnitPrice > 0, InvoiceDate đọc được) — doanh thu, số lượng, số hoá đơn
+      - customer_*: ma trận thưa n_customers × n_months trên dòng mua của khách
+        (CustomerID có, Quantity > 0, InvoiceDate đọc được) — doanh thu, số lượng, số hoá đơn
+      - customer_last_purchase: lần mua cuối của từng khách; rfm_reference: ngày mua cuối + 1 ngày
+      - order_*: vector theo sản phẩm trên dòng đặt hàng (không phải hoá đơn huỷ, Quantity > 0,
+        không phụ thuộc ngày) — tổng số lượng, tổng UnitPrice và số dòng (để lấy giá trung bình)
+    Số hoá đơn đếm mỗi cặp (sản phẩm/khách, InvoiceNo) một lần, vào tháng của dòng đầu tiên,
+    nên cộng theo tháng cho đúng số hoá đơn khác nhau.
+    """
+    months: pd.DatetimeIndex
+    products: np.ndarray
+    customers: np.ndarray
+    product_revenue: object
+    product_quantity: object
+    product_invoices: object
+    customer_revenue: object
+    customer_quantity: object
+    customer_invoices: object
+    customer_last_purchase: np.ndarray
+    rfm_reference: pd.Timestamp | None
+    order_quantity: np.ndarray
+    order_price_sum: np.ndarray
+    order_lines: np.ndarray
+
+    def match_products(self, keyword: str) -> np.ndarray:
+        """Chỉ số các sản phẩm có Description chứa `keyword` (chuỗi con literal, không phân biệt hoa thường)."""
+        names = pd.Series(self.products, dtype=object)
+        return np.flatnonzero(names.str.contains(keyword, case=False, regex=False, na=False).values)
+
+    def sales_by_month(self, rows=None) -> tuple[np.ndarray, np.ndarray]:
+        """Doanh thu và số lượng bán theo tháng, cộng trên các sản phẩm `rows` (mặc định: mọi sản phẩm)."""
+        revenue, quantity = self.product_revenue, self.product_quantity
+        if rows is not None:
+            revenue, quantity = revenue[rows], quantity[rows]
+        return np.asarray(revenue.sum(axis=0)).ravel(), np.asarray(quantity.sum(axis=0)).ravel()
+
+
+def active_span(values: np.ndarray) -> slice | None:
+    """Khoảng tháng từ tháng đầu tiên đến tháng cuối cùng có giá trị > 0 (None nếu không có)."""
+    active = np.flatnonzero(values > 0)
+    return slice(int(active[0]), int(active[-1]) + 1) if len(active) else None
+
+
+def _mask(df_raw: pd.DataFrame, columns: list[str]) -> np.ndarray:
+    if not all(col in df_raw.columns for col in columns):
+        return np.zeros(len(df_raw), dtype=bool)
+    return df_raw[columns].notna().all(axis=1).values
+
+
+def _first_pairs(keys: np.ndarray, invoice_codes: np.ndarray) -> np.ndarray:
+    """True tại dòng đầu tiên của mỗi cặp (keys, InvoiceNo); InvoiceNo thiếu (-1) không được đếm."""
+    valid = invoice_codes >= 0
+    # Bỏ dòng thiếu InvoiceNo trước khi so sánh: mã -1 sẽ trùng cặp (keys - 1, mã lớn nhất) của dòng hợp lệ
+    pairs = keys[valid].astype(np.int64) * (int(invoice_codes.max(initial=0)) + 1) + invoice_codes[valid]
+    first = np.zeros(len(invoice_codes), dtype=bool)
+    first[valid] = ~pd.Series(pairs).duplicated().values
+    return first
+
+
+def _matrix(rows: np.ndarray, cols: np.ndarray, weights: np.ndarray, shape: tuple[int, int]):
+    # csr_matrix từ toạ độ (dòng, tháng) tự cộng các phần tử trùng: một lần gom thay cho groupby
+    sparse = lazy_import("scipy.sparse")
+    return sparse.csr_matrix((weights.astype(float), (rows, cols)), shape=shape)
+
+
+@profiled("cube.build")
+def build_cube(df_raw: pd.DataFrame) -> AggregateCube:
+    """Dựng AggregateCube từ df_raw (các cột thiếu chỉ làm phần tương ứng của khối rỗng)."""
+    n = len(df_raw)
+    quantity = pd.to_numeric(df_raw['Quantity'], errors='coerce').values if 'Quantity' in df_raw else np.full(n, np.nan)
+    price = pd.to_numeric(df_raw['UnitPrice'], errors='coerce').values if 'UnitPrice' in df_raw else np.full(n, np.nan)
+
+    # Tháng: phân tích ngày một lần cho cả dataset
+    if 'InvoiceDate' in df_raw:
+        dates = pd.to_datetime(df_raw['InvoiceDate'], errors='coerce')
+    else:
+        dates = pd.Series(pd.NaT, index=df_raw.index, dtype='datetime64[ns]')
+    has_date = dates.notna().values
+    if has_date.any():
+        year_month = dates.dt.year.values * 12 + dates.dt.month.values - 1
+        first, last = int(np.nanmin(year_month)), int(np.nanmax(year_month))
+        month_codes = np.where(has_date, np.nan_to_num(year_month - first, nan=-1), -1).astype(np.int64)
+        months = pd.date_range(
+            pd.Timestamp(year=first // 12, month=first % 12 + 1, day=1),
+            periods=last - first + 1, freq='M', name='InvoiceDate'
+        )
+    else:
+        month_codes = np.full(n, -1, dtype=np.int64)
+        months = pd.DatetimeIndex([], freq='M', name='InvoiceDate')
+    n_months = len(months)
+
+    if 'InvoiceNo' in df_raw:
+        invoice_codes, _ = pd.factorize(df_raw['InvoiceNo'])
+    else:
+        invoice_codes = np.full(n, -1, dtype=np.int64)
+    positive = np.nan_to_num(quantity, nan=0.0) > 0
+
+    # Sản phẩm × tháng (dòng bán hợp lệ)
+    if 'Description' in df_raw:
+        product_codes, products = pd.factorize(df_raw['Description'], sort=True)
+        products = np.asarray(products, dtype=object)
+    else:
+        product_codes, products = np.full(n, -1, dtype=np.int64), np.array([], dtype=object)
+    sales = (product_codes >= 0) & positive & (np.nan_to_num(price, nan=0.0) > 0) & has_date
+    p, m = product_codes[sales], month_codes[sales]
+    shape = (len(products), n_months)
+    first_invoice = _first_pairs(p, invoice_codes[sales])
+    product_revenue = _matrix(p, m, quantity[sales] * price[sales], shape)
+    product_quantity = _matrix(p, m, quantity[sales], shape)
+    product_invoices = _matrix(p[first_invoice], m[first_invoice], np.ones(first_invoice.sum()), shape)
+
+    # Khách hàng × tháng (dòng mua của khách, như bảng RFM)
+    buying = _mask(df_raw, ['CustomerID']) & positive & has_date
+    customer_codes, customers = pd.factorize(df_raw.loc[buying, 'CustomerID'].astype(str), sort=True)
+    customers = np.asarray(customers, dtype=object)
+    m = month_codes[buying]
+    shape = (len(customers), n_months)
+    first_invoice = _first_pairs(customer_codes, invoice_codes[buying])
+    # Monetary bỏ qua dòng thiếu UnitPrice (như sum() của pandas)
+    customer_revenue = _matrix(customer_codes, m, np.nan_to_num(quantity[buying] * price[buying]), shape)
+    customer_quantity = _matrix(customer_codes, m, quantity[buying], shape)
+    customer_invoices = _matrix(
+        customer_codes[first_invoice], m[first_invoice], np.ones(first_invoice.sum()), shape
+    )
+    stamps = dates.values[buying].astype(np.int64)
+    last_purchase = np.full(len(customers), np.iinfo(np.int64).min)
+    np.maximum.at(last_purchase, customer_codes, stamps)
+    rfm_reference = pd.Timestamp(stamps.max()) + pd.Timedelta(days=1) if len(stamps) else None
+
+    # Dòng đặt hàng theo sản phẩm (cho tối ưu nhập hàng; không cần ngày hợp lệ)
+    ordering = _mask(df_raw, ['Description', 'Quantity', 'UnitPrice', 'InvoiceNo']) & positive
+    if ordering.any():
+        ordering &= ~df_raw['InvoiceNo'].astype(str).str.startswith('C').values
+    p = product_codes[ordering]
+    return AggregateCube(
+        months=months,
+        products=products,
+        customers=customers,
+        product_revenue=product_revenue,
+        product_quantity=product_quantity,
+        product_invoices=product_invoices,
+        customer_revenue=customer_revenue,
+        customer_quantity=customer_quantity,
+        customer_invoices=customer_invoices,
+        customer_last_purchase=last_purchase.astype('datetime64[ns]'),
+        rfm_reference=rfm_reference,
+        order_quantity=np.bincount(p, weights=quantity[ordering], minlength=len(products)),
+        order_price_sum=np.bincount(p, weights=price[ordering], minlength=len(products)),
+        order_lines=np.bincount(p, minlength=len(products)),
+    )
+
+
+def aggregate_cube(df_raw: pd.DataFrame) -> AggregateCube:
+    """build_cube(df_raw) lấy từ kho dataset dùng chung (dựng một lần cho mỗi dataset)."""
+    return dataset_artefact(df_raw, "cube", build_cube)
@@ -0,0 +1,32 @@
+import pandas as pd
+from datetime import datetime, timezone
+from dao.data_loader import dataset_fingerprint
+from services.forecasting_service import ForecastResult
+
+# Bảng kết quả theo từng loại xuất (schema ở dao/export_writer.EXPORT_SCHEMAS)
+
+
+def forecast_frame(result: ForecastResult) -> pd.DataFrame:
+    """Dạng dài: mỗi tháng lịch sử (Kind=history) và dự báo (Kind=forecast) là một dòng."""
+    frames = [
+        pd.DataFrame({'Month': series.index, 'Kind': kind, 'Revenue': series.values})
+        for kind, series in (("history", result.monthly), ("forecast", result.forecast_series))
+    ]
+    return pd.concat(frames, ignore_index=True).assign(Keyword=result.keyword, Model=result.model_label)
+
+
+def run_metadata(
+    df_raw: pd.DataFrame,
+    parameters: dict,
+    model: str | None = None,
+    elapsed_s: float | None = None
+) -> dict:
+    """Metadata của một lượt chạy: dataset, tham số, mô hình và thời gian chạy."""
+    return {
+        "dataset": dataset_fingerprint(df_raw),
+        "dataset_rows": len(df_raw),
+        "parameters": parameters,
+        "model": model,
+        "elapsed_s": None if elapsed_s is None else round(elapsed_s, 3),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
@@ -1,154 +1,395 @@
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.arima.model import ARIMA
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-from prophet import Prophet
-from sklearn.metrics import mean_absolute_percentage_error
+import hashlib
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from services.lazy_imports import lazy_import
+from services.process_pools import get_process_pool, retire_process_pool
+from services.profiling import profiled
+from services.aggregate_cube import aggregate_cube, active_span
 
-class ForecastModel:
-    def __init__(
-        self,
-        df_raw: pd.DataFrame,
-        keyword: str,
-        history_months: int,
-        forecast_months: int,
-        capital_cost: float,
-        mape_threshold: float
-    ):
-        self.df_raw = df_raw.copy()
-        self.keyword = keyword
-        self.history_months = history_months
-        self.forecast_months = forecast_months
-        self.capital_cost = capital_cost
-        self.mape_threshold = mape_threshold
+# statsmodels / Prophet chỉ được import khi thật sự fit mô hình tương ứng,
+# để tầng baseline NumPy bên dưới không phải trả chi phí import.
 
-        self.model_name: str = ""
-        self.mape: float = 0.0
-        self.total_revenue: float = 0.0
-        self.gross_profit: float = 0.0
-        self.avg_unit_price: float = 0.0
-
-        self.monthly: pd.Series = pd.Series(dtype=float)
-        self.forecast_series: pd.Series = pd.Series(dtype=float)
-
-    def preprocess(self) -> bool:
-        required = ['Description', 'Quantity', 'UnitPrice', 'InvoiceDate']
-        if not all(col in self.df_raw.columns for col in required):
-            return False
-
-        df = self.df_raw.dropna(subset=required).copy()
-        df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], errors='coerce')
-        df = df.dropna(subset=['InvoiceDate'])
-        df = df[df['Quantity'] > 0]
-        df = df[df['UnitPrice'] > 0]
-        df = df[df['Description'].str.contains(self.keyword, case=False, na=False)]
-        if df.empty:
-            return False
-
-        df['Revenue'] = df['Quantity'] * df['UnitPrice']
-        total_qty = df['Quantity'].sum()
-        self.avg_unit_price = (df['Revenue'].sum() / total_qty) if total_qty > 0 else 0.0
-
-        df.set_index('InvoiceDate', inplace=True)
-        monthly_rev = df['Revenue'].resample('M').sum()
-        if monthly_rev.empty:
-            return False
+SEASON_LENGTH = 12
+_EPS = np.finfo(np.float64).eps
+_SES_ALPHAS = np.linspace(0.1, 0.9, 9)
+_HOLT_ALPHAS, _HOLT_BETAS = (a.ravel() for a in np.meshgrid(np.linspace(0.1, 0.9, 5), np.linspace(0.05, 0.45, 5)))
 
-        # Chỉ giữ lịch sử history_months
-        if len(monthly_rev) >= self.history_months:
-            self.monthly = monthly_rev[-self.history_months:]
-        else:
-            self.monthly = monthly_rev
-        return True
 
-    def forecast(self, model_type: str):
-        """
-        1) Dự báo trên train để tính MAPE
-        2) Refit trên toàn bộ lịch sử để forecast thật
-        3) Tính total_revenue & gross_profit
-        """
-        # --- 1) split train/test để tính MAPE ---
-        if len(self.monthly) > self.forecast_months:
-            train = self.monthly[:-self.forecast_months]
-            test  = self.monthly[-self.forecast_months:]
-        else:
-            train = self.monthly
-            test  = pd.Series(dtype=float)
+def mape_percent(actual, pred) -> np.ndarray:
+    """
+    MAPE (%) theo trục cuối, cùng công thức với sklearn
+    (mẫu số chặn dưới bởi eps). Hỗ trợ nhiều chuỗi cùng lúc.
+    """
+    actual = np.asarray(actual, dtype=float)
+    pred = np.asarray(pred, dtype=float)
+    return np.mean(np.abs(actual - pred) / np.maximum(np.abs(actual), _EPS), axis=-1) * 100
 
-        mt = model_type.upper()
-        # Forecast trên train
-        if mt == "ARIMA":
-            self._arima_forecast(train)
-        elif mt == "SARIMA":
-            self._sarima_forecast(train)
-        elif mt == "PROPHET":
-            self._prophet_forecast_from(train)
-        else:
-            raise ValueError(f"Unknown model type: {model_type}")
 
-        # Lưu lại kết quả dự báo trên train để tính MAPE
-        mape_preds = self.forecast_series.copy()
-        if not test.empty:
-            self.mape = mean_absolute_percentage_error(test.values, mape_preds.values[:len(test)]) * 100
-        else:
-            self.mape = 0.0
+# --- Tầng baseline NumPy: mỗi hàm nhận ma trận Y (n_chuỗi × T) và trả về (n_chuỗi × horizon) ---
 
-        # Gán model_name
-        self.model_name = mt
+def seasonal_naive_forecast(Y: np.ndarray, horizon: int, season: int = SEASON_LENGTH) -> np.ndarray:
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    if Y.shape[1] < season:
+        return np.full((Y.shape[0], horizon), np.nan)
+    return Y[:, -season:][:, np.arange(horizon) % season]
 
-        # --- 2) refit trên full history để forecast thật ---
-        if mt == "ARIMA":
-            self._arima_forecast(self.monthly)
-        elif mt == "SARIMA":
-            self._sarima_forecast(self.monthly)
-        else:  # PROPHET
-            self._prophet_forecast()
 
-        # --- 3) Tính tổng và profit ---
-        self.total_revenue = float(self.forecast_series.sum())
-        if self.avg_unit_price > 0:
-            total_units     = self.total_revenue / self.avg_unit_price
-            self.gross_profit = self.total_revenue - total_units * self.capital_cost
+def moving_average_forecast(Y: np.ndarray, horizon: int, window: int = 3) -> np.ndarray:
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    level = Y[:, -min(window, Y.shape[1]):].mean(axis=1)
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+def drift_forecast(Y: np.ndarray, horizon: int) -> np.ndarray:
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    T = Y.shape[1]
+    slope = (Y[:, -1] - Y[:, 0]) / (T - 1) if T > 1 else np.zeros(Y.shape[0])
+    return Y[:, -1, None] + slope[:, None] * np.arange(1, horizon + 1)
+
+
+def ses_forecast(Y: np.ndarray, horizon: int) -> np.ndarray:
+    """Simple exponential smoothing, alpha chọn theo SSE một bước cho từng chuỗi."""
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    n = Y.shape[0]
+    level = np.repeat(Y[:, :1], len(_SES_ALPHAS), axis=1)
+    sse = np.zeros_like(level)
+    for t in range(1, Y.shape[1]):
+        err = Y[:, t, None] - level
+        sse += err ** 2
+        level = level + _SES_ALPHAS * err
+    best = level[np.arange(n), sse.argmin(axis=1)]
+    return np.repeat(best[:, None], horizon, axis=1)
+
+
+def holt_forecast(Y: np.ndarray, horizon: int) -> np.ndarray:
+    """Holt (xu hướng tuyến tính), lưới (alpha, beta) chọn theo SSE một bước cho từng chuỗi."""
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    n, T = Y.shape
+    if T < 3:
+        return np.full((n, horizon), np.nan)
+    level = np.repeat(Y[:, :1], len(_HOLT_ALPHAS), axis=1)
+    trend = np.repeat(Y[:, 1:2] - Y[:, :1], len(_HOLT_ALPHAS), axis=1)
+    sse = np.zeros_like(level)
+    for t in range(1, T):
+        fc = level + trend
+        err = Y[:, t, None] - fc
+        sse += err ** 2
+        level = fc + _HOLT_ALPHAS * err
+        trend = trend + _HOLT_ALPHAS * _HOLT_BETAS * err
+    best = sse.argmin(axis=1)
+    rows = np.arange(n)
+    return level[rows, best, None] + trend[rows, best, None] * np.arange(1, horizon + 1)
+
+
+BASELINE_METHODS = {
+    "SEASONAL_NAIVE": seasonal_naive_forecast,
+    "MOVING_AVERAGE": moving_average_forecast,
+    "DRIFT": drift_forecast,
+    "SES": ses_forecast,
+    "HOLT": holt_forecast,
+}
+
+
+def _baseline_mapes(train: np.ndarray, test: np.ndarray) -> np.ndarray:
+    """MAPE (%) của mọi baseline trên `test` khi dự báo từ `train`: mảng (số chuỗi, số phương pháp)."""
+    h = test.shape[1]
+    mapes = np.stack([mape_percent(test, fn(train, h)) for fn in BASELINE_METHODS.values()], axis=1)
+    return np.where(np.isfinite(mapes), mapes, np.inf)
+
+
+def select_baselines(Y: np.ndarray, horizon: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Chọn baseline tốt nhất cho từng chuỗi rồi dự báo `horizon` tháng tới trên toàn bộ lịch sử.
+    Phương pháp được chọn trên tập kiểm định trong (`horizon` tháng ngay trước tập kiểm tra),
+    còn MAPE báo cáo tính trên `horizon` tháng cuối – dữ liệu không dùng để chọn.
+    Trả về (tên phương pháp, MAPE %, dự báo) – mỗi mảng một dòng cho một chuỗi.
+    Lịch sử không đủ cho tập kiểm định trong: dùng SES; không dài hơn horizon: thêm MAPE = 0.
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    n = Y.shape[0]
+    names = np.array(list(BASELINE_METHODS))
+    rows = np.arange(n)
+
+    best = np.full(n, list(BASELINE_METHODS).index("SES"))
+    best_mape = np.zeros(n)
+    if Y.shape[1] > horizon:
+        train, test = Y[:, :-horizon], Y[:, -horizon:]
+        if train.shape[1] > horizon:
+            best = _baseline_mapes(train[:, :-horizon], train[:, -horizon:]).argmin(axis=1)
+        best_mape = _baseline_mapes(train, test)[rows, best]
+
+    forecasts = np.stack([fn(Y, horizon) for fn in BASELINE_METHODS.values()], axis=0)
+    return names[best], best_mape, forecasts[best, rows]
+
+# Cột cần có để dự báo theo từ khóa và dự báo phân cấp (dữ liệu đọc từ khối tổng hợp)
+SALES_COLUMNS = ['Description', 'Quantity', 'UnitPrice', 'InvoiceDate']
+
+
+# --- Danh mục sản phẩm cho tab Thiết lập ---
+
+@profiled("forecasting.product_summary")
+def build_product_summary(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bảng tóm tắt một dòng mỗi sản phẩm, tính một lần cho mỗi dataset:
+      Description, TotalQuantity, MinPrice, MaxPrice, Rows
+    Tìm kiếm theo từ khóa chạy trên bảng này (vài nghìn dòng) thay vì trên df_raw.
+    """
+    required = ['Description', 'Quantity', 'UnitPrice']
+    if df_raw is None or not all(col in df_raw.columns for col in required):
+        return pd.DataFrame(columns=['Description', 'TotalQuantity', 'MinPrice', 'MaxPrice', 'Rows'])
+    return (
+        df_raw.groupby('Description', sort=True)
+              .agg(
+                  TotalQuantity=('Quantity', 'sum'),
+                  MinPrice=('UnitPrice', 'min'),
+                  MaxPrice=('UnitPrice', 'max'),
+                  Rows=('Quantity', 'size')
+              )
+              .reset_index()
+    )
+
+
+def search_products(summary: pd.DataFrame, keyword: str, limit: int) -> tuple[pd.DataFrame, int]:
+    """
+    Lọc bảng tóm tắt theo từ khóa (không phân biệt hoa thường).
+    Trả về (tối đa `limit` dòng, sắp theo TotalQuantity giảm dần; tổng số sản phẩm khớp).
+    """
+    mask = summary['Description'].str.contains(keyword, case=False, regex=False, na=False)
+    matched = summary[mask]
+    return matched.nlargest(limit, 'TotalQuantity').reset_index(drop=True), int(mask.sum())
+
+
+# --- Tự động chọn bậc ARIMA/SARIMA ---
+
+DEFAULT_ARIMA_ORDER = (1, 1, 1)
+DEFAULT_SEASONAL_ORDER = (1, 1, 1, SEASON_LENGTH)
+ORDER_SEARCH_TIME_BUDGET = 20.0  # giây
+ORDER_SEARCH_PRUNE_MARGIN = 4.0  # AIC
+ORDER_SEARCH_WORKERS = int(os.environ.get("DSS_ORDER_SEARCH_WORKERS", str(min(os.cpu_count() or 1, 4))))
+ORDER_CACHE_SIZE = int(os.environ.get("DSS_ORDER_CACHE_SIZE", "256"))
+# Mức ý nghĩa của kiểm định KPSS (chọn d) và ngưỡng độ mạnh mùa vụ STL (chọn D), như auto.arima
+KPSS_ALPHA = 0.05
+SEASONAL_STRENGTH_THRESHOLD = 0.64
+# Nối tiếp (extend) kết quả ARIMA/SARIMA trên train thay vì refit chỉ khi tập train có ít nhất
+# chừng này quan sát hiệu dụng cho mỗi tham số (nghiệm đủ xác định để dùng cho toàn bộ lịch sử)
+EXTEND_OBS_PER_PARAM = 2
+
+# Bậc đã chọn theo dấu vân tay chuỗi (LRU, tối đa ORDER_CACHE_SIZE mục):
+# (fingerprint, seasonal) -> (order, seasonal_order)
+_ORDER_CACHE: OrderedDict[tuple[str, bool], tuple[tuple, tuple | None]] = OrderedDict()
+_ORDER_CACHE_LOCK = threading.Lock()
+# Tên pool tiến trình dùng chung (services.process_pools) cho các lượt tìm bậc
+ORDER_POOL = "order_search"
+
+
+def series_fingerprint(series: pd.Series) -> str:
+    h = hashlib.sha1(np.ascontiguousarray(series.values, dtype=float).tobytes())
+    h.update(np.asarray(series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else series.index).tobytes())
+    return h.hexdigest()
+
+
+def _candidate_aic(values: np.ndarray, order: tuple, seasonal_order: tuple | None) -> float:
+    """Chạy trong tiến trình con: fit một ứng viên và trả về AIC (inf nếu lỗi)."""
+    import warnings
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            res = SARIMAX(
+                values,
+                order=order,
+                seasonal_order=seasonal_order or (0, 0, 0, 0),
+                enforce_stationarity=False,
+                enforce_invertibility=False
+            ).fit(disp=False)
+        return float(res.aic) if np.isfinite(res.aic) else np.inf
+    except Exception:
+        return np.inf
+
+
+def _seasonal_strength(values: np.ndarray) -> float:
+    """Độ mạnh mùa vụ F_s = max(0, 1 - Var(R) / Var(S + R)) từ phân rã STL."""
+    STL = lazy_import("statsmodels.tsa.seasonal").STL
+    res = STL(values, period=SEASON_LENGTH).fit()
+    total = np.var(res.seasonal + res.resid)
+    return max(0.0, 1.0 - np.var(res.resid) / total) if total > 0 else 0.0
+
+
+def differencing_orders(values: np.ndarray, seasonal: bool, max_d: int = 1, max_D: int = 1) -> tuple[int, int]:
+    """
+    Chọn bậc sai phân trước khi tìm theo AIC (AIC không so sánh được giữa các d/D khác nhau):
+      - D = 1 nếu độ mạnh mùa vụ STL vượt SEASONAL_STRENGTH_THRESHOLD,
+      - d = số lần sai phân (tối đa max_d) đến khi KPSS không bác bỏ tính dừng ở mức KPSS_ALPHA.
+    Chuỗi quá ngắn cho kiểm định: dùng bậc mặc định.
+    """
+    import warnings
+    kpss = lazy_import("statsmodels.tsa.stattools").kpss
+    values = np.asarray(values, dtype=float)
+
+    D = 0
+    if seasonal:
+        if len(values) >= 2 * SEASON_LENGTH + 1:
+            D = int(max_D > 0 and _seasonal_strength(values) > SEASONAL_STRENGTH_THRESHOLD)
         else:
-            self.gross_profit = 0.0
+            D = min(DEFAULT_SEASONAL_ORDER[1], max_D)
+        if D:
+            values = values[SEASON_LENGTH:] - values[:-SEASON_LENGTH]
 
-    def _arima_forecast(self, series: pd.Series):
-        res = ARIMA(series, order=(1,1,1)).fit()
-        fc  = res.forecast(steps=self.forecast_months)
-        last = series.index[-1]
-        idx  = pd.date_range(last + pd.offsets.MonthEnd(), periods=self.forecast_months, freq='M')
-        self.forecast_series = pd.Series(fc.values, index=idx)
+    if len(values) < 8:
+        return min(DEFAULT_ARIMA_ORDER[1], max_d), D
+    d = 0
+    with warnings.catch_warnings():
+        # KPSS cảnh báo khi p-value nằm ngoài bảng nội suy: giá trị biên vẫn dùng được
+        warnings.simplefilter("ignore")
+        while d < max_d and len(values) >= 8 and np.ptp(values) > 0 and kpss(values, nlags="auto")[1] < KPSS_ALPHA:
+            values = np.diff(values)
+            d += 1
+    return d, D
 
-    def _sarima_forecast(self, series: pd.Series):
-        res = SARIMAX(
-            series,
-            order=(1,1,1),
-            seasonal_order=(1,1,1,12),
-            enforce_stationarity=False,
-            enforce_invertibility=False
-        ).fit(disp=False)
-        fc  = res.forecast(steps=self.forecast_months)
-        last = series.index[-1]
-        idx  = pd.date_range(last + pd.offsets.MonthEnd(), periods=self.forecast_months, freq='M')
-        self.forecast_series = pd.Series(fc.values, index=idx)
-
-    def _prophet_forecast(self):
-        dfp = self.monthly.reset_index().rename(columns={'InvoiceDate':'ds','Revenue':'y'}) \
-              if 'InvoiceDate' in self.monthly.index.names \
-              else self.monthly.reset_index(name='y').rename(columns={'index':'ds'})
-        m = Prophet(); m.fit(dfp)
-        future = m.make_future_dataframe(periods=self.forecast_months, freq='M')
-        pred   = m.predict(future).set_index('ds')['yhat']
-        self.forecast_series = pred[-self.forecast_months:]
-
-    def _prophet_forecast_from(self, series: pd.Series):
-        dfp = series.reset_index().rename(columns={'InvoiceDate':'ds','Revenue':'y'}) \
-              if 'InvoiceDate' in series.index.names \
-              else series.reset_index(name='y').rename(columns={'index':'ds'})
-        m = Prophet(); m.fit(dfp)
-        future = m.make_future_dataframe(periods=self.forecast_months, freq='M')
-        pred   = m.predict(future).set_index('ds')['yhat']
-        self.forecast_series = pred[-self.forecast_months:]
+
+def _order_grid(seasonal: bool, d: int, D: int, max_p: int, max_q: int, max_P: int, max_Q: int):
+    pq = list(itertools.product(range(max_p + 1), range(max_q + 1)))
+    if not seasonal:
+        return [((p, d, q), None) for p, q in pq]
+    PQ = list(itertools.product(range(max_P + 1), range(max_Q + 1)))
+    return [((p, d, q), (P, D, Q, SEASON_LENGTH)) for p, q in pq for P, Q in PQ]
+
+
+def _n_params(candidate: tuple) -> int:
+    (p, _, q), so = candidate
+    return p + q + (so[0] + so[2] if so else 0)
+
+
+def _parents(candidate: tuple) -> list[tuple]:
+    """Các ứng viên ít hơn đúng một tham số AR/MA (cùng bậc sai phân)."""
+    (p, d, q), so = candidate
+    out = []
+    if p: out.append(((p - 1, d, q), so))
+    if q: out.append(((p, d, q - 1), so))
+    if so and so[0]: out.append(((p, d, q), (so[0] - 1, so[1], so[2], so[3])))
+    if so and so[2]: out.append(((p, d, q), (so[0], so[1], so[2] - 1, so[3])))
+    return out
+
+
+def select_order(
+    series: pd.Series,
+    seasonal: bool,
+    max_p: int = 2, max_d: int = 1, max_q: int = 2,
+    max_P: int = 1, max_D: int = 1, max_Q: int = 1,
+    time_budget: float = ORDER_SEARCH_TIME_BUDGET
+) -> tuple[tuple, tuple | None]:
+    """
+    Tìm bậc (p,d,q)(P,D,Q) theo AIC trên lưới giới hạn, fit song song trên pool tiến trình dùng chung.
+    d/D được cố định trước bằng differencing_orders, lưới chỉ duyệt p/q/P/Q.
+    Ứng viên được duyệt theo từng đợt cùng số tham số AR/MA (ít -> nhiều):
+      - bỏ qua ứng viên mà mọi "cha" (ít hơn một tham số) đều kém best quá ORDER_SEARCH_PRUNE_MARGIN,
+      - dừng sớm khi một đợt không cải thiện được best,
+      - dừng khi hết time_budget giây: ứng viên chưa chạy bị huỷ, ứng viên đang chạy không được chờ
+        (pool được thay mới để các fit quá hạn không làm chậm lượt tìm sau).
+    Kết quả được cache (LRU) theo dấu vân tay của chuỗi.
+    """
+    key = (series_fingerprint(series), seasonal)
+    with _ORDER_CACHE_LOCK:
+        if key in _ORDER_CACHE:
+            _ORDER_CACHE.move_to_end(key)
+            return _ORDER_CACHE[key]
+
+    deadline = time.monotonic() + time_budget
+    values = series.values.astype(float)
+    d, D = differencing_orders(values, seasonal, max_d, max_D)
+    default = (
+        (DEFAULT_ARIMA_ORDER[0], d, DEFAULT_ARIMA_ORDER[2]),
+        (DEFAULT_SEASONAL_ORDER[0], D, DEFAULT_SEASONAL_ORDER[2], SEASON_LENGTH) if seasonal else None
+    )
+    grid = _order_grid(seasonal, d, D, max_p, max_q, max_P, max_Q)
+    waves = sorted({_n_params(c) for c in grid})
+    aics: dict[tuple, float] = {}
+    best, best_aic = default, np.inf
+
+    complete = True
+    pool = get_process_pool(ORDER_POOL, ORDER_SEARCH_WORKERS)
+    try:
+        for k in waves:
+            wave = [
+                c for c in grid
+                if _n_params(c) == k and (
+                    k == 0 or any(aics.get(par, np.inf) <= best_aic + ORDER_SEARCH_PRUNE_MARGIN for par in _parents(c))
+                )
+            ]
+            if not wave:
+                break
+            pool = get_process_pool(ORDER_POOL, ORDER_SEARCH_WORKERS)
+            futures = {pool.submit(_candidate_aic, values, *c): c for c in wave}
+            done, pending = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+            for f in pending:
+                f.cancel()
+            if any(f.running() for f in pending):
+                # Fit quá hạn không ngắt được: thay pool để chúng không chiếm chỗ của các lượt tìm sau
+                retire_process_pool(ORDER_POOL, pool)
+            for f in done:
+                if f.cancelled():
+                    # Bị huỷ do lượt tìm khác thay pool: coi như chưa chạy
+                    complete = False
+                else:
+                    aics[futures[f]] = f.result()
+
+            wave_best = min(wave, key=lambda c: aics.get(c, np.inf))
+            improved = aics.get(wave_best, np.inf) < best_aic
+            if improved:
+                best, best_aic = wave_best, aics[wave_best]
+            if pending or not complete or not improved:
+                break
+    except (BrokenProcessPool, RuntimeError):
+        # Tiến trình con chết giữa chừng (hoặc pool vừa bị thay): dùng kết quả đã có, không cache
+        retire_process_pool(ORDER_POOL, pool)
+        return best
+    if not complete:
+        return best
+
+    with _ORDER_CACHE_LOCK:
+        _ORDER_CACHE[key] = best
+        while len(_ORDER_CACHE) > ORDER_CACHE_SIZE:
+            _ORDER_CACHE.popitem(last=False)
+    return best
+
+
+@dataclass
+class ForecastResult:
+    """
+    Kết quả dự báo gọn nhẹ: chỉ giữ chuỗi doanh thu tháng, chuỗi dự báo, các chỉ số
+    và tham số đã fit (không giữ df_raw hay đối tượng mô hình), nên rẻ khi pickle
+    và có thể lưu trong st.session_state hoặc chia sẻ giữa các phiên.
+    """
+    keyword: str
+    forecast_months: int
+    capital_cost: float
+    avg_unit_price: float
+    monthly: pd.Series
+    model_name: str = ""
+    baseline_method: str = ""
+    mape: float = 0.0
+    total_revenue: float = 0.0
+    gross_profit: float = 0.0
+    forecast_series: pd.Series = field(default_factory=lambda: pd.Series(dtype=float))
+    # Bậc ARIMA/SARIMA theo loại mô hình: {"ARIMA": (order, None), "SARIMA": (order, seasonal_order)}
+    orders: dict[str, tuple[tuple, tuple | None]] = field(default_factory=dict)
+    # Tham số đã fit của mô hình cuối cùng (tên -> giá trị)
+    params: dict[str, float | list[float]] = field(default_factory=dict)
+    # Thời gian (giây) của mô hình cuối cùng: {"train": fit trên tập train, "refit": nối tiếp/fit lại trên toàn bộ lịch sử}
+    fit_seconds: dict[str, float] = field(default_factory=dict)
+    backtest_results: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+    @property
+    def model_label(self) -> str:
+        return f"BASELINE ({self.baseline_method})" if self.model_name == "BASELINE" else self.model_name
 
     def get_chart_data(self) -> pd.DataFrame:
         return self.forecast_series.to_frame(name='Forecast')
@@ -178,3 +419,327 @@ class ForecastModel:
         suggestions.append(f"Sử dụng MAPE ({self.mape:.2f}%) để đánh giá độ chính xác mô hình.")
         suggestions.append("Chạy lại mô hình khi có thêm dữ liệu mới để cải thiện độ chính xác.")
         return suggestions
+
+    def to_dict(self) -> dict:
+        """Dạng dict thuần (tháng 'YYYY-MM' -> giá trị) để trả qua API."""
+        def months(series: pd.Series) -> dict[str, float]:
+            return {d.strftime('%Y-%m'): float(v) for d, v in series.items()}
+
+        return {
+            'keyword': self.keyword,
+            'model': self.model_name,
+            'baseline_method': self.baseline_method or None,
+            'mape': float(self.mape),
+            'avg_unit_price': float(self.avg_unit_price),
+            'total_revenue': float(self.total_revenue),
+            'gross_profit': float(self.gross_profit),
+            'history': months(self.monthly),
+            'forecast': months(self.forecast_series),
+            'orders': {k: [list(o) if o else None for o in v] for k, v in self.orders.items()},
+            'fit_seconds': {k: round(v, 3) for k, v in self.fit_seconds.items()},
+        }
+
+
+@dataclass
+class ModelFit:
+    """Một lần fit: dự báo forecast_months tháng, tham số đã fit, thời gian fit và mô hình đã fit (để nối tiếp)."""
+    forecast: pd.Series
+    params: dict[str, float | list[float]]
+    seconds: float
+    model: object = field(default=None, repr=False)
+
+
+class ForecastModel:
+    """
+    Dịch vụ fit dự báo không giữ dữ liệu: đối tượng chỉ chứa cấu hình.
+      - preprocess(df_raw) dựng ForecastResult với chuỗi doanh thu tháng
+      - forecast(result, model_type) trả về ForecastResult mới đã có dự báo
+    """
+    # Số tháng train tối thiểu ở mốc backtest đầu tiên
+    MIN_BACKTEST_TRAIN = 6
+
+    def __init__(
+        self,
+        keyword: str,
+        history_months: int,
+        forecast_months: int,
+        capital_cost: float,
+        mape_threshold: float,
+        auto_order: bool = False
+    ):
+        self.keyword = keyword
+        self.history_months = history_months
+        self.forecast_months = forecast_months
+        self.capital_cost = capital_cost
+        self.mape_threshold = mape_threshold
+        self.auto_order = auto_order
+
+    @profiled("forecasting.preprocess")
+    def preprocess(self, df_raw: pd.DataFrame) -> ForecastResult | None:
+        if df_raw is None or not all(col in df_raw.columns for col in SALES_COLUMNS):
+            return None
+
+        # Doanh thu tháng của các sản phẩm khớp từ khóa là một lát cắt của khối sản phẩm × tháng
+        cube = aggregate_cube(df_raw)
+        revenue, quantity = cube.sales_by_month(cube.match_products(self.keyword))
+        span = active_span(revenue)
+        if span is None:
+            return None
+
+        total_qty = quantity.sum()
+        avg_unit_price = (revenue.sum() / total_qty) if total_qty > 0 else 0.0
+        monthly_rev = pd.Series(revenue[span], index=cube.months[span], name='Revenue')
+
+        # Chỉ giữ lịch sử history_months
+        if len(monthly_rev) >= self.history_months:
+            monthly_rev = monthly_rev[-self.history_months:]
+        return ForecastResult(
+            keyword=self.keyword,
+            forecast_months=self.forecast_months,
+            capital_cost=self.capital_cost,
+            avg_unit_price=float(avg_unit_price),
+            monthly=monthly_rev
+        )
+
+    @profiled("forecasting.forecast")
+    def forecast(self, result: ForecastResult, model_type: str) -> ForecastResult:
+        """
+        1) Dự báo trên train để tính MAPE
+        2) Forecast thật trên toàn bộ lịch sử: ARIMA/SARIMA nối tiếp kết quả fit trên train (không fit lại),
+           PROPHET fit lại
+        3) Tính total_revenue & gross_profit
+        BASELINE: chọn baseline NumPy tốt nhất (seasonal naive, MA, drift, SES, Holt)
+        trong một lượt vector hoá, không cần statsmodels/Prophet.
+        Trả về ForecastResult mới; `result` đầu vào không bị thay đổi.
+        """
+        mt = model_type.upper()
+        monthly = result.monthly
+        out = replace(result, orders=dict(result.orders), params={}, baseline_method="", fit_seconds={})
+
+        if mt == "BASELINE":
+            method, mape, fc = select_baselines(monthly.values, self.forecast_months)
+            out.baseline_method = str(method[0])
+            out.mape = float(mape[0])
+            out.forecast_series = pd.Series(fc[0], index=self._future_index(monthly))
+        else:
+            # --- 1) split train/test để tính MAPE ---
+            if len(monthly) > self.forecast_months:
+                train = monthly[:-self.forecast_months]
+                test  = monthly[-self.forecast_months:]
+            else:
+                train = monthly
+                test  = pd.Series(dtype=float)
+
+            # Forecast trên train
+            fit = self._fit(out, mt, train)
+            out.fit_seconds["train"] = fit.seconds
+            if not test.empty:
+                out.mape = float(mape_percent(test.values, fit.forecast.values[:len(test)]))
+                # --- 2) forecast trên full history, nối tiếp lần fit trên train ---
+                fit = self._fit(out, mt, monthly, extend=fit)
+                out.fit_seconds["refit"] = fit.seconds
+            else:
+                # Không có tập test: train chính là toàn bộ lịch sử, không cần fit lần hai
+                out.mape = 0.0
+            out.forecast_series, out.params = fit.forecast, fit.params
+
+        out.model_name = mt
+        # --- 3) Tính tổng và profit ---
+        out.total_revenue = float(out.forecast_series.sum())
+        if out.avg_unit_price > 0:
+            total_units     = out.total_revenue / out.avg_unit_price
+            out.gross_profit = out.total_revenue - total_units * self.capital_cost
+        else:
+            out.gross_profit = 0.0
+        return out
+
+    def _fit(self, result: ForecastResult, mt: str, series: pd.Series, extend: ModelFit | None = None) -> ModelFit:
+        """
+        Điểm fit duy nhất của ARIMA/SARIMA/PROPHET (forecast và backtest), có đo thời gian fit.
+        `extend` là lần fit trên đoạn đầu của chính series (tập train):
+          - ARIMA/SARIMA: nối các tháng còn lại vào kết quả đó và chỉ lọc lại với tham số đã ước lượng
+            (append, refit=False) — không tối ưu lần hai. Nếu tập train quá ngắn so với số tham số
+            (nghiệm kém xác định) thì fit lại trên toàn bộ series như cũ.
+          - PROPHET: không có phép nối tiếp trạng thái nên luôn fit trên toàn bộ series.
+        """
+        start = time.perf_counter()
+        if mt == "PROPHET":
+            model = self._fit_prophet(series)
+            future = model.make_future_dataframe(periods=self.forecast_months, freq='M')
+            forecast = model.predict(future).set_index('ds')['yhat'][-self.forecast_months:]
+            params = {name: np.ravel(model.params[name]).tolist() for name in ('k', 'm', 'sigma_obs', 'delta', 'beta')}
+        elif mt in ("ARIMA", "SARIMA"):
+            if extend is not None and extend.model.nobs_effective >= EXTEND_OBS_PER_PARAM * len(extend.model.params):
+                model = extend.model.append(series[len(extend.model.model.endog):], refit=False)
+            else:
+                model = self._fit_arima(result, series) if mt == "ARIMA" else self._fit_sarima(result, series)
+            forecast = pd.Series(np.asarray(model.forecast(steps=self.forecast_months)), index=self._future_index(series))
+            params = {str(k): float(v) for k, v in zip(model.param_names, model.params)}
+        else:
+            raise ValueError(f"Unknown model type: {mt}")
+        return ModelFit(forecast, params, time.perf_counter() - start, model)
+
+    def _resolve_order(self, result: ForecastResult, mt: str, series: pd.Series) -> tuple[tuple, tuple | None]:
+        """
+        Bậc cho mô hình mt. Với auto_order, bậc được tìm trên chuỗi đầu tiên được fit
+        (tập train khi tính MAPE) rồi giữ trong result.orders cho lần refit trên toàn bộ lịch sử.
+        """
+        if mt not in result.orders:
+            seasonal = mt == "SARIMA"
+            if self.auto_order:
+                result.orders[mt] = select_order(series, seasonal)
+            else:
+                result.orders[mt] = (DEFAULT_ARIMA_ORDER, DEFAULT_SEASONAL_ORDER if seasonal else None)
+        return result.orders[mt]
+
+    def _fit_arima(self, result: ForecastResult, series: pd.Series):
+        ARIMA = lazy_import("statsmodels.tsa.arima.model").ARIMA
+        order, _ = self._resolve_order(result, "ARIMA", series)
+        return ARIMA(series, order=order).fit()
+
+    def _fit_sarima(self, result: ForecastResult, series: pd.Series):
+        SARIMAX = lazy_import("statsmodels.tsa.statespace.sarimax").SARIMAX
+        order, seasonal_order = self._resolve_order(result, "SARIMA", series)
+        return SARIMAX(
+            series,
+            order=order,
+            seasonal_order=seasonal_order,
+            enforce_stationarity=False,
+            enforce_invertibility=False
+        ).fit(disp=False)
+
+    def _future_index(self, series: pd.Series) -> pd.DatetimeIndex:
+        last = series.index[-1]
+        return pd.date_range(last + pd.offsets.MonthEnd(), periods=self.forecast_months, freq='M')
+
+    def _fit_prophet(self, series: pd.Series):
+        Prophet = lazy_import("prophet").Prophet
+        dfp = pd.DataFrame({'ds': series.index, 'y': series.values})
+        return Prophet().fit(dfp)
+
+    def backtest(
+        self,
+        result: ForecastResult,
+        model_type: str,
+        n_origins: int = 4,
+        max_workers: int | None = None
+    ) -> pd.Series:
+        """
+        Rolling-origin backtest: tính MAPE tại nhiều mốc dự báo (origin) liên tiếp.
+        ARIMA/SARIMA chỉ ước lượng tham số một lần tại mốc đầu tiên; các mốc sau
+        append quan sát mới vào kết quả đã fit và lọc lại (refit=False).
+        Prophet không hỗ trợ append nên fit lại ở từng mốc; BASELINE đủ rẻ để chọn lại ở từng mốc.
+        Các mốc được chạy song song. Trả về Series MAPE (%) theo tháng cuối của tập train.
+        """
+        monthly = result.monthly
+        h = self.forecast_months
+        n = len(monthly)
+        mt = model_type.upper()
+        if mt not in ("BASELINE", "ARIMA", "SARIMA", "PROPHET"):
+            raise ValueError(f"Unknown model type: {model_type}")
+
+        # Mốc cuối = tháng cuối cùng còn đủ h tháng kiểm tra; lùi dần từng tháng
+        ends = [n - h - i for i in range(n_origins)]
+        # SARIMA cần thêm một chu kỳ mùa vụ (12 tháng) cho sai phân mùa
+        min_train = self.MIN_BACKTEST_TRAIN + (12 if mt == "SARIMA" else 0)
+        ends = sorted(e for e in ends if e >= min_train)
+        if not ends:
+            return pd.Series(dtype=float, name=mt)
+
+        if mt == "BASELINE":
+            def predict(end: int) -> np.ndarray:
+                return select_baselines(monthly.values[:end], h)[2][0]
+        elif mt == "PROPHET":
+            def predict(end: int) -> np.ndarray:
+                return self._fit(result, mt, monthly[:end]).forecast.values
+        else:
+            base = self._fit(replace(result, orders=dict(result.orders)), mt, monthly[:ends[0]]).model
+
+            def predict(end: int) -> np.ndarray:
+                res = base if end == ends[0] else base.append(monthly[ends[0]:end], refit=False)
+                return np.asarray(res.forecast(steps=h))
+
+        def score(end: int) -> float:
+            test = monthly[end:end + h]
+            preds = predict(end)[:len(test)]
+            if not np.all(np.isfinite(preds)):
+                return np.nan
+            return float(mape_percent(test.values, preds))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            mapes = list(pool.map(score, ends))
+        return pd.Series(mapes, index=monthly.index[[e - 1 for e in ends]], name=mt)
+
+    @profiled("forecasting.backtest")
+    def backtest_summary(
+        self,
+        result: ForecastResult,
+        model_types: tuple[str, ...] = ("BASELINE", "ARIMA", "SARIMA", "PROPHET"),
+        n_origins: int = 4,
+        progress=None
+    ) -> tuple[pd.DataFrame, ForecastResult]:
+        """
+        Chạy backtest cho từng mô hình và trả về (phân phối MAPE, ForecastResult mới):
+          Model, Origins, MAPE_mean, MAPE_std, MAPE_min, MAPE_median, MAPE_max
+        Bảng MAPE chi tiết theo mốc nằm ở backtest_results của result mới; `result` đầu vào không bị thay đổi.
+        `progress(stage, fraction)` (tuỳ chọn) được gọi trước mỗi mô hình.
+        """
+        per_origin = {}
+        for i, mt in enumerate(model_types):
+            if progress is not None:
+                progress(f"Backtest {mt}", i / len(model_types))
+            per_origin[mt] = self.backtest(result, mt, n_origins)
+        rows = []
+        for mt, mapes in per_origin.items():
+            rows.append({
+                'Model': mt,
+                'Origins': int(mapes.count()),
+                'MAPE_mean': mapes.mean(),
+                'MAPE_std': mapes.std(),
+                'MAPE_min': mapes.min(),
+                'MAPE_median': mapes.median(),
+                'MAPE_max': mapes.max()
+            })
+        return pd.DataFrame(rows).round(2), replace(result, backtest_results=pd.DataFrame(per_origin))
+
+    def run(
+        self,
+        df_raw: pd.DataFrame,
+        backtest_origins: int | None = None,
+        progress=None
+    ) -> tuple[ForecastResult | None, pd.DataFrame | None, list[str]]:
+        """
+        Toàn bộ quy trình của nút "Chạy dự báo": tiền xử lý, chuỗi BASELINE → ARIMA → SARIMA → PROPHET
+        (chỉ chuyển sang mô hình kế tiếp khi MAPE vượt ngưỡng), rồi backtest nếu backtest_origins được đặt.
+        Trả về (result, bảng backtest, các ghi chú chuyển mô hình); result là None nếu không có dữ liệu.
+        `progress(stage, fraction)` dùng để báo tiến độ (và là điểm huỷ khi chạy nền).
+        """
+        def report(stage: str, fraction: float):
+            if progress is not None:
+                progress(stage, fraction)
+
+        # Tỷ lệ tiến độ ước lượng cho từng bước; backtest chiếm phần lớn khi được bật
+        scale = 0.4 if backtest_origins else 1.0
+        report("Tiền xử lý dữ liệu", 0.0)
+        result = self.preprocess(df_raw)
+        if result is None:
+            return None, None, []
+
+        notes = []
+        cascade = ("BASELINE", "ARIMA", "SARIMA", "PROPHET")
+        for i, mt in enumerate(cascade):
+            report(f"Fit {mt}", scale * (0.1 + 0.9 * i / len(cascade)))
+            result = self.forecast(result, mt)
+            if not result.mape > self.mape_threshold or i == len(cascade) - 1:
+                break
+            notes.append(
+                f"⚠️ {mt} MAPE {result.mape:.2f}% vượt ngưỡng. Chuyển sang {cascade[i + 1]}…"
+            )
+
+        summary = None
+        if backtest_origins:
+            summary, result = self.backtest_summary(
+                result, n_origins=int(backtest_origins),
+                progress=lambda stage, f: report(stage, scale + (1 - scale) * f)
+            )
+        return result, summary, notes
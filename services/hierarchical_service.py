@@ -0,0 +1,134 @@
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from services.lazy_imports import lazy_import
+from services.profiling import profiled
+from services.aggregate_cube import aggregate_cube, active_span
+from services.forecasting_service import select_baselines, SALES_COLUMNS
+
+TOTAL_LABEL = "TỔNG"
+OTHER_LABEL = "KHÁC"
+RECONCILE_METHODS = ("bottom_up", "ols", "mint_diag")
+
+
+@dataclass
+class Hierarchy:
+    """
+    Cây sản phẩm -> nhóm từ khóa -> tổng công ty, dựng một lần từ cột Description.
+      - base: doanh thu tháng của từng sản phẩm (n_products × n_months)
+      - S: ma trận tổng hợp thưa (n_nodes × n_products), thứ tự dòng: tổng, các nhóm, các sản phẩm
+      - nodes: DataFrame (Level, Name) tương ứng từng dòng của S
+    """
+    products: np.ndarray
+    categories: list[str]
+    product_category: np.ndarray
+    months: pd.DatetimeIndex
+    base: np.ndarray
+    S: object
+    nodes: pd.DataFrame
+
+    @property
+    def n_aggregate(self) -> int:
+        return 1 + len(self.categories)
+
+
+@profiled("hierarchy.build")
+def build_hierarchy(df_raw: pd.DataFrame, keywords: list[str], history_months: int) -> Hierarchy | None:
+    """
+    Dựng Hierarchy từ khối tổng hợp của dataset. Mỗi sản phẩm thuộc nhóm từ khóa đầu tiên
+    xuất hiện trong Description (không phân biệt hoa thường); sản phẩm không khớp thuộc nhóm KHÁC
+    để tổng công ty bằng tổng mọi sản phẩm.
+    """
+    if df_raw is None or not all(col in df_raw.columns for col in SALES_COLUMNS):
+        return None
+
+    # Ma trận doanh thu sản phẩm × tháng lấy thẳng từ khối tổng hợp (chỉ các sản phẩm có bán)
+    cube = aggregate_cube(df_raw)
+    sold = np.flatnonzero(cube.product_revenue.getnnz(axis=1))
+    span = active_span(cube.sales_by_month()[0])
+    if span is None:
+        return None
+    products = cube.products[sold]
+    base = cube.product_revenue[sold][:, span].toarray()
+    months = cube.months[span]
+    if len(months) > history_months:
+        base, months = base[:, -history_months:], months[-history_months:]
+
+    # Gán nhóm: từ khóa đầu tiên khớp, còn lại là KHÁC (chỉ duyệt danh sách sản phẩm duy nhất)
+    keywords = [k.strip() for k in keywords if k and k.strip()]
+    names = pd.Series(products)
+    product_category = np.full(len(products), len(keywords))
+    for i, kw in reversed(list(enumerate(keywords))):
+        product_category[names.str.contains(kw, case=False, regex=False).values] = i
+    categories = [kw.upper() for kw in keywords] + [OTHER_LABEL]
+    used = np.unique(product_category)
+    remap = np.full(len(categories), -1)
+    remap[used] = np.arange(len(used))
+    categories = [categories[i] for i in used]
+    product_category = remap[product_category]
+
+    sparse = lazy_import("scipy.sparse")
+    n_p, n_c = len(products), len(categories)
+    cols = np.arange(n_p)
+    rows = np.concatenate([np.zeros(n_p, dtype=int), 1 + product_category, 1 + n_c + cols])
+    S = sparse.csr_matrix(
+        (np.ones(3 * n_p), (rows, np.tile(cols, 3))), shape=(1 + n_c + n_p, n_p)
+    )
+    nodes = pd.DataFrame({
+        'Level': ['Tổng'] + ['Nhóm'] * n_c + ['Sản phẩm'] * n_p,
+        'Name': [TOTAL_LABEL] + categories + list(products)
+    })
+    return Hierarchy(np.asarray(products), categories, product_category, months, base, S, nodes)
+
+
+def reconcile(h: Hierarchy, y_hat: np.ndarray, method: str, history: np.ndarray | None = None) -> np.ndarray:
+    """
+    Hoà hợp dự báo cơ sở y_hat (n_nodes × horizon) để mọi cấp cộng khớp nhau.
+      - bottom_up: S @ (dự báo cấp sản phẩm)
+      - ols:       MinT với W = I
+      - mint_diag: MinT với W = diag(phương sai sai số naive một bước của từng nút), cần history
+    MinT giải (S'W⁻¹S)⁻¹S'W⁻¹y bằng công thức Woodbury: S = [A; I] nên chỉ cần nghịch đảo
+    một ma trận (số nút tổng hợp × số nút tổng hợp), không tạo ma trận n_products × n_products.
+    """
+    if method not in RECONCILE_METHODS:
+        raise ValueError(f"Unknown reconciliation method: {method}")
+    n_a = h.n_aggregate
+    if method == "bottom_up":
+        return h.S @ y_hat[n_a:]
+
+    if method == "ols" or history is None:
+        w = np.ones(y_hat.shape[0])
+    else:
+        w = np.var(np.diff(history, axis=1), axis=1) if history.shape[1] > 2 else np.ones(y_hat.shape[0])
+        w = np.maximum(w, max(w.max(), 1.0) * 1e-8)
+    w_a, w_b = w[:n_a], w[n_a:]
+    A = h.S[:n_a]
+    y_a, y_b = y_hat[:n_a], y_hat[n_a:]
+
+    # v = S'W⁻¹y ; M⁻¹v = W_b v − W_b A' (W_a + A W_b A')⁻¹ A W_b v
+    v = y_b / w_b[:, None] + A.T @ (y_a / w_a[:, None])
+    wb_v = w_b[:, None] * v
+    inner = np.diag(w_a) + (A.multiply(w_b[None, :]) @ A.T).toarray()
+    bottom = wb_v - w_b[:, None] * (A.T @ np.linalg.solve(inner, A @ wb_v))
+    return h.S @ bottom
+
+
+@profiled("hierarchy.forecast")
+def forecast_hierarchy(h: Hierarchy, horizon: int, method: str = "mint_diag") -> pd.DataFrame:
+    """
+    Dự báo toàn bộ cây trong một lượt: dự báo cơ sở mọi nút bằng tầng baseline NumPy
+    (vector hoá trên tất cả chuỗi), rồi hoà hợp bằng `method`.
+    Trả về DataFrame (Level, Name, Base_Method, Base_MAPE, <các tháng dự báo>, Total).
+    """
+    history = np.asarray(h.S @ h.base)
+    names, mapes, y_hat = select_baselines(history, horizon)
+    reconciled = reconcile(h, y_hat, method, history)
+
+    future = pd.date_range(h.months[-1] + pd.offsets.MonthEnd(), periods=horizon, freq='M')
+    out = h.nodes.copy()
+    out['Base_Method'] = names
+    out['Base_MAPE'] = np.round(mapes, 2)
+    fc = pd.DataFrame(np.asarray(reconciled), columns=[d.strftime('%Y-%m') for d in future])
+    out = pd.concat([out, fc], axis=1)
+    out['Total'] = fc.sum(axis=1)
+    return out
@@ -0,0 +1,220 @@
+# services/job_manager.py
+"""
+Chạy các tác vụ nặng (dự báo, phân cụm, tối ưu) trong pool luồng nền thay vì trong luồng script
+của Streamlit, để giao diện không bị đứng và thao tác widget không làm hỏng phép tính đang chạy.
+
+  - Mỗi job có khoá = loại job + tham số (kể cả dấu vân tay dữ liệu). Yêu cầu trùng khoá khi job
+    đang chạy hoặc đã xong sẽ dùng chung một phép tính, kể cả giữa nhiều phiên người dùng.
+  - Hàm của job nhận tham số từ khoá `progress(stage, fraction)` để báo tiến độ; mỗi lần báo cũng
+    là một điểm kiểm tra huỷ. Không thể ngắt giữa một lần fit, nên việc huỷ có hiệu lực ở
+    điểm kiểm tra kế tiếp.
+  - Job chỉ thực sự bị huỷ khi mọi phiên đang chờ nó đều huỷ.
+  - Nếu phiên gửi job đang bật profiling, job được đo trong một lượt profiling riêng ở luồng nền;
+    các span giữ trong Job.spans để phiên nhận kết quả gộp vào lượt chạy của mình.
+"""
+import hashlib
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from services import profiling
+
+JOB_WORKERS = int(os.environ.get("DSS_JOB_WORKERS", "2"))
+MAX_FINISHED_JOBS = 32
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Ném ra từ progress() khi job đã được yêu cầu huỷ."""
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    kind: str
+    meta: dict = field(default_factory=dict)
+    status: str = QUEUED
+    stage: str = "Đang chờ"
+    progress: float = 0.0
+    result: Any = None
+    error: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    owners: set = field(default_factory=set)
+    spans: list = field(default_factory=list, repr=False)
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _future: Any = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def report(self, stage: str, fraction: float | None = None):
+        """Cập nhật tiến độ (fraction trong [0, 1]); ném JobCancelled nếu đã có yêu cầu huỷ."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.stage = stage
+        if fraction is not None:
+            self.progress = min(max(float(fraction), 0.0), 1.0)
+
+
+def job_key(kind: str, key_parts: tuple) -> str:
+    return hashlib.sha1(repr((kind, key_parts)).encode("utf-8")).hexdigest()
+
+
+class JobManager:
+    def __init__(self, max_workers: int = JOB_WORKERS, max_finished: int = MAX_FINISHED_JOBS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dss-job")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs: dict[str, Job] = {}
+        self._active: dict[str, Job] = {}
+        self._finished: OrderedDict[str, Job] = OrderedDict()
+        self._max_finished = max_finished
+
+    def submit(
+        self,
+        kind: str,
+        key_parts: tuple,
+        fn: Callable,
+        *args,
+        owner: str | None = None,
+        meta: dict | None = None,
+        **kwargs
+    ) -> Job:
+        """
+        Gửi job fn(*args, progress=..., **kwargs). Nếu đã có job cùng khoá đang chạy hoặc đã xong
+        (chưa bị loại khỏi bộ nhớ) thì trả về job đó thay vì tính lại.
+        """
+        key = job_key(kind, key_parts)
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None and job._cancel.is_set():
+                # Job đang huỷ (mọi phiên cũ đã bỏ) nhưng chưa tới điểm kiểm tra: không gắn phiên mới vào nó
+                # mà tính lại bằng job mới; job cũ kết thúc ở điểm kiểm tra kế tiếp
+                job = None
+            if job is None and key in self._finished:
+                self._finished.move_to_end(key)
+                job = self._finished[key]
+            if job is not None:
+                if owner is not None:
+                    job.owners.add(owner)
+                return job
+
+            job = Job(id=f"{kind}-{next(self._ids)}", key=key, kind=kind, meta=dict(meta or {}))
+            if owner is not None:
+                job.owners.add(owner)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            job._future = self._pool.submit(self._run, job, fn, args, kwargs, profiling.is_enabled())
+            return job
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict, profile: bool = False):
+        if job._cancel.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status, job.started_at, job.stage = RUNNING, time.time(), "Đang chạy"
+        # Trạng thái profiling gắn với luồng: mở lượt riêng cho luồng nền theo lựa chọn của phiên gửi job
+        profiling.start_run(profile)
+        try:
+            with profiling.span(f"job.{job.kind}"):
+                job.result = fn(*args, progress=job.report, **kwargs)
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            status = FAILED
+        else:
+            job.progress, job.stage = 1.0, "Hoàn tất"
+            status = DONE
+        # Ghi span trước khi báo xong để phiên đang chờ đọc được ngay khi thấy job kết thúc
+        job.spans = profiling.finish_run()
+        self._finish(job, status)
+
+    def _finish(self, job: Job, status: str):
+        job.status, job.finished_at = status, time.time()
+        if status == CANCELLED:
+            job.stage = "Đã huỷ"
+        with self._lock:
+            # Khoá có thể đã thuộc về job mới gửi lại sau khi job này bị huỷ
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            if status != DONE:
+                # Job lỗi/huỷ không được dùng lại cho lần gửi sau; chỉ giữ để phiên đang chờ đọc trạng thái
+                if self._finished.get(job.key) is job:
+                    del self._finished[job.key]
+                if not job.owners:
+                    self._jobs.pop(job.id, None)
+                return
+            self._finished[job.key] = job
+            while len(self._finished) > self._max_finished:
+                _, old = self._finished.popitem(last=False)
+                self._jobs.pop(old.id, None)
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str, owner: str | None = None) -> bool:
+        """Bỏ đăng ký `owner` khỏi job; job chỉ bị huỷ khi không còn phiên nào chờ. Trả về True nếu đã huỷ."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.owners.discard(owner)
+            if job.owners:
+                return False
+            job._cancel.set()
+            if job._future is not None and job._future.cancel():
+                # Chưa bắt đầu chạy: huỷ ngay trong hàng đợi
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+                self._jobs.pop(job.id, None)
+                job.status, job.finished_at, job.stage = CANCELLED, time.time(), "Đã huỷ"
+            return True
+
+    def release(self, job_id: str):
+        """Phiên đã đọc xong kết quả của job lỗi/huỷ: bỏ khỏi bảng tra cứu."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in (FAILED, CANCELLED):
+                self._jobs.pop(job_id, None)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            {
+                "id": j.id, "kind": j.kind, "status": j.status, "stage": j.stage,
+                "progress": round(j.progress, 2), "elapsed_s": round(j.elapsed, 2), "owners": len(j.owners)
+            }
+            for j in jobs
+        ]
+
+
+_MANAGER: JobManager | None = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """JobManager dùng chung cho cả tiến trình (mọi phiên Streamlit)."""
+    global _MANAGER
+    if _MANAGER is None:
+        with _MANAGER_LOCK:
+            if _MANAGER is None:
+                _MANAGER = JobManager()
+    return _MANAGER
@@ -0,0 +1,79 @@
+# services/lazy_imports.py
+"""
+Import trì hoãn cho các thư viện nặng (Prophet, statsmodels, sklearn, scipy, matplotlib)
+và các flow controller, kèm thời gian import lần đầu của từng module.
+
+Chạy `python -m services.lazy_imports` để đo chi phí import "lạnh" của từng module
+trong tiến trình riêng (không bị ảnh hưởng bởi các module đã import trước đó).
+"""
+import importlib
+import subprocess
+import sys
+import threading
+import time
+from types import ModuleType
+
+# Các module được đo trong báo cáo khởi động
+STARTUP_MODULES = (
+    "streamlit",
+    "pandas",
+    "numpy",
+    "controllers.segmentation_controller",
+    "controllers.optimization_controller",
+    "controllers.forecasting_controller",
+    "sklearn.cluster",
+    "scipy.optimize",
+    "matplotlib.pyplot",
+    "statsmodels.tsa.arima.model",
+    "statsmodels.tsa.statespace.sarimax",
+    "prophet",
+)
+
+# module -> số giây import lần đầu trong tiến trình này (bao gồm các module con)
+IMPORT_TIMINGS: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def lazy_import(module_name: str) -> ModuleType:
+    """Import module ở lần dùng đầu tiên và ghi lại thời gian import."""
+    module = sys.modules.get(module_name)
+    # Module đang được luồng khác import đã có trong sys.modules nhưng chưa khởi tạo xong:
+    # đi qua import_module để chờ thay vì trả về module dở dang
+    if module is not None and not getattr(getattr(module, "__spec__", None), "_initializing", False):
+        return module
+    with _lock:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        IMPORT_TIMINGS.setdefault(module_name, time.perf_counter() - start)
+    return module
+
+
+def measure_cold_import(module_name: str) -> float:
+    """Thời gian import module trong một tiến trình Python mới (giây)."""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"import {module_name}; "
+        "print(time.perf_counter() - t)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def startup_report(modules: tuple[str, ...] = STARTUP_MODULES) -> list[dict]:
+    """Bảng chi phí import lạnh của từng module: [{Module, Seconds, Loaded}]."""
+    rows = []
+    for name in modules:
+        try:
+            seconds = round(measure_cold_import(name), 3)
+        except (subprocess.CalledProcessError, ValueError):
+            seconds = None
+        rows.append({"Module": name, "Seconds": seconds, "Loaded": name in sys.modules})
+    return rows
+
+
+if __name__ == "__main__":
+    for row in startup_report():
+        sec = "lỗi" if row["Seconds"] is None else f"{row['Seconds']:.3f}s"
+        print(f"{row['Module']:<40} {sec:>10}")
@@ -1,41 +1,74 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from scipy.optimize import linprog
+from services.lazy_imports import lazy_import
+from services.profiling import profiled, note_cache_miss
+from services.aggregate_cube import aggregate_cube
 
-@st.cache_data
-def preprocess_optimization_data(df_raw: pd.DataFrame, keyword: str, months_forecast: int) -> pd.DataFrame | None:
-    if df_raw is None or df_raw.empty:
-        st.warning("Không có dữ liệu thô để xử lý tối ưu hóa. Vui lòng tải file lên.")
-        return None
+ORDER_COLUMNS = ['Description', 'Quantity', 'UnitPrice', 'InvoiceNo']
 
-    required = ['Description', 'Quantity', 'UnitPrice', 'InvoiceNo']
-    if not all(col in df_raw.columns for col in required):
-        st.error(f"File CSV phải chứa cột: {', '.join(required)}.")
+
+def build_order_demand(df_raw: pd.DataFrame, keyword: str, months_forecast: int) -> pd.DataFrame | None:
+    """
+    Nhu cầu và giá trung bình theo sản phẩm chứa từ khóa, đọc từ vector đặt hàng theo sản phẩm
+    của khối tổng hợp. Không dùng cache/thông báo của Streamlit nên gọi được từ luồng hay tiến trình
+    nền; None nếu thiếu cột hoặc không có sản phẩm nào khớp.
+    """
+    if df_raw is None or df_raw.empty or not all(col in df_raw.columns for col in ORDER_COLUMNS):
         return None
 
-    df = df_raw.dropna(subset=required).copy()
-    df = df[~df['InvoiceNo'].astype(str).str.startswith('C')]
-    df = df[df['Description'].str.contains(keyword, case=False, na=False)]
-    df = df[df['Quantity'] > 0]
-    if df.empty:
-        st.warning(f"Không tìm thấy sản phẩm nào chứa từ khóa '{keyword}' hoặc dữ liệu không hợp lệ sau lọc.")
+    cube = aggregate_cube(df_raw)
+    rows = cube.match_products(keyword)
+    rows = rows[cube.order_lines[rows] > 0]
+    if len(rows) == 0:
         return None
 
-    grouped = df.groupby('Description').agg({
-        'Quantity': 'sum',
-        'UnitPrice': 'mean'
-    }).reset_index()
+    grouped = pd.DataFrame({
+        'Description': cube.products[rows],
+        'Quantity': cube.order_quantity[rows],
+        'UnitPrice': cube.order_price_sum[rows] / cube.order_lines[rows]
+    })
 
     grouped['Quantity'] = np.ceil(grouped['Quantity'] / 12 * months_forecast).astype(int)
     grouped['ProfitPerUnit'] = grouped['UnitPrice'] * 0.40
     return grouped
 
+
+@profiled("optimization.preprocess", cached=True)
+@st.cache_data(max_entries=64)
+def preprocess_optimization_data(
+    _df_raw: pd.DataFrame,
+    keyword: str,
+    months_forecast: int,
+    fingerprint: str
+) -> pd.DataFrame | None:
+    """
+    build_order_demand() kèm thông báo lỗi trên giao diện. Cache theo `fingerprint` của dataset
+    (không băm cả DataFrame mỗi lần gọi).
+    """
+    note_cache_miss()
+    if _df_raw is None or _df_raw.empty:
+        st.warning("Không có dữ liệu thô để xử lý tối ưu hóa. Vui lòng tải file lên.")
+        return None
+
+    if not all(col in _df_raw.columns for col in ORDER_COLUMNS):
+        st.error(f"File CSV phải chứa cột: {', '.join(ORDER_COLUMNS)}.")
+        return None
+
+    grouped = build_order_demand(_df_raw, keyword, months_forecast)
+    if grouped is None:
+        st.warning(f"Không tìm thấy sản phẩm nào chứa từ khóa '{keyword}' hoặc dữ liệu không hợp lệ sau lọc.")
+    return grouped
+
+@profiled("optimization.run_lp")
 def run_optimization(
     data: pd.DataFrame,
-    budget: float
+    budget: float,
+    progress=None
 ) -> tuple[pd.DataFrame, pd.DataFrame, float, float]:
     # chuẩn bị
+    if progress is not None:
+        progress("Dựng bài toán LP", 0.0)
     c = -data['ProfitPerUnit'].values
     A = [data['UnitPrice'].values]
     b = [budget]
@@ -46,6 +79,9 @@ def run_optimization(
         max_diversify = (budget * 0.4) // data.loc[i, 'UnitPrice'] if data.loc[i, 'UnitPrice'] > 0 else np.inf
         bounds.append((0, min(max_demand, max_diversify)))
 
+    linprog = lazy_import("scipy.optimize").linprog
+    if progress is not None:
+        progress("Giải bài toán LP", 0.3)
     res = linprog(c, A_ub=A, b_ub=b, bounds=bounds, method='highs')
 
     if not res.success:
@@ -66,6 +102,7 @@ def run_optimization(
     top5 = sorted_df.head(5)
     return sorted_df, top5, total_cost, total_profit
 
+@profiled("optimization.decision_data")
 def build_decision_data(
     df_result: pd.DataFrame,
     top5: pd.DataFrame,
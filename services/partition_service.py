@@ -0,0 +1,256 @@
+import os
+import pandas as pd
+import numpy as np
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from dao.data_loader import dataset_fingerprint, dataset_artefact
+from services.process_pools import get_process_pool, retire_process_pool
+from services.profiling import profiled
+from services.segmentation_service import segment_customers, segment_assignments
+from services.optimization_service import build_order_demand, run_optimization
+from services.forecasting_service import ForecastModel
+
+PARTITION_KEY = "Partition"
+PARTITION_WORKERS = int(os.environ.get("DSS_PARTITION_WORKERS", str(os.cpu_count() or 1)))
+PARTITION_POOL = "partition"
+# Cột có quá nhiều giá trị (InvoiceNo, CustomerID…) không phù hợp để phân vùng
+MAX_PARTITIONS = 200
+
+
+@dataclass
+class PartitionIndex:
+    """
+    Vị trí dòng (tăng dần, theo groupby().indices) của từng phân vùng trong df_raw.
+    Chỉ giữ các mảng vị trí, không giữ bản sao nào của df_raw, nên rẻ khi lưu trong kho dataset.
+      - labels: giá trị của cột phân vùng
+      - positions: vị trí dòng của từng phân vùng
+    """
+    column: str
+    labels: list
+    positions: list[np.ndarray]
+
+
+@dataclass
+class PartitionedDataset:
+    """df_raw (tham chiếu, không sao chép) cùng chỉ mục phân vùng; mỗi phân vùng được cắt khi cần."""
+    frame: pd.DataFrame
+    index: PartitionIndex
+
+    @property
+    def column(self) -> str:
+        return self.index.column
+
+    @property
+    def labels(self) -> list:
+        return self.index.labels
+
+    def sizes(self) -> pd.Series:
+        return pd.Series([len(idx) for idx in self.index.positions], index=self.labels, name='Rows')
+
+    def part(self, i: int) -> pd.DataFrame:
+        part = self.frame.iloc[self.index.positions[i]]
+        # Dấu vân tay riêng cho từng phân vùng để cache/kho dataset không nhầm với dataset gốc
+        part.attrs = {"fingerprint": f"{dataset_fingerprint(self.frame)}|{self.column}/{self.labels[i]}"}
+        return part
+
+
+def _partition_columns(df_raw: pd.DataFrame) -> list[str]:
+    candidates = [
+        c for c in df_raw.columns
+        if df_raw[c].dtype == object and df_raw[c].nunique(dropna=True) <= MAX_PARTITIONS
+    ]
+    return sorted(candidates, key=lambda c: (c != "Country", c))
+
+
+def partition_columns(df_raw: pd.DataFrame) -> list[str]:
+    """
+    Các cột dạng phân loại có thể dùng để phân vùng (≤ MAX_PARTITIONS giá trị), Country đứng đầu.
+    Phép quét nunique trên mọi cột chỉ chạy một lần cho mỗi dataset (qua kho dataset).
+    """
+    return dataset_artefact(df_raw, "partition_columns", _partition_columns)
+
+
+@profiled("partition.split")
+def _split(df_raw: pd.DataFrame, column: str) -> PartitionIndex | None:
+    if column not in df_raw.columns:
+        return None
+    # groupby().indices cho vị trí dòng của từng nhóm mà không tạo các DataFrame con
+    indices = df_raw.groupby(column, sort=True, dropna=True).indices
+    if not indices:
+        return None
+    labels = list(indices)
+    return PartitionIndex(column, labels, [indices[label] for label in labels])
+
+
+def split_partitions(df_raw: pd.DataFrame, column: str) -> PartitionedDataset | None:
+    """Phân vùng df_raw theo `column`; chỉ mục phân vùng được dựng một lần cho mỗi (dataset, cột) qua kho dataset."""
+    index = dataset_artefact(df_raw, "partitions", _split, column)
+    return PartitionedDataset(df_raw, index) if index is not None else None
+
+
+def _call_part(fn, part: pd.DataFrame, args: tuple):
+    # Chạy trong tiến trình con: lỗi dữ liệu của một phân vùng được trả về thay vì ném ra
+    try:
+        return fn(part, *args)
+    except ValueError as e:
+        return e
+
+
+def run_partitioned(parts: PartitionedDataset, fn, *args, progress=None) -> dict:
+    """
+    Chạy fn(df_part, *args) cho mọi phân vùng song song trên pool tiến trình dùng chung
+    (services.process_pools), nên phần pandas/NumPy giữ GIL chạy thật sự song song trên nhiều lõi.
+    fn phải là hàm cấp module và không dùng API của Streamlit (kể cả hàm có @st.cache_data);
+    mỗi phân vùng được cắt từ df_raw rồi pickle sang tiến trình con.
+    Trả về {label: kết quả}; lỗi dữ liệu của một phân vùng được trả về dưới dạng ValueError
+    thay vì dừng cả lượt.
+    """
+    results = {}
+    n = len(parts.labels)
+    pool = get_process_pool(PARTITION_POOL, PARTITION_WORKERS)
+    futures = {pool.submit(_call_part, fn, parts.part(i), args): parts.labels[i] for i in range(n)}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(f"Xong {done}/{n} phân vùng ({futures[future]})", done / n)
+    except BaseException as e:
+        # Bị huỷ (hoặc lỗi): bỏ các phân vùng chưa bắt đầu; pool dùng chung vẫn giữ cho lượt khác
+        for future in futures:
+            future.cancel()
+        if isinstance(e, BrokenProcessPool):
+            retire_process_pool(PARTITION_POOL, pool)
+        raise
+    return {label: results[label] for label in parts.labels}
+
+
+def _status(result) -> str:
+    if isinstance(result, Exception):
+        return str(result)
+    return "OK" if result is not None else "Không đủ dữ liệu"
+
+
+# --- Hàm chạy trên từng phân vùng trong tiến trình con (cấp module để pickle được) ---
+
+def _segment_part(part: pd.DataFrame, k: int):
+    out = segment_customers(part, k)
+    if out is None or out["summary"] is None:
+        return None
+    return out["summary"], segment_assignments(out)
+
+
+def _optimize_part(part: pd.DataFrame, keyword: str, months: int, budget: float):
+    processed = build_order_demand(part, keyword, months)
+    if processed is None or processed.empty:
+        return None
+    plan, _, total_cost, total_profit = run_optimization(processed, budget)
+    return plan, total_cost, total_profit
+
+
+def _forecast_part(part: pd.DataFrame, model: ForecastModel):
+    return model.run(part)[0]
+
+
+@profiled("partition.segmentation")
+def partitioned_segmentation(df_raw: pd.DataFrame, column: str, k: int, progress=None) -> dict | None:
+    """
+    Phân khúc RFM riêng cho từng phân vùng. Trả về dict:
+      - summary: các bảng tóm tắt phân khúc ghép lại, thêm cột Partition
+      - customers: RFM + Cluster + Segment của từng khách, thêm cột Partition
+      - status: số dòng và trạng thái từng phân vùng
+    """
+    parts = split_partitions(df_raw, column)
+    if parts is None:
+        return None
+
+    results = run_partitioned(parts, _segment_part, k, progress=progress)
+    ok = {label: r for label, r in results.items() if isinstance(r, tuple)}
+    return {
+        "summary": _combine({label: r[0] for label, r in ok.items()}),
+        "customers": _combine({label: r[1] for label, r in ok.items()}),
+        "status": _status_table(parts, results),
+    }
+
+
+@profiled("partition.optimization")
+def partitioned_optimization(
+    df_raw: pd.DataFrame,
+    column: str,
+    keyword: str,
+    budget: float,
+    months: int,
+    progress=None
+) -> dict | None:
+    """
+    Bài toán LP nhập hàng riêng cho từng phân vùng, mỗi phân vùng có ngân sách `budget`. Trả về dict:
+      - plan: kế hoạch nhập của mọi phân vùng, thêm cột Partition
+      - totals: tổng chi phí / lợi nhuận kỳ vọng theo phân vùng
+      - status: số dòng và trạng thái từng phân vùng
+    """
+    parts = split_partitions(df_raw, column)
+    if parts is None:
+        return None
+
+    results = run_partitioned(parts, _optimize_part, keyword, months, budget, progress=progress)
+    ok = {label: r for label, r in results.items() if isinstance(r, tuple)}
+    totals = pd.DataFrame(
+        [(label, r[1], r[2]) for label, r in ok.items()],
+        columns=[PARTITION_KEY, 'TotalCost', 'ExpectedProfit']
+    )
+    return {
+        "plan": _combine({label: r[0] for label, r in ok.items() if not r[0].empty}),
+        "totals": totals,
+        "status": _status_table(parts, results),
+    }
+
+
+@profiled("partition.forecast")
+def partitioned_forecast(
+    df_raw: pd.DataFrame,
+    column: str,
+    model: ForecastModel,
+    progress=None
+) -> dict | None:
+    """
+    Chạy chuỗi mô hình dự báo (như nút "Chạy dự báo") cho từng phân vùng. Trả về dict:
+      - summary: Partition, Model, MAPE, TotalRevenue, GrossProfit
+      - forecast: doanh thu dự báo theo tháng (dòng = tháng, cột = phân vùng)
+      - results: {label: ForecastResult}
+      - status: số dòng và trạng thái từng phân vùng
+    """
+    parts = split_partitions(df_raw, column)
+    if parts is None:
+        return None
+
+    results = run_partitioned(parts, _forecast_part, model, progress=progress)
+    ok = {label: r for label, r in results.items() if r is not None and not isinstance(r, Exception)}
+    summary = pd.DataFrame([
+        {
+            PARTITION_KEY: label,
+            'Model': r.model_label,
+            'MAPE': r.mape,
+            'TotalRevenue': r.total_revenue,
+            'GrossProfit': r.gross_profit,
+        }
+        for label, r in ok.items()
+    ])
+    forecast = pd.DataFrame({label: r.forecast_series for label, r in ok.items()})
+    return {
+        "summary": summary,
+        "forecast": forecast,
+        "results": ok,
+        "status": _status_table(parts, results),
+    }
+
+
+def _combine(frames: dict) -> pd.DataFrame:
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, names=[PARTITION_KEY, None]).reset_index(level=0).reset_index(drop=True)
+
+
+def _status_table(parts: PartitionedDataset, results: dict) -> pd.DataFrame:
+    status = parts.sizes().rename_axis(PARTITION_KEY).reset_index()
+    status['Status'] = [_status(results.get(label)) for label in parts.labels]
+    return status
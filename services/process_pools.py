@@ -0,0 +1,76 @@
+# services/process_pools.py
+"""
+Pool tiến trình dùng chung cho cả tiến trình (tìm bậc ARIMA, phân tích theo phân vùng…), tạo khi cần lần đầu.
+
+Tiến trình Streamlit/API có nhiều luồng (phiên, job nền, luồng HTTP), nên không dùng "fork":
+tiến trình con được fork có thể chép lại một khoá đang bị luồng khác giữ và treo mãi.
+Pool dùng "forkserver" (hoặc "spawn" nếu hệ điều hành không hỗ trợ), đổi bằng DSS_PROCESS_START_METHOD.
+Hàm gửi vào pool phải là hàm cấp module (pickle được) và không được gọi API của Streamlit.
+Tiến trình con nạp lại script chính dưới tên __mp_main__, nên script khởi chạy (app.py, api_server.py…)
+phải đặt phần chạy chương trình trong `if __name__ == "__main__":`.
+
+Trong tiến trình con của một pool (VD: dự báo một phân vùng cần tìm bậc ARIMA), get_process_pool()
+không lồng thêm pool mà trả về bộ chạy tuần tự tại chỗ: mức ngoài đã dùng hết các lõi, và pool lồng
+trong tiến trình con có thể treo khi tiến trình đó thoát.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+PROCESS_START_METHOD = os.environ.get(
+    "DSS_PROCESS_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_POOLS: dict[str, ProcessPoolExecutor] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+class _InlineExecutor:
+    """Chạy tác vụ ngay trong submit() và trả về Future đã xong (cùng giao diện với pool)."""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        pass
+
+
+_INLINE = _InlineExecutor()
+
+
+def get_process_pool(name: str, max_workers: int) -> ProcessPoolExecutor:
+    """
+    Pool tiến trình `name` dùng chung; tạo mới nếu chưa có hoặc đã bị loại bằng retire_process_pool().
+    Trong tiến trình con của một pool khác: bộ chạy tuần tự tại chỗ thay vì pool lồng nhau.
+    """
+    if multiprocessing.parent_process() is not None:
+        return _INLINE
+    with _POOLS_LOCK:
+        pool = _POOLS.get(name)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD)
+            )
+            _POOLS[name] = pool
+            atexit.register(pool.shutdown, wait=False, cancel_futures=True)
+        return pool
+
+
+def retire_process_pool(name: str, pool: ProcessPoolExecutor):
+    """
+    Bỏ `pool` khỏi vị trí dùng chung để lượt sau tạo pool mới: khi pool đã hỏng (tiến trình con chết),
+    hoặc khi còn tác vụ quá hạn đang chạy mà không thể ngắt giữa chừng. Tác vụ chưa chạy bị huỷ;
+    tiến trình con chạy nốt tác vụ hiện tại rồi thoát, không chiếm chỗ của các lượt sau.
+    """
+    with _POOLS_LOCK:
+        if _POOLS.get(name) is pool:
+            del _POOLS[name]
+    pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,239 @@
+# services/profiling.py
+"""
+Đo hiệu năng theo từng bước (span) cho DAO, services và views.
+
+Mỗi span ghi: thời gian thực, thời gian CPU, bộ nhớ đỉnh (tracemalloc), số dòng vào/ra
+và cache hit/miss. Trạng thái bật/tắt gắn với luồng đang chạy script (mỗi phiên Streamlit
+chạy trong luồng riêng), nên bật panel ở một phiên không làm chậm các phiên khác ngoài
+chi phí tracemalloc dùng chung tiến trình.
+
+Bộ nhớ đỉnh của tracemalloc là một bộ đếm chung cho cả tiến trình (reset_peak() ảnh hưởng mọi luồng),
+nên peak_mb chỉ được đo khi luồng của span là luồng duy nhất đang có span mở trong suốt thời gian
+của span đó. Nếu phiên khác hoặc một job nền cùng đang đo, peak_mb là None thay vì một con số sai.
+
+Khi tắt, span() trả về một đối tượng rỗng dùng chung và profiled() chỉ thêm một lời gọi hàm.
+Đặt biến môi trường DSS_PROFILE_LOG=<đường dẫn> để ghi mỗi span thành một dòng JSON.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+logger = logging.getLogger("dss.profiling")
+if os.environ.get("DSS_PROFILE_LOG"):
+    _handler = logging.FileHandler(os.environ["DSS_PROFILE_LOG"], encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_state = threading.local()
+_tracing_lock = threading.Lock()
+_tracing_runs = 0
+# Số luồng đang có span mở và số lần một luồng bắt đầu span ngoài cùng (để biết đỉnh bộ nhớ có bị
+# luồng khác reset/chia sẻ trong lúc span chạy hay không)
+_sampling_threads = 0
+_sampling_joins = 0
+
+
+def _count_rows(obj) -> int | None:
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, tuple) and obj and isinstance(obj[0], (pd.DataFrame, pd.Series)):
+        return len(obj[0])
+    monthly = getattr(obj, "monthly", None)  # ForecastResult
+    return len(monthly) if isinstance(monthly, pd.Series) else None
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_rows_in(self, n):
+        pass
+
+    def set_rows_out(self, n):
+        pass
+
+    def mark_cache(self, hit: bool):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "rows_in", "rows_out", "cache", "depth", "_wall", "_cpu", "_base", "_peak", "_joins")
+
+    def __init__(self, name: str, rows_in: int | None = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.cache = None
+
+    def set_rows_in(self, n):
+        self.rows_in = n
+
+    def set_rows_out(self, n):
+        self.rows_out = n
+
+    def mark_cache(self, hit: bool):
+        self.cache = "hit" if hit else "miss"
+
+    def __enter__(self):
+        global _sampling_threads, _sampling_joins
+        stack = _state.stack
+        self.depth = len(stack)
+        if not stack:
+            with _tracing_lock:
+                _sampling_threads += 1
+                _sampling_joins += 1
+                # Chỉ đo bộ nhớ khi không có luồng nào khác đang có span mở
+                self._joins = _sampling_joins if _sampling_threads == 1 else None
+        else:
+            self._joins = stack[-1]._joins
+        measure = self._joins is not None and tracemalloc.is_tracing()
+        if stack and measure:
+            # Gộp đỉnh bộ nhớ hiện tại vào span cha trước khi reset cho span con
+            stack[-1]._peak = max(stack[-1]._peak, tracemalloc.get_traced_memory()[1])
+        stack.append(self)
+        if measure:
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+        else:
+            self._base = 0
+        self._peak = 0
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _sampling_threads
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        stack = _state.stack
+        stack.pop()
+        peak_mb = None
+        # Không luồng nào khác bắt đầu đo kể từ khi span ngoài cùng của luồng này mở
+        exclusive = self._joins is not None and self._joins == _sampling_joins
+        if not stack:
+            with _tracing_lock:
+                _sampling_threads -= 1
+        if exclusive and tracemalloc.is_tracing():
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            peak_mb = round(max(self._peak - self._base, 0) / 2**20, 2)
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, self._peak)
+        record = {
+            "span": self.name,
+            "depth": self.depth,
+            "start_s": round(self._wall - _state.t0, 4),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "peak_mb": peak_mb,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "cache": self.cache,
+            "error": exc_type.__name__ if exc_type else None,
+        }
+        _state.records.append(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, ensure_ascii=False))
+        return False
+
+
+def is_enabled() -> bool:
+    return getattr(_state, "enabled", False)
+
+
+def span(name: str, rows_in: int | None = None):
+    """Context manager đo một bước; trả về span rỗng khi profiling đang tắt."""
+    if not getattr(_state, "enabled", False):
+        return _NULL_SPAN
+    return Span(name, rows_in)
+
+
+def note_cache_miss():
+    """Gọi bên trong thân hàm @st.cache_data: thân hàm chỉ chạy khi cache miss."""
+    if getattr(_state, "enabled", False) and _state.stack:
+        for sp in reversed(_state.stack):
+            if sp.cache is not None:
+                sp.cache = "miss"
+                return
+
+
+def profiled(name: str, cached: bool = False):
+    """
+    Decorator bọc hàm trong span(name). rows_in lấy từ DataFrame/Series đầu tiên trong tham số,
+    rows_out từ kết quả. Với cached=True (đặt bên ngoài @st.cache_data), span được đánh dấu
+    hit trừ khi thân hàm gọi note_cache_miss().
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not getattr(_state, "enabled", False):
+                return fn(*args, **kwargs)
+            rows_in = next(
+                (len(a) for a in args if isinstance(a, (pd.DataFrame, pd.Series))), None
+            )
+            with Span(name, rows_in) as sp:
+                if cached:
+                    sp.cache = "hit"
+                result = fn(*args, **kwargs)
+                sp.rows_out = _count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def merge_records(records: list[dict]):
+    """
+    Gộp các span đã ghi ở luồng khác (VD: job nền) vào lượt chạy hiện tại: lồng dưới span đang mở
+    và đặt tại thời điểm gộp (giữ nguyên thứ tự và khoảng cách giữa các span).
+    """
+    if not getattr(_state, "enabled", False) or not records:
+        return
+    depth = len(_state.stack)
+    offset = time.perf_counter() - _state.t0 - min(r["start_s"] for r in records)
+    _state.records.extend(
+        {**r, "depth": r["depth"] + depth, "start_s": round(r["start_s"] + offset, 4)} for r in records
+    )
+
+
+def start_run(enabled: bool):
+    """Bắt đầu một lượt chạy script: xoá span cũ, bật/tắt profiling cho luồng hiện tại."""
+    global _tracing_runs
+    _state.enabled = enabled
+    _state.stack = []
+    _state.records = []
+    _state.t0 = time.perf_counter()
+    _state.tracing = False
+    if enabled:
+        with _tracing_lock:
+            _tracing_runs += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        _state.tracing = True
+
+
+def finish_run() -> list[dict]:
+    """Kết thúc lượt chạy: tắt profiling, dừng tracemalloc nếu không còn lượt nào cần, trả về các span."""
+    global _tracing_runs
+    records = getattr(_state, "records", [])
+    if getattr(_state, "tracing", False):
+        with _tracing_lock:
+            _tracing_runs -= 1
+            if _tracing_runs == 0 and tracemalloc.is_tracing():
+                tracemalloc.stop()
+        _state.tracing = False
+    _state.enabled = False
+    return records
@@ -0,0 +1,197 @@
+import os
+import time
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, replace
+from typing import Any
+from dao.data_loader import dataset_fingerprint, dataset_artefact
+from services.profiling import profiled
+from services.segmentation_service import segment_customers
+from services.forecasting_service import ForecastModel, ForecastResult, SALES_COLUMNS
+
+# Chế độ xem trước: với file lớn, tính nhanh trên một mẫu trong khi job nền tính trên toàn bộ dữ liệu
+PREVIEW_MIN_ROWS = int(os.environ.get("DSS_PREVIEW_MIN_ROWS", "200000"))
+PREVIEW_SAMPLE_ROWS = int(os.environ.get("DSS_PREVIEW_SAMPLE_ROWS", "50000"))
+PREVIEW_SEED = 42
+# Phân vị chuẩn cho khoảng tin cậy 95%
+Z_95 = 1.96
+
+
+@dataclass
+class Preview:
+    """
+    Kết quả xấp xỉ tính trên mẫu, kèm cận sai số so với kết quả đầy đủ (khoảng tin cậy 95%).
+      - result: cùng dạng với kết quả đầy đủ (dict của segment_customers / ForecastResult)
+      - rate: tỷ lệ lấy mẫu; sample_rows: số dòng giao dịch trong mẫu
+      - bounds: bảng cận sai số theo từng phân khúc / từng tháng
+      - error_bound: cận sai số chính (điểm % tỷ trọng phân khúc, hoặc % doanh thu tháng)
+    """
+    result: Any
+    rate: float
+    sample_rows: int
+    bounds: pd.DataFrame
+    error_bound: float
+    elapsed_s: float
+
+
+def sample_rate(df_raw: pd.DataFrame) -> float:
+    return min(1.0, PREVIEW_SAMPLE_ROWS / max(len(df_raw), 1))
+
+
+def preview_enabled(df_raw: pd.DataFrame) -> bool:
+    """Chỉ xem trước với file đủ lớn để phép tính đầy đủ mất thời gian đáng kể."""
+    return df_raw is not None and len(df_raw) >= PREVIEW_MIN_ROWS and sample_rate(df_raw) < 1.0
+
+
+def _sample(df_raw: pd.DataFrame, keep: np.ndarray, tag: str) -> pd.DataFrame:
+    sample = df_raw[keep]
+    # Dấu vân tay riêng cho mẫu để khối tổng hợp/kho dataset không nhầm với dataset gốc
+    sample.attrs = {"fingerprint": f"{dataset_fingerprint(df_raw)}~{tag}"}
+    return sample
+
+
+def customer_sample(df_raw: pd.DataFrame, rate: float) -> pd.DataFrame:
+    """
+    Mẫu khách hàng: mỗi khách được chọn với xác suất `rate` theo giá trị băm của CustomerID và
+    giữ toàn bộ giao dịch của họ, nên RFM của từng khách trong mẫu là chính xác.
+    """
+    hashed = pd.util.hash_array(df_raw['CustomerID'].to_numpy())
+    keep = (hashed >> np.uint64(11)) / float(1 << 53) < rate
+    return _sample(df_raw, keep, f"customers{rate:.6f}")
+
+
+def transaction_sample(df_raw: pd.DataFrame, rate: float) -> pd.DataFrame:
+    """Mẫu giao dịch: mỗi dòng được chọn độc lập với xác suất `rate` (hạt giống cố định)."""
+    keep = np.random.default_rng(PREVIEW_SEED).random(len(df_raw)) < rate
+    return _sample(df_raw, keep, f"rows{rate:.6f}")
+
+
+def _segment_bounds(rfm: pd.DataFrame, summary: pd.DataFrame, rate: float) -> pd.DataFrame:
+    """
+    Cận 95% cho tỷ trọng khách của từng phân khúc (điểm %) và Monetary trung bình (%),
+    có hiệu chỉnh quần thể hữu hạn (1 - rate).
+    """
+    segments = rfm['Cluster'].map(summary.set_index('Cluster')['Segment'])
+    n, fpc = len(rfm), 1.0 - rate
+    stats = rfm.groupby(segments)['Monetary'].agg(['count', 'mean', 'std']).fillna(0.0)
+    share = stats['count'] / n
+    monetary_half = Z_95 * stats['std'] / np.sqrt(stats['count']) * np.sqrt(fpc)
+    return pd.DataFrame({
+        'Segment': stats.index,
+        'Customers': (stats['count'] / rate).round().astype(int).values,
+        'Share_%': (share * 100).round(1).values,
+        'Share_±pp': (Z_95 * np.sqrt(share * (1 - share) / n * fpc) * 100).round(1).values,
+        'Avg_Monetary': stats['mean'].round(1).values,
+        'Avg_Monetary_±%': (monetary_half / stats['mean'].clip(lower=1e-9) * 100).round(1).values,
+    })
+
+
+def _build_segmentation_preview(df_raw: pd.DataFrame, k: int, with_sse: bool) -> Preview | None:
+    start = time.perf_counter()
+    rate = sample_rate(df_raw)
+    sample = customer_sample(df_raw, rate)
+    out = segment_customers(sample, k, with_sse)
+    if out is None or out["summary"] is None:
+        return None
+    bounds = _segment_bounds(out["rfm"], out["summary"], rate)
+    # Số khách trong bảng tóm tắt là ước lượng cho toàn bộ dataset
+    summary = out["summary"].assign(Customers=(out["summary"]['Customers'] / rate).round().astype(int))
+    return Preview(
+        result={**out, "summary": summary},
+        rate=rate,
+        sample_rows=len(sample),
+        bounds=bounds,
+        error_bound=float(bounds['Share_±pp'].max()),
+        elapsed_s=time.perf_counter() - start
+    )
+
+
+@profiled("progressive.segmentation_preview")
+def segmentation_preview(df_raw: pd.DataFrame, k: int, with_sse: bool = False) -> Preview | None:
+    """Phân khúc trên mẫu khách hàng (RFM → KMeans → tóm tắt), dùng chung qua kho dataset."""
+    if 'CustomerID' not in df_raw.columns:
+        return None
+    return dataset_artefact(df_raw, "segmentation_preview", _build_segmentation_preview, int(k), bool(with_sse))
+
+
+def _monthly_variance(sample: pd.DataFrame, keyword: str, months: pd.DatetimeIndex) -> np.ndarray:
+    """Tổng bình phương doanh thu từng dòng theo tháng (cho phương sai ước lượng Horvitz–Thompson)."""
+    quantity = pd.to_numeric(sample['Quantity'], errors='coerce')
+    price = pd.to_numeric(sample['UnitPrice'], errors='coerce')
+    dates = pd.to_datetime(sample['InvoiceDate'], errors='coerce')
+    sales = (
+        sample['Description'].str.contains(keyword, case=False, regex=False, na=False)
+        & (quantity > 0) & (price > 0) & dates.notna()
+    )
+    revenue = (quantity * price)[sales]
+    month = dates[sales].dt.to_period('M').dt.to_timestamp('M')
+    return (revenue ** 2).groupby(month.values).sum().reindex(months, fill_value=0.0).values
+
+
+def _build_forecast_preview(
+    df_raw: pd.DataFrame,
+    keyword: str,
+    history_months: int,
+    forecast_months: int,
+    capital_cost: float
+) -> Preview | None:
+    start = time.perf_counter()
+    rate = sample_rate(df_raw)
+    sample = transaction_sample(df_raw, rate)
+    # Ngưỡng MAPE không dùng: bản xem trước chỉ chọn baseline NumPy (không fit statsmodels/Prophet)
+    model = ForecastModel(keyword, history_months, forecast_months, capital_cost, mape_threshold=0.0)
+    result = model.preprocess(sample)
+    if result is None:
+        return None
+
+    # Ước lượng Horvitz–Thompson theo từng tháng (phân tầng theo tháng): tổng trên mẫu / rate
+    monthly = result.monthly / rate
+    variance = (1 - rate) / rate ** 2 * _monthly_variance(sample, keyword, monthly.index)
+    half = Z_95 * np.sqrt(variance)
+    result = model.forecast(replace(result, monthly=monthly), "BASELINE")
+    bounds = pd.DataFrame({
+        'Month': monthly.index,
+        'Revenue': monthly.values.round(2),
+        'Revenue_±': half.round(2),
+        'Revenue_±%': (half / np.maximum(monthly.values, 1e-9) * 100).round(1),
+    })
+    return Preview(
+        result=result,
+        rate=rate,
+        sample_rows=len(sample),
+        bounds=bounds,
+        error_bound=float(bounds['Revenue_±%'].max()),
+        elapsed_s=time.perf_counter() - start
+    )
+
+
+@profiled("progressive.forecast_preview")
+def forecast_preview(
+    df_raw: pd.DataFrame,
+    keyword: str,
+    history_months: int,
+    forecast_months: int,
+    capital_cost: float
+) -> Preview | None:
+    """Dự báo BASELINE trên doanh thu tháng ước lượng từ mẫu giao dịch, dùng chung qua kho dataset."""
+    if not all(col in df_raw.columns for col in SALES_COLUMNS):
+        return None
+    return dataset_artefact(
+        df_raw, "forecast_preview", _build_forecast_preview,
+        keyword, int(history_months), int(forecast_months), float(capital_cost)
+    )
+
+
+def segmentation_preview_error(preview: Preview, out: dict) -> float:
+    """Sai số thực tế của bản xem trước: chênh lệch tỷ trọng khách lớn nhất giữa các phân khúc (điểm %)."""
+    final = out["summary"].set_index('Segment')['Customers']
+    estimated = preview.result["summary"].set_index('Segment')['Customers']
+    shares = pd.concat([estimated / estimated.sum(), final / final.sum()], axis=1).fillna(0.0)
+    return float((shares.iloc[:, 0] - shares.iloc[:, 1]).abs().max() * 100)
+
+
+def forecast_preview_error(preview: Preview, result: ForecastResult) -> float:
+    """Sai số thực tế của bản xem trước: chênh lệch tương đối lớn nhất của doanh thu tháng (%)."""
+    final = result.monthly
+    estimated = preview.result.monthly.reindex(final.index, fill_value=0.0)
+    return float(((estimated - final).abs() / final.clip(lower=1e-9)).max() * 100)
@@ -1,8 +1,12 @@
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+import numpy as np
 from typing import Optional, List, Dict
+from services.lazy_imports import lazy_import
+from services.profiling import profiled
+from dao.data_loader import dataset_artefact
+from services.aggregate_cube import aggregate_cube
 
+@profiled("segmentation.rfm_preprocess")
 def load_and_preprocess_rfm_segmentation(df_raw: pd.DataFrame) -> Optional[pd.DataFrame]:
     """
     Load raw DataFrame và trả về RFM DataFrame với cột:
@@ -16,22 +20,19 @@ def load_and_preprocess_rfm_segmentation(df_raw: pd.DataFrame) -> Optional[pd.Da
     if not all(col in df_raw.columns for col in required):
         return None
 
-    df = df_raw.dropna(subset=['CustomerID']).copy()
-    df['CustomerID'] = df['CustomerID'].astype(str)
-    df = df[df['Quantity'] > 0]
-    df['TotalPrice'] = df['Quantity'] * df['UnitPrice']
-    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], errors='coerce')
-    df = df.dropna(subset=['InvoiceDate'])
-    if df['InvoiceDate'].empty:
+    # Đọc từ khối tổng hợp (khách hàng × tháng) thay vì groupby lại toàn bộ giao dịch
+    cube = aggregate_cube(df_raw)
+    if cube.rfm_reference is None:
         return None
 
-    ref_date = df['InvoiceDate'].max() + pd.Timedelta(days=1)
-    rfm = df.groupby('CustomerID').agg(
-        LastPurchase=('InvoiceDate', 'max'),
-        Recency=('InvoiceDate', lambda x: (ref_date - x.max()).days),
-        Frequency=('InvoiceNo', 'nunique'),
-        Monetary=('TotalPrice', 'sum')
-    ).reset_index()
+    last_purchase = pd.DatetimeIndex(cube.customer_last_purchase)
+    rfm = pd.DataFrame({
+        'CustomerID': cube.customers,
+        'LastPurchase': last_purchase,
+        'Recency': (cube.rfm_reference - last_purchase).days,
+        'Frequency': np.asarray(cube.customer_invoices.sum(axis=1)).ravel().astype(np.int64),
+        'Monetary': np.asarray(cube.customer_revenue.sum(axis=1)).ravel()
+    })
 
     # Giữ những khách có Frequency>0 và Monetary>0
     rfm = rfm[(rfm['Frequency'] > 0) & (rfm['Monetary'] > 0)]
@@ -39,6 +40,7 @@ def load_and_preprocess_rfm_segmentation(df_raw: pd.DataFrame) -> Optional[pd.Da
     return rfm
 
 
+@profiled("segmentation.compute_sse")
 def compute_sse_segmentation(rfm_df: pd.DataFrame, max_k: int = 6) -> List[float]:
     """
     Tính SSE cho các k=1..max_k (hoặc tới số khách).
@@ -47,6 +49,8 @@ def compute_sse_segmentation(rfm_df: pd.DataFrame, max_k: int = 6) -> List[float
     if rfm_df is None or rfm_df.empty:
         return [0.0] * max_k
 
+    KMeans = lazy_import("sklearn.cluster").KMeans
+    StandardScaler = lazy_import("sklearn.preprocessing").StandardScaler
     X = StandardScaler().fit_transform(rfm_df[['Recency', 'Frequency', 'Monetary']])
     sse: List[float] = []
     limit = min(max_k, len(rfm_df))
@@ -59,23 +63,26 @@ def compute_sse_segmentation(rfm_df: pd.DataFrame, max_k: int = 6) -> List[float
     return sse
 
 
+@profiled("segmentation.cluster_rfm")
 def cluster_rfm(rfm_df: pd.DataFrame, k: int) -> pd.DataFrame:
     """
     Phân cụm RFM thành k cụm. Nếu chỉ 1 khách, gán cluster=0.
+    Trả về bản sao có thêm cột Cluster; rfm_df (có thể là bảng dùng chung trong kho dataset) không bị sửa.
     """
     if rfm_df is None or rfm_df.empty:
         return rfm_df
 
     if len(rfm_df) < 2:
-        rfm_df['Cluster'] = 0
-        return rfm_df
+        return rfm_df.assign(Cluster=0)
 
+    KMeans = lazy_import("sklearn.cluster").KMeans
+    StandardScaler = lazy_import("sklearn.preprocessing").StandardScaler
     X = StandardScaler().fit_transform(rfm_df[['Recency', 'Frequency', 'Monetary']])
     km = KMeans(n_clusters=k, random_state=42, n_init='auto')
-    rfm_df['Cluster'] = km.fit_predict(X)
-    return rfm_df
+    return rfm_df.assign(Cluster=km.fit_predict(X))
 
 
+@profiled("segmentation.summarize_rfm")
 def summarize_rfm(rfm_df: pd.DataFrame) -> pd.DataFrame:
     """
     Build summary RFM và assign segments exactly như định nghĩa:
@@ -136,3 +143,43 @@ def summarize_rfm(rfm_df: pd.DataFrame) -> pd.DataFrame:
 
     summary['Segment'] = summary['Cluster'].map(segment_map)
     return summary
+
+
+def segment_assignments(out: Dict) -> pd.DataFrame:
+    """Một dòng mỗi khách: RFM + Cluster + Segment, từ kết quả của segment_customers."""
+    segments = out["summary"].set_index('Cluster')['Segment']
+    return out["rfm"].assign(Segment=out["rfm"]['Cluster'].map(segments))
+
+
+def segment_customers(
+    df_raw: pd.DataFrame,
+    k: int,
+    with_sse: bool = False,
+    progress=None
+) -> Optional[Dict]:
+    """
+    Toàn bộ quy trình phân khúc: RFM → (SSE cho Elbow) → phân cụm → tóm tắt.
+    k được giảm về số khách nếu lớn hơn. Trả về dict rfm, summary, sse, k (k thực dùng),
+    hoặc None nếu không đủ dữ liệu hợp lệ.
+    `progress(stage, fraction)` dùng để báo tiến độ (và là điểm huỷ khi chạy nền).
+    """
+    def report(stage: str, fraction: float):
+        if progress is not None:
+            progress(stage, fraction)
+
+    # Bảng RFM và SSE chỉ phụ thuộc dataset nên được tính một lần và dùng chung qua kho dataset
+    report("Tính RFM", 0.0)
+    rfm = dataset_artefact(df_raw, "rfm", load_and_preprocess_rfm_segmentation)
+    if rfm is None or rfm.empty:
+        return None
+
+    k = min(k, len(rfm))
+    sse = None
+    if with_sse:
+        report("Tính SSE cho Elbow", 0.4)
+        sse = dataset_artefact(df_raw, "rfm_sse", lambda _: compute_sse_segmentation(rfm))
+    report("Phân cụm KMeans", 0.7)
+    rfm_c = cluster_rfm(rfm, k) if k >= 2 else rfm
+    report("Tóm tắt phân khúc", 0.9)
+    summary = summarize_rfm(rfm_c) if k >= 2 else None
+    return {"rfm": rfm_c, "summary": summary, "sse": sse, "k": k}
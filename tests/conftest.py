@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Chạy pytest từ thư mục gốc của repo: các gói dao/services/controllers import theo đường dẫn gốc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
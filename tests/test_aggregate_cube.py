@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from services.aggregate_cube import build_cube
+
+
+def _sales(rows: list[tuple]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=['InvoiceNo', 'CustomerID', 'Description', 'Quantity', 'UnitPrice', 'InvoiceDate'])
+
+
+def test_keywords_are_matched_literally():
+    cube = build_cube(_sales([
+        ("1", 1, "MUG [BLUE]", 2, 1.5, "2011-01-05"),
+        ("2", 1, "MUG (RED)", 1, 1.5, "2011-01-06"),
+        ("3", 2, "CANDLE", 3, 2.0, "2011-01-07"),
+    ]))
+    assert list(cube.products[cube.match_products("[")]) == ["MUG [BLUE]"]
+    assert list(cube.products[cube.match_products("(red")]) == ["MUG (RED)"]
+    assert len(cube.match_products(".*")) == 0
+
+
+def test_missing_invoice_does_not_hide_a_valid_invoice():
+    # Khách 1 có hoá đơn "1"; khách 2 có hoá đơn "2", một dòng thiếu InvoiceNo, rồi hoá đơn "3".
+    # Với mã -1, cặp (khách 2, -1) trùng giá trị với (khách 1, "3") nếu không loại dòng thiếu.
+    cube = build_cube(_sales([
+        ("1", 1, "MUG", 1, 1.0, "2011-01-05"),
+        ("2", 2, "MUG", 1, 1.0, "2011-01-06"),
+        (None, 2, "MUG", 1, 1.0, "2011-01-07"),
+        ("3", 1, "MUG", 1, 1.0, "2011-01-08"),
+        ("3", 2, "MUG", 1, 1.0, "2011-01-09"),
+    ]))
+    assert cube.customer_invoices.sum(axis=1).A1.tolist() == [2.0, 2.0]
+    assert cube.product_invoices.sum() == 3.0
@@ -0,0 +1,44 @@
+import logging
+
+import pandas as pd
+import pytest
+
+from controllers import api_controller
+from controllers.api_controller import ApiError, run_batch
+from dao.dataset_store import DatasetStore
+
+
+def test_unexpected_error_only_fails_its_own_item(caplog):
+    def one(keyword):
+        if keyword == "bad":
+            raise RuntimeError("boom")
+        return {"keyword": keyword}
+
+    with caplog.at_level(logging.ERROR, logger="dss.api"):
+        results = run_batch(one, ["mug", "bad", "candle"])
+
+    assert results[0] == {"keyword": "mug"} and results[2] == {"keyword": "candle"}
+    assert results[1]["input"] == "bad" and "boom" in results[1]["error"]
+    assert "'bad'" in caplog.text
+
+
+def _csv(n: int) -> bytes:
+    return pd.DataFrame({"InvoiceNo": range(n), "Quantity": 1}).to_csv(index=False).encode()
+
+
+def test_datasets_live_in_the_store_and_spill_under_its_budget(monkeypatch, tmp_path):
+    store = DatasetStore(budget_mb=0.5, spill_dir=str(tmp_path))
+    monkeypatch.setattr(api_controller, "get_dataset_store", lambda: store)
+    monkeypatch.setattr(api_controller, "_DATASETS", {})
+
+    first = api_controller.register_dataset(_csv(20000))["dataset"]
+    second = api_controller.register_dataset(_csv(30000))["dataset"]
+    # API chỉ giữ fingerprint; dataset cũ bị kho đẩy ra đĩa rồi nạp lại khi cần
+    assert api_controller._DATASETS == {first: 20000, second: 30000}
+    assert store.counters["evictions"] >= 1
+    assert len(api_controller._dataset({"dataset": first})) == 20000
+
+    store.clear(first)
+    with pytest.raises(ApiError) as err:
+        api_controller._dataset({"dataset": first})
+    assert err.value.status == 404 and first not in api_controller._DATASETS
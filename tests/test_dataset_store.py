@@ -0,0 +1,43 @@
+import numpy as np
+
+from dao.dataset_store import DatasetStore
+
+
+def _store(tmp_path) -> DatasetStore:
+    # Ngân sách ~1.5 MB: mỗi artefact 1 MB nên thêm mục thứ hai sẽ đẩy mục cũ ra đĩa
+    return DatasetStore(budget_mb=1.5, spill_dir=str(tmp_path))
+
+
+def _artefact(seed: int) -> tuple:
+    # tuple không tạo được tham chiếu yếu: sau khi bị đẩy ra, chỉ còn bản trên đĩa
+    return (np.full(2**17, float(seed)),)
+
+
+def test_spill_writes_outside_store_lock(tmp_path):
+    store = _store(tmp_path)
+    held = []
+    spill = store._spill
+
+    def spill_checking_lock(key, value):
+        held.append(store._lock.locked())
+        return spill(key, value)
+
+    store._spill = spill_checking_lock
+    store.get_or_compute("a", "x", lambda: _artefact(1))
+    store.get_or_compute("b", "x", lambda: _artefact(2))
+    assert held == [False]
+
+    reloaded = store.get_or_compute("a", "x", lambda: _artefact(-1))
+    assert reloaded[0][0] == 1.0
+    assert store.counters["disk_loads"] == 1 and store.counters["misses"] == 2
+
+
+def test_key_locks_are_pruned_on_eviction(tmp_path):
+    store = _store(tmp_path)
+    for i in range(5):
+        store.get_or_compute(f"d{i}", "x", lambda: _artefact(i))
+    store.get_or_compute("empty", "x", lambda: None)
+    assert set(store._key_locks) == {("d4", "x")}
+
+    store.clear()
+    assert not store._key_locks and not store._entries
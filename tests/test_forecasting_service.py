@@ -0,0 +1,97 @@
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.forecasting_service import (
+    ForecastModel, ForecastResult, select_baselines, BASELINE_METHODS, mape_percent,
+    differencing_orders, select_order
+)
+
+# Sai lệch tối đa (tương đối) giữa dự báo nối tiếp từ fit trên train và dự báo fit lại trên toàn bộ lịch sử
+EXTEND_DRIFT_TOLERANCE = 0.05
+
+
+def _monthly(n: int = 36, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    values = 1000 + 15 * t + 120 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 40, n)
+    return pd.Series(values, index=pd.date_range("2010-01-31", periods=n, freq="M"), name="Revenue")
+
+
+def _result(monthly: pd.Series, horizon: int) -> ForecastResult:
+    return ForecastResult(keyword="TEST", forecast_months=horizon, capital_cost=1.0, avg_unit_price=2.0, monthly=monthly)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_arima_refit_extends_train_fit_within_tolerance(seed):
+    horizon = 6
+    monthly = _monthly(seed=seed)
+    model = ForecastModel("TEST", 36, horizon, 1.0, 15.0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        out = model.forecast(_result(monthly, horizon), "ARIMA")
+        train_fit = model._fit(_result(monthly, horizon), "ARIMA", monthly[:-horizon])
+        cold = model._fit(_result(monthly, horizon), "ARIMA", monthly)
+
+    # Không tối ưu lần hai: tham số cuối cùng chính là tham số ước lượng trên train
+    assert out.params == train_fit.params
+    assert set(out.fit_seconds) == {"train", "refit"}
+    drift = np.max(np.abs(out.forecast_series.values - cold.forecast.values) / np.abs(cold.forecast.values))
+    assert drift <= EXTEND_DRIFT_TOLERANCE
+
+
+def test_short_train_split_refits_on_full_history():
+    # 6 tháng train cho ARIMA(1,1,1): nghiệm kém xác định nên phải fit lại thay vì nối tiếp
+    horizon = 6
+    monthly = _monthly(n=12)
+    model = ForecastModel("TEST", 12, horizon, 1.0, 15.0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        out = model.forecast(_result(monthly, horizon), "ARIMA")
+        cold = model._fit(_result(monthly, horizon), "ARIMA", monthly)
+    assert out.params == pytest.approx(cold.params)
+
+
+def test_backtest_summary_does_not_mutate_result():
+    monthly = _monthly(n=24)
+    model = ForecastModel("TEST", 24, 3, 1.0, 15.0)
+    result = _result(monthly, 3)
+    summary, out = model.backtest_summary(result, model_types=("BASELINE",), n_origins=3)
+    assert result.backtest_results.empty
+    assert list(out.backtest_results.columns) == ["BASELINE"]
+    assert summary.loc[0, 'Origins'] == 3
+
+
+def test_baseline_choice_does_not_see_reported_holdout():
+    Y = np.vstack([_monthly(36, seed).values for seed in range(4)])
+    horizon = 6
+    names, mapes, _ = select_baselines(Y, horizon)
+
+    # Thay đổi tập kiểm tra (6 tháng cuối) không được làm đổi phương pháp đã chọn
+    shifted = Y.copy()
+    shifted[:, -horizon:] *= 1.5
+    assert list(select_baselines(shifted, horizon)[0]) == list(names)
+
+    # MAPE báo cáo là MAPE của phương pháp đã chọn trên 6 tháng cuối
+    train, test = Y[:, :-horizon], Y[:, -horizon:]
+    for i, name in enumerate(names):
+        expected = mape_percent(test[i:i + 1], BASELINE_METHODS[name](train[i:i + 1], horizon))[0]
+        assert mapes[i] == pytest.approx(expected)
+
+
+def test_order_search_fixes_differencing_before_aic():
+    series = _monthly(36, seed=3)
+    d, D = differencing_orders(series.values, seasonal=True)
+    order, seasonal_order = select_order(series, seasonal=True)
+    assert order[1] == d and seasonal_order[1] == D
+
+
+def test_order_search_stops_at_deadline():
+    series = _monthly(36, seed=4)
+    start = time.monotonic()
+    order, seasonal_order = select_order(series, seasonal=True, time_budget=0.0)
+    assert time.monotonic() - start < 2.0
+    assert len(order) == 3 and len(seasonal_order) == 4
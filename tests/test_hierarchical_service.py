@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.hierarchical_service import build_hierarchy, forecast_hierarchy, reconcile, RECONCILE_METHODS
+
+HORIZON = 4
+
+
+def _sales(n_months: int = 18, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    products = ["MUG RED", "MUG BLUE", "CANDLE WHITE", "CANDLE PINK", "LANTERN"]
+    rows = []
+    for m, month in enumerate(pd.date_range("2010-01-01", periods=n_months, freq="MS")):
+        for p, name in enumerate(products):
+            qty = int(20 + 5 * p + 3 * m + rng.integers(0, 10))
+            rows.append((f"{m}-{p}", p, name, qty, 1.0 + p, month + pd.Timedelta(days=int(rng.integers(0, 27)))))
+    return pd.DataFrame(rows, columns=['InvoiceNo', 'CustomerID', 'Description', 'Quantity', 'UnitPrice', 'InvoiceDate'])
+
+
+@pytest.fixture(scope="module")
+def hierarchy():
+    return build_hierarchy(_sales(), ["mug", "candle"], 12)
+
+
+def _assert_coherent(h, y: np.ndarray):
+    # Tổng = tổng các nhóm = tổng các sản phẩm; mỗi nhóm = tổng sản phẩm của nhóm đó
+    n_a = h.n_aggregate
+    bottom = y[n_a:]
+    np.testing.assert_allclose(y[0], bottom.sum(axis=0), rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(y[0], y[1:n_a].sum(axis=0), rtol=1e-9, atol=1e-6)
+    for c in range(len(h.categories)):
+        np.testing.assert_allclose(y[1 + c], bottom[h.product_category == c].sum(axis=0), rtol=1e-9, atol=1e-6)
+
+
+def test_hierarchy_groups_products_by_first_keyword(hierarchy):
+    assert hierarchy.categories == ["MUG", "CANDLE", "KHÁC"]
+    assert hierarchy.nodes['Level'].tolist().count('Sản phẩm') == 5
+    assert hierarchy.base.shape == (5, 12)
+
+
+@pytest.mark.parametrize("method", RECONCILE_METHODS)
+def test_reconciled_forecasts_are_coherent(hierarchy, method):
+    rng = np.random.default_rng(1)
+    history = np.asarray(hierarchy.S @ hierarchy.base)
+    # Dự báo cơ sở cố ý không khớp giữa các cấp
+    y_hat = history[:, -HORIZON:] * rng.uniform(0.7, 1.3, (history.shape[0], HORIZON))
+    _assert_coherent(hierarchy, np.asarray(reconcile(hierarchy, y_hat, method, history)))
+
+
+@pytest.mark.parametrize("method", RECONCILE_METHODS)
+def test_forecast_hierarchy_is_coherent(hierarchy, method):
+    out = forecast_hierarchy(hierarchy, HORIZON, method)
+    months = [c for c in out.columns if c not in ('Level', 'Name', 'Base_Method', 'Base_MAPE', 'Total')]
+    assert len(months) == HORIZON
+    _assert_coherent(hierarchy, out[months].to_numpy())
+
+
+def test_mint_diag_with_identity_weights_matches_ols(hierarchy):
+    rng = np.random.default_rng(2)
+    n_nodes = hierarchy.S.shape[0]
+    y_hat = rng.uniform(50, 500, (n_nodes, HORIZON))
+    # Lịch sử có sai số naive một bước với phương sai 1 ở mọi nút -> W = I
+    steps = np.tile([1.0, -1.0], 6)
+    history = 100 + np.tile(np.concatenate([[0.0], np.cumsum(steps)]), (n_nodes, 1))
+    assert np.allclose(np.var(np.diff(history, axis=1), axis=1), 1.0)
+
+    ols = reconcile(hierarchy, y_hat, "ols")
+    np.testing.assert_allclose(reconcile(hierarchy, y_hat, "mint_diag", history), ols, rtol=1e-9)
+    # Không có lịch sử: mint_diag cũng dùng W = I
+    np.testing.assert_allclose(reconcile(hierarchy, y_hat, "mint_diag"), ols, rtol=1e-9)
@@ -0,0 +1,97 @@
+import sys
+import threading
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from services import profiling
+from services.job_manager import JobManager, DONE, CANCELLED
+
+
+def _segmentation_job_app():
+    import numpy as np
+    import pandas as pd
+    import streamlit as st
+    from services import profiling
+    from services.segmentation_service import segment_customers
+    from views.job_view import start_job, render_job_progress
+
+    rng = np.random.default_rng(0)
+    n = 400
+    df_raw = pd.DataFrame({
+        "InvoiceNo": [str(536000 + i // 3) for i in range(n)],
+        "CustomerID": rng.integers(12000, 12060, n).astype(float),
+        "Description": rng.choice(["MUG", "CANDLE", "BAG"], n),
+        "Quantity": rng.integers(1, 20, n),
+        "UnitPrice": rng.uniform(0.5, 10, n).round(2),
+        "InvoiceDate": pd.Timestamp("2011-01-01") + pd.to_timedelta(rng.integers(0, 300, n), unit="D"),
+    })
+    df_raw.attrs["fingerprint"] = "test-job-profiling"
+
+    profiling.start_run(True)
+    try:
+        with profiling.span("flow.segmentation_flow"):
+            if "segments" not in st.session_state and "job" not in st.session_state:
+                start_job("job", "segmentation", ("test-job-profiling", 3), segment_customers, df_raw, 3)
+            job = render_job_progress("job", "Phân khúc")
+            if job is not None:
+                st.session_state["segments"] = job.result
+    finally:
+        st.session_state.setdefault("runs", []).append(profiling.finish_run())
+
+
+def test_job_backed_flow_records_job_spans(monkeypatch):
+    # AppTest cài script thử làm __main__; trả lại sau test để pool tiến trình (spawn/forkserver)
+    # của các test sau không chạy lại script đó trong tiến trình con
+    monkeypatch.setitem(sys.modules, "__main__", sys.modules["__main__"])
+    at = AppTest.from_function(_segmentation_job_app, default_timeout=60)
+    at.run()
+    for _ in range(120):
+        if "segments" in at.session_state:
+            break
+        time.sleep(0.25)
+        at.run()
+    assert "segments" in at.session_state
+
+    records = at.session_state["runs"][-1]
+    by_name = {r["span"]: r for r in records}
+    assert {"job.segmentation", "segmentation.cluster_rfm", "segmentation.summarize_rfm"} <= set(by_name)
+    # Span của job nằm dưới span của flow đang nhận kết quả
+    assert by_name["flow.segmentation_flow"]["depth"] == 0
+    assert by_name["job.segmentation"]["depth"] == 1
+    assert by_name["segmentation.cluster_rfm"]["depth"] == 2
+
+
+def test_job_submitted_without_profiling_records_no_spans():
+    manager = JobManager(max_workers=1)
+    job = manager.submit("plain", (1,), lambda progress: 42)
+    job._future.result(timeout=10)
+    assert job.status == DONE and job.result == 42 and job.spans == []
+    assert not profiling.is_enabled()
+
+
+def test_resubmit_after_cancel_starts_a_fresh_job():
+    manager = JobManager(max_workers=2)
+    started, release = threading.Event(), threading.Event()
+
+    def work(value, progress):
+        if value == "slow":
+            started.set()
+            release.wait(10)
+        progress("Xong", 1.0)
+        return value
+
+    first = manager.submit("test", ("key",), work, "slow", owner="a")
+    assert started.wait(10)
+    assert manager.cancel(first.id, "a")
+
+    # Cùng khoá, gửi lại khi job cũ đang huỷ nhưng chưa tới điểm kiểm tra
+    second = manager.submit("test", ("key",), work, "fast", owner="b")
+    assert second is not first
+    second._future.result(timeout=10)
+    release.set()
+    first._future.result(timeout=10)
+
+    assert first.status == CANCELLED
+    assert second.status == DONE and second.result == "fast"
+    assert manager.submit("test", ("key",), work, "fast", owner="c") is second
@@ -0,0 +1,41 @@
+import importlib
+import sys
+import types
+from importlib.machinery import ModuleSpec
+
+from services import lazy_imports
+from services.lazy_imports import lazy_import
+
+
+def _fake_module(monkeypatch, initializing: bool) -> types.ModuleType:
+    module = types.ModuleType("dss_fake_heavy")
+    module.__spec__ = ModuleSpec("dss_fake_heavy", loader=None)
+    module.__spec__._initializing = initializing
+    monkeypatch.setitem(sys.modules, "dss_fake_heavy", module)
+    return module
+
+
+def test_module_still_initializing_goes_through_import_machinery(monkeypatch):
+    module = _fake_module(monkeypatch, initializing=True)
+    calls = []
+
+    def import_module(name):
+        # import_module chờ luồng đang import xong rồi mới trả về module
+        calls.append(name)
+        module.__spec__._initializing = False
+        return module
+
+    monkeypatch.setattr(importlib, "import_module", import_module)
+    monkeypatch.setattr(lazy_imports, "IMPORT_TIMINGS", {})
+    assert lazy_import("dss_fake_heavy") is module
+    assert calls == ["dss_fake_heavy"]
+
+
+def test_initialized_module_is_returned_without_import(monkeypatch):
+    module = _fake_module(monkeypatch, initializing=False)
+
+    def import_module(name):
+        raise AssertionError(f"{name} đã khởi tạo xong, không cần import lại")
+
+    monkeypatch.setattr(importlib, "import_module", import_module)
+    assert lazy_import("dss_fake_heavy") is module
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from services import partition_service
+from services.partition_service import partition_columns
+
+
+def test_partition_columns_are_scanned_once_per_dataset(monkeypatch):
+    df_raw = pd.DataFrame({
+        "InvoiceNo": [str(i) for i in range(300)],
+        "StockCode": ["A", "B", "C"] * 100,
+        "Country": ["UK", "France"] * 150,
+        "Quantity": range(300),
+    })
+    df_raw.attrs["fingerprint"] = "test-partition-columns"
+    scans = []
+    scan = partition_service._partition_columns
+    monkeypatch.setattr(partition_service, "_partition_columns", lambda df: scans.append(1) or scan(df))
+
+    assert partition_columns(df_raw) == ["Country", "StockCode"]
+    assert partition_columns(df_raw) == ["Country", "StockCode"]
+    assert len(scans) == 1
+
+
+def test_split_stores_positions_and_slices_parts_lazily():
+    df_raw = pd.DataFrame({
+        "Country": ["UK", "France", "UK", None, "Germany", "France"],
+        "Quantity": [1, 2, 3, 4, 5, 6],
+    })
+    df_raw.attrs["fingerprint"] = "test-partition-split"
+    parts = partition_service.split_partitions(df_raw, "Country")
+
+    assert parts.frame is df_raw
+    assert all(isinstance(p, np.ndarray) for p in parts.index.positions)
+    assert parts.labels == ["France", "Germany", "UK"]
+    assert parts.sizes().tolist() == [2, 1, 2]
+    uk = parts.part(2)
+    assert uk["Quantity"].tolist() == [1, 3]
+    assert uk.attrs["fingerprint"] == "test-partition-split|Country/UK"
+
+
+def test_partitions_run_in_worker_processes():
+    df_raw = pd.DataFrame({"Country": ["UK", "France", "UK"], "Quantity": [1, 2, 3]})
+    df_raw.attrs["fingerprint"] = "test-partition-run"
+    parts = partition_service.split_partitions(df_raw, "Country")
+    assert partition_service.run_partitioned(parts, len) == {"France": 1, "UK": 2}
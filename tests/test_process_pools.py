@@ -0,0 +1,20 @@
+import os
+
+from services.process_pools import get_process_pool, retire_process_pool
+
+
+def test_shared_pool_does_not_fork_a_threaded_process():
+    pool = get_process_pool("test_pool", 1)
+    assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+    assert get_process_pool("test_pool", 1) is pool
+    assert pool.submit(os.getpid).result(timeout=60) != os.getpid()
+    retire_process_pool("test_pool", pool)
+
+
+def test_retired_pool_is_replaced():
+    pool = get_process_pool("test_pool", 1)
+    retire_process_pool("test_pool", pool)
+    fresh = get_process_pool("test_pool", 1)
+    assert fresh is not pool
+    assert fresh.submit(abs, -3).result(timeout=60) == 3
+    retire_process_pool("test_pool", fresh)
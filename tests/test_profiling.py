@@ -0,0 +1,43 @@
+import threading
+
+from services import profiling
+
+
+def _run_spans(started: threading.Event, release: threading.Event, out: list):
+    profiling.start_run(True)
+    try:
+        with profiling.span("other.thread"):
+            started.set()
+            release.wait(5)
+    finally:
+        out.extend(profiling.finish_run())
+
+
+def test_peak_memory_is_measured_for_a_single_run():
+    profiling.start_run(True)
+    try:
+        with profiling.span("outer"):
+            with profiling.span("inner"):
+                block = bytearray(4 * 2**20)
+            del block
+    finally:
+        records = profiling.finish_run()
+    peaks = {r["span"]: r["peak_mb"] for r in records}
+    assert peaks["inner"] >= 3.9 and peaks["outer"] >= peaks["inner"]
+
+
+def test_peak_memory_is_dropped_when_runs_overlap():
+    started, release, other = threading.Event(), threading.Event(), []
+    profiling.start_run(True)
+    try:
+        with profiling.span("outer"):
+            thread = threading.Thread(target=_run_spans, args=(started, release, other))
+            thread.start()
+            started.wait(5)
+            with profiling.span("inner"):
+                pass
+            release.set()
+            thread.join(5)
+    finally:
+        records = profiling.finish_run()
+    assert [r["peak_mb"] for r in records + other] == [None, None, None]
@@ -0,0 +1,5 @@
+# Gợi ý chung cho các ô nhập từ khóa sản phẩm (khớp chuỗi con, không phân biệt hoa thường)
+KEYWORD_HELP = (
+    "Khớp chuỗi con theo đúng ký tự đã nhập, không phân biệt hoa thường. "
+    "Ký tự như [ ] ( ) . * được hiểu theo nghĩa đen, không phải biểu thức chính quy."
+)
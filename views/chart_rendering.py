@@ -0,0 +1,92 @@
+"""
+Lớp vẽ biểu đồ dùng chung cho các view:
+  - Mặc định dùng biểu đồ Vega-Lite (Altair) của Streamlit: chỉ gửi các điểm dữ liệu
+    xuống trình duyệt, server không phải raster hoá ảnh.
+  - Nếu không có Altair thì vẽ bằng matplotlib thành ảnh PNG, cache theo dữ liệu đầu vào,
+    và figure luôn được đóng ngay sau khi vẽ để không rò bộ nhớ trong tiến trình server.
+"""
+import io
+from contextlib import contextmanager
+import streamlit as st
+import pandas as pd
+from services.lazy_imports import lazy_import
+
+
+def _altair():
+    try:
+        return lazy_import("altair")
+    except ImportError:
+        return None
+
+
+@contextmanager
+def managed_figure(figsize=(10, 6)):
+    """plt.subplots() và luôn plt.close(fig) khi ra khỏi khối, kể cả khi có lỗi."""
+    plt = lazy_import("matplotlib.pyplot")
+    fig, ax = plt.subplots(figsize=figsize)
+    try:
+        yield fig, ax
+    finally:
+        plt.close(fig)
+
+
+def _to_png(fig) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    return buf.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _elbow_png(sse: tuple[float, ...], k: int) -> bytes:
+    with managed_figure() as (fig, ax):
+        ax.plot(range(1, len(sse)+1), sse, marker='o')
+        ax.axvline(k, color='red', linestyle='--', label=f'Chọn k={k}')
+        ax.set_xlabel("Số nhóm (k)")
+        ax.set_ylabel("Chỉ số gắn kết (SSE)")
+        ax.legend()
+        ax.grid(True)
+        return _to_png(fig)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _top_products_png(descriptions: tuple[str, ...], profits: tuple[float, ...]) -> bytes:
+    with managed_figure() as (fig, ax):
+        ax.barh(descriptions[::-1], profits[::-1])
+        ax.set_xlabel("Lợi nhuận (£)")
+        ax.set_title(f"🔝 Top {len(descriptions)} sản phẩm")
+        return _to_png(fig)
+
+
+def render_elbow_figure(sse: list[float], k: int):
+    alt = _altair()
+    if alt is None:
+        st.image(_elbow_png(tuple(float(v) for v in sse), int(k)), use_container_width=True)
+        return
+
+    data = pd.DataFrame({"k": range(1, len(sse)+1), "SSE": sse})
+    line = alt.Chart(data).mark_line(point=True).encode(
+        x=alt.X("k:Q", title="Số nhóm (k)", axis=alt.Axis(tickMinStep=1)),
+        y=alt.Y("SSE:Q", title="Chỉ số gắn kết (SSE)"),
+        tooltip=["k", alt.Tooltip("SSE:Q", format=",.1f")]
+    )
+    chosen = pd.DataFrame({"k": [k], "label": [f"Chọn k={k}"]})
+    rule = alt.Chart(chosen).mark_rule(color="red", strokeDash=[6, 4]).encode(x="k:Q")
+    text = alt.Chart(chosen).mark_text(color="red", align="left", dx=4, dy=-120).encode(x="k:Q", text="label")
+    st.altair_chart(line + rule + text, use_container_width=True)
+
+
+def render_top_products_figure(top: pd.DataFrame):
+    alt = _altair()
+    if alt is None:
+        st.image(
+            _top_products_png(tuple(top['Description']), tuple(float(v) for v in top['ExpectedProfit'])),
+            use_container_width=True
+        )
+        return
+
+    chart = alt.Chart(top[['Description', 'ExpectedProfit']]).mark_bar().encode(
+        x=alt.X("ExpectedProfit:Q", title="Lợi nhuận (£)"),
+        y=alt.Y("Description:N", sort="-x", title=None),
+        tooltip=["Description", alt.Tooltip("ExpectedProfit:Q", format=",.2f")]
+    ).properties(title=f"🔝 Top {len(top)} sản phẩm")
+    st.altair_chart(chart, use_container_width=True)
@@ -0,0 +1,47 @@
+import importlib.util
+import json
+import streamlit as st
+import pandas as pd
+from dao.export_writer import EXPORT_FORMATS, EXPORT_SCHEMA_VERSION, export_bytes
+
+_MIME = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+_FORMAT_LABELS = {"csv": "CSV", "parquet": "Parquet (kèm metadata)"}
+
+
+def _formats() -> tuple[str, ...]:
+    # Parquet cần pyarrow (phụ thuộc tuỳ chọn)
+    if importlib.util.find_spec("pyarrow") is None:
+        return tuple(f for f in EXPORT_FORMATS if f != "parquet")
+    return EXPORT_FORMATS
+
+
+@st.fragment
+def render_export(kind: str, frame: pd.DataFrame, metadata: dict, key: str, file_stem: str | None = None):
+    """
+    Nút xuất kết quả ra CSV/Parquet theo schema cố định. File chỉ được tạo khi bấm tải
+    (ghi theo khối, ngoài luồng script); đổi định dạng chỉ chạy lại fragment này.
+    """
+    with st.expander("📤 Xuất kết quả (CSV / Parquet)", expanded=False):
+        fmt = st.radio(
+            "Định dạng", _formats(), format_func=_FORMAT_LABELS.get, horizontal=True, key=f"{key}_format"
+        )
+        stem = file_stem or f"{kind}_{metadata['dataset'][:8]}"
+        st.download_button(
+            f"⬇️ Tải {len(frame):,} dòng", data=lambda: export_bytes(frame, kind, metadata, fmt),
+            file_name=f"{stem}.{fmt}", mime=_MIME[fmt], on_click="ignore", key=f"{key}_download"
+        )
+        if fmt == "csv":
+            st.download_button(
+                "⬇️ Metadata (JSON)",
+                data=lambda: json.dumps(
+                    {**metadata, "kind": kind, "format": fmt, "schema_version": EXPORT_SCHEMA_VERSION,
+                     "rows": len(frame)},
+                    ensure_ascii=False, indent=2, default=str
+                ),
+                file_name=f"{stem}.{fmt}.meta.json", mime="application/json", on_click="ignore",
+                key=f"{key}_metadata_download"
+            )
+        st.caption(
+            f"Dataset `{metadata['dataset'][:12]}` · mô hình {metadata.get('model') or '—'} · "
+            f"chạy {metadata.get('elapsed_s') or 0:.1f}s. Xuất hằng loạt bằng script: `python export_results.py --help`"
+        )
@@ -1,7 +1,146 @@
 import streamlit as st
 import pandas as pd
-from services.forecasting_service import ForecastModel
+from dao.data_loader import dataset_fingerprint, dataset_artefact
+from services.forecasting_service import ForecastModel, build_product_summary, search_products
+from services.hierarchical_service import build_hierarchy, forecast_hierarchy, RECONCILE_METHODS
+from services.profiling import profiled, note_cache_miss
+from services.export_service import forecast_frame, run_metadata
+from services.progressive_service import preview_enabled, forecast_preview, forecast_preview_error
+from services.job_manager import get_job_manager
+from views.job_view import start_job, render_job_progress, job_running
+from views.export_view import render_export
+from views.progressive_view import render_preview_notice, render_preview_error
+from views import KEYWORD_HELP
 
+# Tìm kiếm sản phẩm: bỏ qua từ khóa quá ngắn, giới hạn số dòng trả về và phân trang
+MIN_SEARCH_CHARS = 2
+MAX_SEARCH_RESULTS = 500
+SEARCH_PAGE_SIZE = 50
+FORECAST_JOB_KEY = "forecast_job_id"
+FORECAST_PREVIEW_KEY = "forecast_preview"
+REVENUE_BOUND_LABEL = "% doanh thu mỗi tháng"
+
+
+@profiled("view.forecasting.product_search", cached=True)
+@st.cache_data(show_spinner=False, max_entries=256)
+def _cached_product_search(_summary, fingerprint: str, keyword: str):
+    note_cache_miss()
+    return search_products(_summary, keyword, MAX_SEARCH_RESULTS)
+
+
+@profiled("view.forecasting.product_listing")
+@st.fragment
+def render_product_listing(df_raw, keyword: str):
+    # Fragment: chuyển trang chỉ vẽ lại danh sách
+    fingerprint = dataset_fingerprint(df_raw)
+    # Bảng tóm tắt tính một lần cho mỗi dataset và dùng chung giữa các phiên
+    summary = dataset_artefact(df_raw, "product_summary", build_product_summary)
+    keyword = keyword.strip()
+    with st.expander("Danh sách sản phẩm chứa từ khóa", expanded=False):
+        if len(keyword) < MIN_SEARCH_CHARS:
+            st.info(f"Nhập ít nhất {MIN_SEARCH_CHARS} ký tự để tìm sản phẩm.")
+            return
+        matched, total = _cached_product_search(summary, fingerprint, keyword.upper())
+        if matched.empty:
+            st.warning("Không tìm thấy sản phẩm nào khớp với từ khóa.")
+            return
+
+        n_pages = max(1, -(-len(matched) // SEARCH_PAGE_SIZE))
+        page = st.number_input(
+            f"Trang (1–{n_pages})", min_value=1, max_value=n_pages, value=1, step=1,
+            key="forecast_product_page_input"
+        ) if n_pages > 1 else 1
+        start = (page - 1) * SEARCH_PAGE_SIZE
+        st.dataframe(matched.iloc[start:start + SEARCH_PAGE_SIZE], use_container_width=True, hide_index=True)
+        shown = f" (hiển thị {len(matched)} sản phẩm bán chạy nhất)" if total > len(matched) else ""
+        st.caption(f"Tìm thấy {total} sản phẩm chứa từ khóa “{keyword}”{shown}.")
+
+
+@st.fragment
+def _model_settings(df_forecast, forecast_keyword: str):
+    """
+    Thông số mô hình và nút chạy trong sidebar. Các thông số chỉ được dùng khi bấm "Chạy dự báo",
+    nên đổi chúng chỉ chạy lại fragment này; từ khóa nằm ngoài vì danh sách sản phẩm phụ thuộc vào nó.
+    """
+    forecast_history_months = st.selectbox(
+        "Số tháng phân tích", [12, 18, 24], index=0, key="forecast_history_months_select"
+    )
+    forecast_months = st.selectbox(
+        "Dự báo trong bao lâu (Tháng)", [3, 6, 12], index=1, key="forecast_months_select"
+    )
+    forecast_capital_cost = st.number_input(
+        "Chi phí vốn / đơn vị (£)", min_value=0.0, value=1.0, key="forecast_capital_cost_input"
+    )
+    st.caption("Ví dụ: nếu bạn mua 1 sp giá £1.00 → nhập 1.0")
+
+    forecast_mape_threshold = st.number_input(
+        "Ngưỡng MAPE chấp nhận (%)", min_value=0.0, value=15.0, key="forecast_mape_threshold_input"
+    )
+    st.caption("MAPE càng thấp thì mô hình càng chính xác. <15% là đáng tin cậy")
+
+    forecast_auto_order = st.checkbox(
+        "Tự động chọn bậc ARIMA/SARIMA", False, key="forecast_auto_order_checkbox",
+        help="Tìm bậc (p,d,q)(P,D,Q) theo AIC thay vì dùng cố định (1,1,1)(1,1,1,12)."
+    )
+
+    forecast_backtest = st.checkbox(
+        "Backtest nhiều mốc (rolling-origin)", False, key="forecast_backtest_checkbox",
+        help="Đánh giá MAPE tại nhiều mốc dự báo liên tiếp để có độ chính xác ổn định hơn một lần chia train/test."
+    )
+    forecast_backtest_origins = st.number_input(
+        "Số mốc backtest", min_value=2, max_value=12, value=4, step=1,
+        key="forecast_backtest_origins_input", disabled=not forecast_backtest
+    )
+
+    if st.button("Chạy dự báo", key="run_forecast_button"):
+        model = ForecastModel(
+            forecast_keyword,
+            forecast_history_months,
+            forecast_months,
+            forecast_capital_cost,
+            forecast_mape_threshold,
+            auto_order=forecast_auto_order
+        )
+        origins = int(forecast_backtest_origins) if forecast_backtest else None
+        # Chạy nền: giao diện vẫn tương tác được; yêu cầu trùng tham số dùng chung một job
+        start_job(
+            FORECAST_JOB_KEY, "forecast",
+            (dataset_fingerprint(df_forecast), forecast_keyword, forecast_history_months, forecast_months,
+             forecast_capital_cost, forecast_mape_threshold, forecast_auto_order, origins),
+            model.run, df_forecast, origins,
+            meta={"parameters": {
+                "keyword": forecast_keyword, "history_months": forecast_history_months,
+                "forecast_months": forecast_months, "capital_cost": forecast_capital_cost,
+                "mape_threshold": forecast_mape_threshold, "auto_order": forecast_auto_order,
+                "backtest_origins": origins,
+            }}
+        )
+        # Chạy lại cả trang để tab Thiết lập hiện tiến độ của job vừa gửi
+        st.rerun()
+
+
+def render_forecast_preview(df_forecast):
+    """
+    File lớn: trong lúc job nền chạy, hiện dự báo BASELINE trên doanh thu tháng ước lượng
+    từ mẫu giao dịch (cùng tham số với job đang chạy).
+    """
+    params = get_job_manager().get(st.session_state[FORECAST_JOB_KEY]).meta["parameters"]
+    preview = forecast_preview(
+        df_forecast, params["keyword"], params["history_months"], params["forecast_months"], params["capital_cost"]
+    )
+    if preview is None:
+        return
+    st.session_state[FORECAST_PREVIEW_KEY] = (params, preview)
+    render_preview_notice(preview, REVENUE_BOUND_LABEL)
+    result = preview.result
+    col1, col2 = st.columns(2)
+    col1.metric("Tổng doanh thu dự báo (xem trước)", f"£{result.total_revenue:,.0f}")
+    col2.metric("MAPE (xem trước)", f"{result.mape:.2f}%")
+    st.caption(f"Mô hình xem trước: {result.model_label}")
+    st.line_chart(pd.concat([result.monthly.rename('Lịch sử (ước lượng)'), result.forecast_series.rename('Dự báo')], axis=1))
+
+
+@profiled("view.forecasting.setup")
 def render_setup_tab(df_raw, container):
     with container:
         st.header("Thiết lập mô hình")
@@ -22,87 +161,76 @@ def render_setup_tab(df_raw, container):
                 forecast_keyword = st.text_input(
                     "Từ khóa sản phẩm",
                     value=st.session_state.get("forecast_keyword", "CANDLE"),
-                    key="forecast_keyword_input"
+                    key="forecast_keyword_input",
+                    help=KEYWORD_HELP
                 )
                 st.session_state["forecast_keyword"] = forecast_keyword
+                _model_settings(df_forecast, forecast_keyword)
 
-                forecast_history_months = st.selectbox(
-                    "Số tháng phân tích", [12, 18, 24], index=0, key="forecast_history_months_select"
-                )
-                forecast_months = st.selectbox(
-                    "Dự báo trong bao lâu (Tháng)", [3, 6, 12], index=1, key="forecast_months_select"
-                )
-                forecast_capital_cost = st.number_input(
-                    "Chi phí vốn / đơn vị (£)", min_value=0.0, value=1.0, key="forecast_capital_cost_input"
-                )
-                st.caption("Ví dụ: nếu bạn mua 1 sp giá £1.00 → nhập 1.0")
+            # Danh sách sản phẩm chứa từ khóa (tra trên bảng tóm tắt đã tính sẵn)
+            render_product_listing(df_forecast, forecast_keyword)
 
-                forecast_mape_threshold = st.number_input(
-                    "Ngưỡng MAPE chấp nhận (%)", min_value=0.0, value=15.0, key="forecast_mape_threshold_input"
-                )
-                st.caption("MAPE càng thấp thì mô hình càng chính xác. <15% là đáng tin cậy")
-
-                run_forecast = st.button("Chạy dự báo", key="run_forecast_button")
-
-            # Danh sách sản phẩm chứa từ khóa
-            filtered = df_forecast[
-                df_forecast["Description"].str.contains(forecast_keyword, case=False, na=False)
-            ]
-            with st.expander("Danh sách sản phẩm chứa từ khóa", expanded=True):
-                if not filtered.empty:
-                    df_show = (
-                        filtered[["Description","Quantity","UnitPrice"]]
-                        .drop_duplicates().reset_index(drop=True)
+            job = render_job_progress(FORECAST_JOB_KEY, "Dự báo")
+            if job is not None:
+                result, backtest_summary, notes = job.result
+                # Chỉ lưu kết quả gọn nhẹ vào session, không giữ bản sao df_raw
+                st.session_state["forecast_result"] = result
+                st.session_state["forecast_backtest_summary"] = backtest_summary
+                st.session_state["forecast_run_triggered"] = result is not None
+                if result is not None:
+                    st.session_state["forecast_export_metadata"] = run_metadata(
+                        df_forecast, job.meta["parameters"], model=result.model_label, elapsed_s=job.elapsed
                     )
-                    st.dataframe(df_show, use_container_width=True)
-                    st.caption(f"Tìm thấy {df_show.shape[0]} sản phẩm chứa từ khóa “{forecast_keyword}”.")
-                else:
-                    st.warning("Không tìm thấy sản phẩm nào khớp với từ khóa.")
-
-            if run_forecast:
-                model = ForecastModel(
-                    df_forecast,
-                    forecast_keyword,
-                    forecast_history_months,
-                    forecast_months,
-                    forecast_capital_cost,
-                    forecast_mape_threshold
-                )
-                if model.preprocess():
-                    model.forecast("ARIMA")
-                    if model.mape > forecast_mape_threshold:
-                        st.warning(f"⚠️ MAPE {model.mape:.2f}% vượt ngưỡng. Chuyển sang SARIMA…")
-                        model.forecast("SARIMA")
-                        if model.mape > forecast_mape_threshold:
-                            st.warning("⚠️ SARIMA vẫn chưa đạt yêu cầu. Chuyển sang Prophet…")
-                            model.forecast("PROPHET")
-
-                    st.session_state["forecast_model_instance"] = model
-                    st.session_state["forecast_run_triggered"] = True
-                    st.success(f"✅ Dự báo hoàn tất bằng mô hình {model.model_name}")
-                    st.rerun()
-                else:
-                    st.session_state["forecast_model_instance"] = None
-                    st.session_state["forecast_run_triggered"] = False
+                    for note in notes:
+                        st.warning(note)
+                    st.success(f"✅ Dự báo hoàn tất bằng mô hình {result.model_name} ({job.elapsed:.1f}s)")
+                    previous = st.session_state.pop(FORECAST_PREVIEW_KEY, None)
+                    if previous is not None and previous[0] == job.meta["parameters"]:
+                        render_preview_error(
+                            previous[1], forecast_preview_error(previous[1], result), REVENUE_BOUND_LABEL
+                        )
+            elif job_running(FORECAST_JOB_KEY) and preview_enabled(df_forecast):
+                render_forecast_preview(df_forecast)
         else:
             st.info("📂 Vui lòng tải lên file CSV ở đầu sidebar để bắt đầu.")
 
 
+@profiled("view.forecasting.results")
 def render_results_tab(container):
     with container:
         st.header("Kết quả dự báo")
-        model = st.session_state.get("forecast_model_instance")
+        result = st.session_state.get("forecast_result")
         triggered = st.session_state.get("forecast_run_triggered", False)
 
-        if triggered and model:
+        if triggered and result:
             # Metrics
-            st.metric("Tổng doanh thu dự báo", f"£{model.total_revenue:,.2f}")
-            st.metric("Lợi nhuận gộp ước lượng", f"£{model.gross_profit:,.2f}")
-            st.metric("MAPE", f"{model.mape:.2f}%")
-            st.markdown(f"Mô hình đang sử dụng: **{model.model_name}**")
+            st.metric("Tổng doanh thu dự báo", f"£{result.total_revenue:,.2f}")
+            st.metric("Lợi nhuận gộp ước lượng", f"£{result.gross_profit:,.2f}")
+            st.metric("MAPE", f"{result.mape:.2f}%")
+            if result.model_name == "BASELINE":
+                st.markdown(f"Mô hình đang sử dụng: **BASELINE ({result.baseline_method})**")
+            else:
+                st.markdown(f"Mô hình đang sử dụng: **{result.model_name}**")
+            if result.model_name in result.orders:
+                order, seasonal_order = result.orders[result.model_name]
+                st.caption(f"Bậc mô hình: order={order}" + (f", seasonal_order={seasonal_order}" if seasonal_order else ""))
+            if result.fit_seconds:
+                st.caption("Thời gian fit: " + " · ".join(f"{stage} {sec:.2f}s" for stage, sec in result.fit_seconds.items()))
+
+            backtest_summary = st.session_state.get("forecast_backtest_summary")
+            if backtest_summary is not None and not backtest_summary.empty:
+                st.markdown("### 🧪 Phân phối MAPE qua các mốc backtest")
+                st.dataframe(backtest_summary, use_container_width=True)
+                with st.expander("MAPE (%) chi tiết theo từng mốc"):
+                    st.dataframe(result.backtest_results.round(2), use_container_width=True)
+
+            render_export(
+                "forecast", forecast_frame(result), st.session_state["forecast_export_metadata"],
+                key="forecast_export"
+            )
 
             # Chart + bảng chi tiết
-            chart_data = model.get_chart_data()
+            chart_data = result.get_chart_data()
             if not chart_data.empty:
                 st.line_chart(chart_data)
                 with st.expander("📅 Bảng doanh thu dự báo chi tiết theo tháng"):
@@ -127,18 +255,23 @@ def render_results_tab(container):
                 # Sơ đồ luồng
                 st.markdown("### 📊 Sơ đồ luồng mô hình dự báo")
                 st.code(
-                    "Người dùng nhập dữ liệu → ARIMA → (nếu MAPE > ngưỡng) → SARIMA → (nếu vẫn > ngưỡng) → Prophet",
+                    "Người dùng nhập dữ liệu → Baseline NumPy → (nếu MAPE > ngưỡng) → ARIMA → (nếu MAPE > ngưỡng) → SARIMA → (nếu vẫn > ngưỡng) → Prophet",
                     language=None
                 )
 
                 # Phân tích chuyên sâu
-                st.markdown(f"#### 🔍 Phân tích chuyên sâu: Mô hình {model.model_name}")
-                if model.model_name == "ARIMA":
+                st.markdown(f"#### 🔍 Phân tích chuyên sâu: Mô hình {result.model_name}")
+                if result.model_name == "BASELINE":
+                    st.markdown(f"""
+⚡ Baseline **{result.baseline_method}** đã đạt ngưỡng MAPE nên không cần fit mô hình nặng hơn.  
+➤ Dữ liệu đủ đơn giản để các quy tắc dự báo cơ bản (mùa vụ, trung bình trượt, xu hướng, làm trơn mũ) hoạt động tốt.
+""")
+                elif result.model_name == "ARIMA":
                     st.markdown("""
 ✔ Mô hình ARIMA được sử dụng vì dữ liệu có xu hướng ổn định, không có biến động theo mùa rõ rệt.  
 ➤ Bạn có thể dựa vào dự báo này để lập kế hoạch nhập hàng đều đặn theo tháng.
 """)
-                elif model.model_name == "SARIMA":
+                elif result.model_name == "SARIMA":
                     st.markdown("""
 🔁 Mô hình SARIMA được sử dụng vì dữ liệu có yếu tố mùa vụ rõ ràng (ví dụ: doanh số tăng vào tháng lễ).  
 ➤ Bạn nên chú trọng nhập hàng và marketing vào các tháng cao điểm.
@@ -150,8 +283,8 @@ def render_results_tab(container):
 """)
 
                 # 🗓️ Gợi ý theo từng tháng từ biểu đồ
-                st.subheader(f"🗓️ Gợi ý theo từng tháng từ biểu đồ {model.model_name}")
-                monthly_forecast = model.forecast_series
+                st.subheader(f"🗓️ Gợi ý theo từng tháng từ biểu đồ {result.model_name}")
+                monthly_forecast = result.forecast_series
                 avg_forecast = monthly_forecast.mean()
                 for month, value in monthly_forecast.items():
                     if value >= avg_forecast * 1.1:
@@ -170,25 +303,26 @@ def render_results_tab(container):
             st.info("Vui lòng chạy mô hình ở tab 'Thiết lập'")
 
 
+@profiled("view.forecasting.actions")
 def render_actions_tab(container):
     with container:
         st.header("Gợi ý hành động theo kết quả")
-        model = st.session_state.get("forecast_model_instance")
+        result = st.session_state.get("forecast_result")
         triggered = st.session_state.get("forecast_run_triggered", False)
 
-        if triggered and model:
-            past = model.get_last_month_sales()
-            avg_rev = model.total_revenue / model.forecast_months if model.forecast_months>0 else 0
-            avg_units = avg_rev / model.avg_unit_price if model.avg_unit_price>0 else 0
-            gap = int(avg_units - past) if model.avg_unit_price>0 else 0
+        if triggered and result:
+            past = result.get_last_month_sales()
+            avg_rev = result.total_revenue / result.forecast_months if result.forecast_months>0 else 0
+            avg_units = avg_rev / result.avg_unit_price if result.avg_unit_price>0 else 0
+            gap = int(avg_units - past) if result.avg_unit_price>0 else 0
 
             st.markdown(f"**Tháng trước bán:** {past} SP")
             st.markdown(f"**Dự báo trung bình:** {int(avg_units)} SP/tháng")
             st.markdown(f"**Cần tăng thêm:** {gap if gap>0 else 0} SP")
 
             st.subheader("📌 Gợi ý hành động dành cho Bộ phận 📢 Marketing theo từng tháng")
-            mean_hist = model.monthly.mean() if not model.monthly.empty else 0
-            for month, value in model.forecast_series.items():
+            mean_hist = result.monthly.mean() if not result.monthly.empty else 0
+            for month, value in result.forecast_series.items():
                 deviation = value - mean_hist
                 label = month.strftime('%B %Y')
                 st.markdown(f"### 📅 {label}")
@@ -210,7 +344,57 @@ def render_actions_tab(container):
 - Duy trì hiện diện thương hiệu.
 """)
             st.subheader("💡 Gợi ý tự động từ mô hình")
-            for s in model.get_suggestions():
+            for s in result.get_suggestions():
                 st.markdown(f"- {s}")
         else:
             st.info("Vui lòng chạy mô hình ở tab 'Thiết lập'")
+
+
+@profiled("view.forecasting.hierarchy")
+def render_hierarchy_tab(df_raw, container):
+    with container:
+        st.header("Dự báo phân cấp: Sản phẩm → Nhóm từ khóa → Tổng")
+        st.markdown("""
+        💡 Dự báo mọi sản phẩm trong một lượt rồi **hoà hợp** để số liệu ở từng cấp cộng khớp nhau:
+        tổng các sản phẩm = nhóm, tổng các nhóm = toàn công ty.
+        """)
+        if df_raw is None:
+            st.info("📂 Vui lòng tải lên file CSV ở đầu sidebar để bắt đầu.")
+            return
+        _hierarchy_panel(df_raw)
+
+
+@st.fragment
+def _hierarchy_panel(df_raw):
+    # Fragment: đổi nhóm từ khóa/phương pháp hay bấm chạy chỉ chạy lại phần phân cấp
+    keywords_text = st.text_input(
+        "Các nhóm từ khóa (phân tách bằng dấu phẩy)", value="CANDLE, MUG, BAG", key="hier_keywords_input",
+        help=KEYWORD_HELP
+    )
+    method = st.selectbox(
+        "Phương pháp hoà hợp", RECONCILE_METHODS, index=2, key="hier_method_select",
+        format_func=lambda m: {"bottom_up": "Bottom-up", "ols": "MinT (OLS)", "mint_diag": "MinT (phương sai chéo)"}[m]
+    )
+    if not st.button("Chạy dự báo phân cấp", key="run_hierarchy_button"):
+        return
+
+    keywords = tuple(k.strip() for k in keywords_text.split(",") if k.strip())
+    history_months = st.session_state.get("forecast_history_months_select", 12)
+    horizon = st.session_state.get("forecast_months_select", 6)
+    with st.spinner("Đang dựng cây sản phẩm và dự báo…"):
+        hierarchy = dataset_artefact(df_raw, "hierarchy", build_hierarchy, keywords, history_months)
+        if hierarchy is None:
+            st.warning("Không đủ dữ liệu hợp lệ để dự báo phân cấp.")
+            return
+        table = forecast_hierarchy(hierarchy, horizon, method)
+
+    st.subheader("Toàn công ty & các nhóm")
+    st.dataframe(table[table['Level'] != 'Sản phẩm'].round(2), use_container_width=True, hide_index=True)
+    st.subheader("Từng sản phẩm")
+    products = table[table['Level'] == 'Sản phẩm'].sort_values('Total', ascending=False)
+    st.dataframe(products.round(2), use_container_width=True, hide_index=True)
+    st.caption(
+        f"{len(products)} sản phẩm, {len(hierarchy.categories)} nhóm, dự báo {horizon} tháng. "
+        f"Tổng dự báo toàn công ty: £{table['Total'].iloc[0]:,.2f}"
+    )
+
@@ -0,0 +1,116 @@
+import uuid
+import streamlit as st
+import pandas as pd
+from services import profiling
+from services.job_manager import get_job_manager, job_key, Job, DONE, FAILED, CANCELLED
+
+# Chu kỳ làm mới thanh tiến độ (giây); chỉ fragment tiến độ chạy lại, không chạy lại cả trang
+PROGRESS_REFRESH_S = 0.5
+
+
+def _owner() -> str:
+    # Định danh phiên hiện tại để job dùng chung biết còn bao nhiêu phiên đang chờ
+    if "job_owner_id" not in st.session_state:
+        st.session_state["job_owner_id"] = uuid.uuid4().hex
+    return st.session_state["job_owner_id"]
+
+
+def start_job(state_key: str, kind: str, key_parts: tuple, fn, *args, meta: dict | None = None, **kwargs) -> Job:
+    """
+    Gửi job nền và lưu id của nó vào st.session_state[state_key]. Job cũ của phiên ở cùng vị trí
+    (tham số đã đổi) được bỏ đăng ký, và bị huỷ nếu không còn phiên nào khác chờ.
+    """
+    manager = get_job_manager()
+    job = manager.submit(kind, key_parts, fn, *args, owner=_owner(), meta=meta, **kwargs)
+    previous = st.session_state.get(state_key)
+    if previous is not None and previous != job.id:
+        manager.cancel(previous, _owner())
+    st.session_state[state_key] = job.id
+    st.session_state.pop(f"{state_key}_stopped", None)
+    return job
+
+
+def stopped_job(state_key: str, kind: str, key_parts: tuple) -> dict | None:
+    """
+    Thông tin {"message", "failed"} nếu job cùng khoá vừa bị huỷ hoặc lỗi trong phiên này,
+    để các flow tự gửi job ở mỗi lượt chạy không gửi lại liên tục.
+    """
+    stopped = st.session_state.get(f"{state_key}_stopped")
+    if stopped is not None and stopped["key"] == job_key(kind, key_parts):
+        return stopped
+    return None
+
+
+def _mark_stopped(state_key: str, job: Job, message: str):
+    st.session_state[f"{state_key}_stopped"] = {
+        "key": job.key, "message": message, "failed": job.status == FAILED
+    }
+
+
+@st.fragment(run_every=PROGRESS_REFRESH_S)
+def _progress_fragment(state_key: str, job_id: str, label: str):
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None or job.finished:
+        # Chạy lại cả trang để các tab đọc kết quả mới
+        st.rerun()
+    st.progress(job.progress, text=f"⏳ {label}: {job.stage} ({job.elapsed:.1f}s)")
+    if len(job.owners) > 1:
+        st.caption(f"Đang dùng chung phép tính với {len(job.owners) - 1} phiên khác.")
+    if st.button("✖ Huỷ", key=f"cancel_{job_id}"):
+        manager.cancel(job_id, _owner())
+        _mark_stopped(state_key, job, f"{label}: đã huỷ.")
+        st.session_state.pop(state_key, None)
+        st.toast(f"{label}: đã huỷ.")
+        st.rerun()
+
+
+def render_job_progress(state_key: str, label: str) -> Job | None:
+    """
+    Theo dõi job có id trong st.session_state[state_key]:
+      - đang chạy: hiện thanh tiến độ tự làm mới kèm nút Huỷ, trả về None
+      - lỗi/huỷ: hiện thông báo một lần, trả về None
+      - xong: trả về Job (một lần duy nhất) để nơi gọi đưa kết quả vào session
+    Khi job kết thúc, span của nó được gộp vào lượt profiling hiện tại của phiên.
+    """
+    job_id = st.session_state.get(state_key)
+    if job_id is None:
+        return None
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        st.session_state.pop(state_key, None)
+        return None
+    if not job.finished:
+        _progress_fragment(state_key, job_id, label)
+        return None
+
+    st.session_state.pop(state_key, None)
+    # Span của job (đo ở luồng nền) được gộp vào lượt chạy đang nhận kết quả
+    profiling.merge_records(job.spans)
+    if job.status == DONE:
+        return job
+    if job.status == FAILED:
+        _mark_stopped(state_key, job, f"❌ {job.error}")
+        st.error(f"❌ {job.error}")
+    elif job.status == CANCELLED:
+        _mark_stopped(state_key, job, f"{label}: đã huỷ.")
+        st.info(f"{label}: đã huỷ.")
+    manager.release(job_id)
+    return None
+
+
+def job_running(state_key: str) -> bool:
+    """True nếu phiên đang chờ job ở st.session_state[state_key] và job chưa xong (VD: để hiện bản xem trước)."""
+    job_id = st.session_state.get(state_key)
+    job = get_job_manager().get(job_id) if job_id is not None else None
+    return job is not None and not job.finished
+
+
+def render_job_panel():
+    jobs = get_job_manager().snapshot()
+    with st.sidebar.expander("🧵 Tác vụ nền", expanded=False):
+        if jobs:
+            st.dataframe(pd.DataFrame(jobs), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Chưa có tác vụ nào.")
@@ -1,21 +1,29 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 import pandas as pd
+from views.chart_rendering import render_top_products_figure
+from services.profiling import profiled
+from views import KEYWORD_HELP
 
 def render_sidebar_optimization():
     st.sidebar.subheader("Thông số Tối ưu nhập hàng")
     keyword = st.sidebar.text_input(
-        "Từ khóa sản phẩm (VD: CANDLE)", value="CANDLE", key="optim_keyword_input"
-    )
-    budget = st.sidebar.number_input(
-        "Ngân sách (£)", value=1000.0, min_value=0.0, key="optim_budget_input"
+        "Từ khóa sản phẩm (VD: CANDLE)", value="CANDLE", key="optim_keyword_input", help=KEYWORD_HELP
     )
+    with st.sidebar:
+        _budget_input()
     months = st.sidebar.number_input(
         "Dự báo nhu cầu cho bao nhiêu tháng tới? (tháng)",
         min_value=1, max_value=6, value=1, step=1, key="optim_months_input"
     )
-    return keyword, budget, months
+    return keyword, st.session_state["optim_budget_input"], months
+
+
+@st.fragment
+def _budget_input():
+    # Ngân sách chỉ được đọc khi bấm "Tối ưu nhập hàng": đổi giá trị chỉ chạy lại fragment này
+    st.number_input("Ngân sách (£)", value=1000.0, min_value=0.0, key="optim_budget_input")
 
+@profiled("view.optimization.preprocess")
 def render_preprocess_tab(processed: pd.DataFrame | None, months: int) -> bool:
     st.subheader("📥 Dữ liệu đầu vào & Tiền xử lý")
     st.info(
@@ -30,6 +38,7 @@ def render_preprocess_tab(processed: pd.DataFrame | None, months: int) -> bool:
         run_pressed = False
     return run_pressed
 
+@profiled("view.optimization.results")
 def render_optimization_results_tab(
     df: pd.DataFrame,
     top5: pd.DataFrame,
@@ -49,12 +58,9 @@ def render_optimization_results_tab(
     st.markdown(f"📈 *Tổng lợi nhuận kỳ vọng:* £{total_profit:,.2f}")
     if total_cost > 0:
         st.markdown(f"📊 *Tỷ suất lợi nhuận:* {total_profit/total_cost*100:.2f}%")
-    fig, ax = plt.subplots(figsize=(10,6))
-    ax.barh(top5['Description'][::-1], top5['ExpectedProfit'][::-1])
-    ax.set_xlabel("Lợi nhuận (£)")
-    ax.set_title(f"🔝 Top {len(top5)} sản phẩm")
-    st.pyplot(fig)
+    render_top_products_figure(top5)
 
+@profiled("view.optimization.decision")
 def render_decision_tab(
     df_result: pd.DataFrame,
     top5: pd.DataFrame,
@@ -0,0 +1,136 @@
+import streamlit as st
+import pandas as pd
+from services.partition_service import PARTITION_KEY
+from services.profiling import profiled
+from services.export_service import forecast_frame
+from views.export_view import render_export
+from views import KEYWORD_HELP
+
+PARTITION_ANALYSES = {
+    "segmentation": "Phân khúc khách hàng (RFM)",
+    "optimization": "Tối ưu nhập hàng (LP)",
+    "forecast": "Dự báo doanh thu",
+}
+
+
+def render_partition_sidebar(columns: list[str]) -> dict:
+    st.sidebar.subheader("Thông số phân vùng")
+    params = {
+        "column": st.sidebar.selectbox(
+            "Phân vùng theo cột", columns, index=0, key="partition_column_select",
+            help="Mỗi giá trị của cột (VD: từng quốc gia / cửa hàng) được phân tích riêng rồi ghép kết quả."
+        ),
+        "analysis": st.sidebar.radio(
+            "Phân tích", tuple(PARTITION_ANALYSES), format_func=PARTITION_ANALYSES.get,
+            key="partition_analysis_radio"
+        ),
+    }
+    if params["analysis"] == "segmentation":
+        params["k"] = int(st.sidebar.number_input(
+            "Số nhóm (k)", min_value=2, max_value=6, value=3, key="partition_k_input"
+        ))
+    else:
+        params["keyword"] = st.sidebar.text_input(
+            "Từ khóa sản phẩm", value="CANDLE", key="partition_keyword_input", help=KEYWORD_HELP
+        ).strip()
+    if params["analysis"] == "optimization":
+        params["budget"] = float(st.sidebar.number_input(
+            "Ngân sách mỗi phân vùng (£)", value=1000.0, min_value=0.0, key="partition_budget_input"
+        ))
+        params["months"] = int(st.sidebar.number_input(
+            "Số tháng nhu cầu", min_value=1, max_value=6, value=1, step=1, key="partition_months_input"
+        ))
+    if params["analysis"] == "forecast":
+        params["history_months"] = st.sidebar.selectbox(
+            "Số tháng phân tích", [12, 18, 24], index=0, key="partition_history_months_select"
+        )
+        params["forecast_months"] = st.sidebar.selectbox(
+            "Dự báo trong bao lâu (Tháng)", [3, 6, 12], index=1, key="partition_forecast_months_select"
+        )
+        params["capital_cost"] = float(st.sidebar.number_input(
+            "Chi phí vốn / đơn vị (£)", min_value=0.0, value=1.0, key="partition_capital_cost_input"
+        ))
+        params["mape_threshold"] = float(st.sidebar.number_input(
+            "Ngưỡng MAPE chấp nhận (%)", min_value=0.0, value=15.0, key="partition_mape_threshold_input"
+        ))
+    return params
+
+
+def render_partition_status(status: pd.DataFrame):
+    failed = status[status['Status'] != "OK"]
+    st.caption(f"{len(status) - len(failed)}/{len(status)} phân vùng có kết quả.")
+    if not failed.empty:
+        with st.expander(f"⚠️ {len(failed)} phân vùng không có kết quả"):
+            st.dataframe(failed, use_container_width=True, hide_index=True)
+
+
+@st.fragment
+def _partition_detail(table: pd.DataFrame, columns: list[str], key: str):
+    # Fragment: đổi phân vùng đang xem chỉ vẽ lại bảng chi tiết
+    labels = table[PARTITION_KEY].unique().tolist()
+    if not labels:
+        return
+    label = st.selectbox("Xem chi tiết phân vùng", labels, key=key)
+    st.dataframe(table.loc[table[PARTITION_KEY] == label, columns], use_container_width=True, hide_index=True)
+
+
+@profiled("view.partition.segmentation")
+def render_segmentation_partitions(out: dict, metadata: dict):
+    if out["summary"].empty:
+        st.warning("Không phân vùng nào đủ khách hàng để phân cụm.")
+        return
+    st.subheader("Số khách hàng theo phân khúc và phân vùng")
+    pivot = out["summary"].pivot_table(
+        index=PARTITION_KEY, columns='Segment', values='Customers', aggfunc='sum', fill_value=0
+    )
+    st.dataframe(pivot, use_container_width=True)
+    st.subheader("Bảng tóm tắt phân khúc (gộp)")
+    st.dataframe(out["summary"], use_container_width=True, hide_index=True)
+
+    customers = out["customers"]
+    _partition_detail(
+        customers, ['CustomerID', 'Recency', 'Frequency', 'Monetary', 'Cluster', 'Segment'],
+        "partition_segment_detail_select"
+    )
+    render_export("segments", customers, metadata, key="partition_customers_export", file_stem="partition_customers")
+
+
+@profiled("view.partition.optimization")
+def render_optimization_partitions(out: dict, metadata: dict):
+    if out["plan"].empty:
+        st.warning("Không phân vùng nào có sản phẩm phù hợp để tối ưu.")
+        return
+    st.subheader("Chi phí và lợi nhuận kỳ vọng theo phân vùng")
+    totals = out["totals"].sort_values('ExpectedProfit', ascending=False)
+    st.dataframe(totals.round(2), use_container_width=True, hide_index=True)
+    st.markdown(
+        f"💰 *Tổng chi phí:* £{totals['TotalCost'].sum():,.2f} · "
+        f"📈 *Tổng lợi nhuận kỳ vọng:* £{totals['ExpectedProfit'].sum():,.2f}"
+    )
+    plan = out["plan"]
+    _partition_detail(
+        plan, ['Description', 'OrderQty', 'UnitPrice', 'TotalCost', 'ExpectedProfit'], "partition_plan_detail_select"
+    )
+    render_export("order_plan", plan, metadata, key="partition_plan_export", file_stem="partition_purchase_plan")
+
+
+@profiled("view.partition.forecast")
+def render_forecast_partitions(out: dict, metadata: dict):
+    if out["summary"].empty:
+        st.warning("Không phân vùng nào đủ dữ liệu để dự báo.")
+        return
+    st.subheader("Mô hình và doanh thu dự báo theo phân vùng")
+    summary = out["summary"].sort_values('TotalRevenue', ascending=False)
+    st.dataframe(summary.round(2), use_container_width=True, hide_index=True)
+    st.subheader("Doanh thu dự báo theo tháng")
+    top = summary[PARTITION_KEY].head(10).tolist()
+    st.line_chart(out["forecast"][top])
+    with st.expander("📅 Bảng dự báo đầy đủ"):
+        table = out["forecast"].copy()
+        table.index = table.index.strftime('%Y-%m')
+        st.dataframe(table.round(2), use_container_width=True)
+    frames = [forecast_frame(r).assign(**{PARTITION_KEY: label}) for label, r in out["results"].items()]
+    render_export(
+        "forecast", pd.concat(frames, ignore_index=True), metadata,
+        key="partition_forecast_export", file_stem="partition_forecast"
+    )
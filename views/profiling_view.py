@@ -0,0 +1,31 @@
+import streamlit as st
+import pandas as pd
+
+PROFILING_CHECKBOX_KEY = "profiling_panel_checkbox"
+
+
+def profiling_requested() -> bool:
+    # Đọc trạng thái checkbox từ lượt chạy trước để bật profiling ngay từ đầu script
+    return bool(st.session_state.get(PROFILING_CHECKBOX_KEY, False))
+
+
+def render_profiling_panel(records: list[dict]):
+    enabled = st.sidebar.checkbox(
+        "🔬 Bảng đo hiệu năng", key=PROFILING_CHECKBOX_KEY,
+        help="Ghi thời gian, CPU, bộ nhớ đỉnh, số dòng vào/ra và cache hit/miss của từng bước ở lượt chạy kế tiếp."
+    )
+    if not enabled:
+        return
+    with st.sidebar.expander("🔬 Hiệu năng theo bước", expanded=True):
+        if not records:
+            st.caption("Chưa có số liệu – thao tác bất kỳ để chạy lại trang với profiling.")
+            return
+        df = pd.DataFrame(records).sort_values(["pass", "start_s"])
+        df["span"] = ["· " * d + name for d, name in zip(df["depth"], df["span"])]
+        columns = ["span", "wall_s", "cpu_s", "peak_mb", "rows_in", "rows_out", "cache"]
+        if df["pass"].nunique() > 1:
+            # Lượt 1 là lượt đã gọi st.rerun() (ví dụ sau khi chạy mô hình), lượt 2 là lượt hiển thị
+            columns.insert(0, "pass")
+        st.dataframe(df[columns], use_container_width=True, hide_index=True)
+        top = df[df["depth"] == 0]
+        st.caption(f"Tổng thời gian các bước cấp ngoài cùng: {top['wall_s'].sum():.3f}s")
@@ -0,0 +1,21 @@
+import streamlit as st
+from services.progressive_service import Preview
+
+
+def render_preview_notice(preview: Preview, bound_label: str):
+    """Đánh dấu kết quả đang hiển thị là bản xem trước trên mẫu, kèm cận sai số 95%."""
+    st.info(
+        f"🔎 **BẢN XEM TRƯỚC** — tính trên mẫu {preview.rate:.1%} dữ liệu ({preview.sample_rows:,} dòng, "
+        f"{preview.elapsed_s:.2f}s). Kết quả đầy đủ đang được tính nền và sẽ tự thay thế. "
+        f"Cận sai số (95%): ±{preview.error_bound:.1f} {bound_label}."
+    )
+    with st.expander("Cận sai số chi tiết của bản xem trước", expanded=False):
+        st.dataframe(preview.bounds, use_container_width=True, hide_index=True)
+
+
+def render_preview_error(preview: Preview, realized: float, bound_label: str):
+    """Sai số thực tế của bản xem trước so với kết quả đầy đủ vừa tính xong."""
+    st.caption(
+        f"Bản xem trước (mẫu {preview.rate:.1%}) lệch ±{realized:.1f} {bound_label} so với kết quả đầy đủ "
+        f"(cận 95% đã báo: ±{preview.error_bound:.1f})."
+    )
@@ -1,7 +1,9 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 import pandas as pd
+from views.chart_rendering import render_elbow_figure
+from services.profiling import profiled
 
+@profiled("view.segmentation.elbow")
 def render_elbow_chart(sse: list[float], k: int):
     col1, col2 = st.columns([0.9, 0.1])
     with col1:
@@ -21,16 +23,10 @@ def render_elbow_chart(sse: list[float], k: int):
                     - **Tại sao "điểm khuỷu tay" quan trọng?**: Đây là điểm số nhóm tối ưu. Nó giúp bạn tìm ra số nhóm vừa đủ để phân biệt các loại khách hàng rõ ràng, mà không làm quá phức tạp mọi thứ.
                     - **Cách xem biểu đồ**: Hãy tìm vị trí trên đường cong mà nó giống như một "khuỷu tay" – nơi độ dốc giảm đột ngột rồi sau đó gần như đi ngang. Đường **màu đỏ** trên biểu đồ đánh dấu số nhóm (k) bạn đang chọn. Nếu đường đỏ này nằm gần "điểm khuỷu tay", đó là một lựa chọn tốt!
                     """)
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.plot(range(1, len(sse)+1), sse, marker='o')
-    ax.axvline(k, color='red', linestyle='--', label=f'Chọn k={k}')
-    ax.set_xlabel("Số nhóm (k)")
-    ax.set_ylabel("Chỉ số gắn kết (SSE)")
-    ax.legend()
-    ax.grid(True)
-    st.pyplot(fig)
+    render_elbow_figure(sse, k)
 
 
+@profiled("view.segmentation.summary")
 def render_summary_table(summary: pd.DataFrame):
     col1, col2 = st.columns([0.9, 0.1])
     with col1:
@@ -52,6 +48,7 @@ def render_summary_table(summary: pd.DataFrame):
     )
 
 
+@profiled("view.segmentation.proposals")
 def render_proposals(summary: pd.DataFrame):
     # Tiêu đề + popover giải thích nhãn phân khúc
     col1, col2 = st.columns([0.95, 0.05])
@@ -111,7 +108,10 @@ def render_proposals(summary: pd.DataFrame):
         st.write("---")
 
 
+@profiled("view.segmentation.details")
+@st.fragment
 def render_details(rfm: pd.DataFrame, summary: pd.DataFrame):
+    # Fragment: đổi cụm chỉ vẽ lại bảng này, không chạy lại cả flow (rfm/summary là kết quả đã có)
     st.subheader("Chi tiết Khách hàng theo Cụm")
     options = {
         c: f"Cluster {c} – {summary.loc[summary['Cluster']==c,'Segment'].iloc[0]}"